@@ -0,0 +1,249 @@
+import asyncio
+import math
+
+from core.system.logger import ThreadedLoggerManager
+
+
+def estimate_tokens(message, settings):
+    # No tokenizer for the local models, so estimate from the UTF-8 length and round up
+    content = message.get('content') or ""
+    return settings.message_overhead + text_tokens(content, settings)
+
+
+def text_tokens(text, settings):
+    return math.ceil(len(text.encode('utf-8')) / settings.chars_per_token)
+
+
+class ContextWindow:
+    """
+    Chooses what of one model's session history is sent. Leading system messages are
+    pinned, then the newest turns are added until the token budget is spent; everything
+    older than that is represented by a rolling summary that is rewritten in the
+    background once a turn has ended (`compact`), so a turn never waits on summarization.
+
+    Token counts are cached per message position; the history is only ever appended to,
+    cut back by a rolled back turn or replaced wholesale by a clear, so each message is
+    counted once.
+    """
+
+    SUMMARY_PREFIX = "Summary of the earlier conversation: "
+    RECALL_PREFIX = "Possibly relevant earlier messages:"
+
+    def __init__(self, model, debug=False, on_summary=None, logger=None):
+        self.model = model
+        self.debug = debug
+        self.on_summary = on_summary  # on_summary(model, summary, covered_messages)
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.counts = []
+        self.summary = ""
+        self.summary_tokens = 0
+        self.summary_upto = 0  # history[:summary_upto] is covered by pins or the summary
+        self.window_start = 0  # oldest history index sent verbatim last time
+        self.summary_task = None
+        self.generation = 0
+
+    def reset(self):
+        if self.summary_task and not self.summary_task.done():
+            self.summary_task.cancel()
+        self.summary_task = None
+        self.counts = []
+        self.summary = ""
+        self.summary_tokens = 0
+        self.summary_upto = 0
+        self.window_start = 0
+        self.generation += 1
+
+    def truncate(self, length):
+        # The newest messages were taken back (a cancelled speculative turn)
+        if self.summary_upto > length:
+            self.reset()
+            return
+        if self.summary_task and not self.summary_task.done():
+            # It may have been started on the dropped messages; the next build restarts it
+            self.summary_task.cancel()
+            self.generation += 1
+        del self.counts[length:]
+        self.window_start = min(self.window_start, length)
+
+    def recount(self):
+        # Cached counts depend on the estimate settings
+        self.counts = []
+        self.summary_tokens = None
+
+    def restore_summary(self, summary):
+        # The summary covers what precedes the restored history, short of any restore gap
+        self.summary = summary
+        self.summary_tokens = None
+        self.summary_upto = 0
+
+    def _count(self, history, settings):
+        if len(self.counts) > len(history):
+            # The list was shortened behind our back; start over
+            self.reset()
+        for message in history[len(self.counts):]:
+            self.counts.append(estimate_tokens(message, settings))
+        if self.summary_tokens is None:
+            self.summary_tokens = self._summary_tokens(settings)
+
+    @staticmethod
+    def budget(model_config, settings):
+        return model_config.context_tokens - min(model_config.max_tokens, settings.reply_reserve_tokens)
+
+    @staticmethod
+    def _pinned(history):
+        pinned = 0
+        while pinned < len(history) and history[pinned].get('role') == 'system':
+            pinned += 1
+        return pinned
+
+    def build(self, history, model_config, settings, extra=None, recalled=None, recall_tokens=0, prefix=()):
+        """
+        Returns the messages to send: `prefix`, pins, summary, as many recent messages as
+        fit, and `extra` (a message sent this once without being stored). The newest stored
+        message is always included, even if it alone exceeds the budget.
+
+        `recalled` is [(history index, message)] best first, negative indices for messages
+        before the loaded history; up to `recall_tokens` of them are quoted, skipping any
+        that are sent anyway.
+
+        Everything volatile goes last so consecutive requests share a long byte-identical
+        prefix: the recalled messages sit right before the newest message, and the oldest
+        message sent only moves when the summary lands or the budget forces it.
+        """
+        if not settings.enabled:
+            return list(prefix) + list(history) + ([extra] if extra else [])
+
+        self._count(history, settings)
+        budget = self.budget(model_config, settings)
+
+        pinned = self._pinned(history)
+        start = max(self.summary_upto, pinned)
+
+        used = sum(estimate_tokens(message, settings) for message in prefix)
+        used += sum(self.counts[:pinned]) + self.summary_tokens
+        if extra:
+            used += estimate_tokens(extra, settings)
+        reserve = 0
+        if recalled and recall_tokens:
+            quoted = sum(text_tokens(self._recall_line(m), settings) + 1 for _, m in recalled)
+            reserve = min(recall_tokens, settings.message_overhead + text_tokens(self.RECALL_PREFIX, settings) + quoted)
+            used += reserve
+
+        tail = min(max(self.window_start, start), len(history))
+        window = sum(self.counts[tail:])
+        if used + window > budget:
+            # Slide in one step down to trim_to of the budget, not a message per turn,
+            # so the next few requests keep the same oldest message
+            target = budget * settings.trim_to
+            while tail < len(history) - 1 and used + window > target:
+                window -= self.counts[tail]
+                tail += 1
+        self.window_start = tail
+        used += window
+
+        messages = list(prefix) + history[:pinned]
+        if self.summary:
+            messages.append({"role": "system", "content": self.SUMMARY_PREFIX + self.summary})
+        messages.extend(history[tail:])
+        recall_message = self._recall_message(recalled, tail, reserve, settings) if reserve else None
+        if extra:
+            if recall_message:
+                messages.append(recall_message)
+            messages.append(extra)
+        elif recall_message:
+            messages.insert(len(messages) - 1 if tail < len(history) else len(messages), recall_message)
+
+        dropped = tail - start
+        if dropped:
+            self.logger.info(
+                f"[Context] {self.model}: {dropped} older message(s) left out until the summary catches up"
+            )
+        if self.debug:
+            self.logger.debug(f"[Context] {self.model}: {len(messages)} message(s), ~{used}/{budget} tokens")
+        return messages
+
+    @staticmethod
+    def _recall_line(message):
+        return f"- {message['role']}: {message['content']}"
+
+    def _recall_message(self, recalled, tail, reserve, settings):
+        spent = settings.message_overhead + text_tokens(self.RECALL_PREFIX, settings)
+        lines = []
+        for index, message in recalled:
+            if index >= tail:
+                continue  # part of the recent turns already
+            line = self._recall_line(message)
+            cost = text_tokens(line, settings) + 1
+            if spent + cost > reserve:
+                continue
+            spent += cost
+            lines.append(line)
+        if not lines:
+            return None
+        return {"role": "system", "content": "\n".join([self.RECALL_PREFIX] + lines)}
+
+    def _summary_tokens(self, settings):
+        return estimate_tokens({"content": self.SUMMARY_PREFIX + self.summary}, settings) if self.summary else 0
+
+    def compact(self, history, model_config, settings, summarizer):
+        """
+        Starts folding the older unsummarized messages into the summary in the background
+        once they fill compact_at of the budget or were left out of the last request.
+        Call it when a turn has ended, so the summary request never delays a reply.
+        Returns the summary task, or None if nothing was started.
+        """
+        if not settings.enabled or (self.summary_task and not self.summary_task.done()):
+            return None
+        self._count(history, settings)
+        start = max(self.summary_upto, self._pinned(history))
+        end = len(history) - settings.keep_recent_messages
+        if end <= start:
+            return None
+        dropped = self.window_start > start
+        if not dropped and sum(self.counts[start:]) < self.budget(model_config, settings) * settings.compact_at:
+            return None
+        self.summary_task = asyncio.get_running_loop().create_task(
+            self._compact(history[start:end], end, model_config, settings, summarizer)
+        )
+        return self.summary_task
+
+    def compact_earlier(self, pages, model_config, settings, summarizer):
+        """
+        Folds messages from before the loaded history into the summary in the background.
+        `pages` is an async iterator of (messages, end), `end` being the (negative) history
+        index right after the page; used once after a restore that left older messages
+        unsummarized. Returns the task, or None while another summary is being written.
+        """
+        if self.summary_task and not self.summary_task.done():
+            return None
+        self.summary_task = asyncio.get_running_loop().create_task(
+            self._compact_pages(pages, model_config, settings, summarizer)
+        )
+        return self.summary_task
+
+    async def _compact_pages(self, pages, model_config, settings, summarizer):
+        async for messages, end in pages:
+            if not await self._compact(messages, end, model_config, settings, summarizer):
+                return False
+        return True
+
+    async def _compact(self, messages, end, model_config, settings, summarizer):
+        generation = self.generation
+        try:
+            summary = await summarizer(self.summary, messages, model_config)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"[Context] {self.model}: summarizing {len(messages)} message(s) failed: {e}")
+            return False
+        if generation != self.generation or not summary:
+            return False
+        self.summary = summary.strip()
+        self.summary_tokens = self._summary_tokens(settings)
+        self.summary_upto = max(self.summary_upto, end)
+        if self.on_summary:
+            self.on_summary(self.model, self.summary, end)
+        self.logger.info(
+            f"[Context] {self.model}: folded {len(messages)} message(s) into the summary (~{self.summary_tokens} tokens)"
+        )
+        return True
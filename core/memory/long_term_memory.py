@@ -0,0 +1,304 @@
+import asyncio
+import os
+import re
+import sqlite3
+import time
+import zlib
+from threading import Lock
+
+from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
+from core.system.logger import ThreadedLoggerManager
+from core.system.provider_registry import ProviderRegistry, lazy_import
+
+EMBEDDERS = ProviderRegistry("embedding")
+EMBEDDERS.register("hashing", "_embed_hashing")
+EMBEDDERS.register("node", "_embed_node", requires=("openai",))
+
+ROW_FIELDS = [('model', '<i4'), ('seq', '<i8')]  # numpy record layout of rows.bin
+WORD = re.compile(r"\w+")
+STOP_WORDS = frozenset(
+    "a an the and or but is are was were be been to of in on at for with by from as it its this that "
+    "i me my you your we our he she they them his her their do does did what where when how who which "
+    "again about tell please can could would will just".split()
+)
+
+
+def hash_embed(text, dim):
+    # Signed feature hashing of content words and their character trigrams, so "live" still
+    # matches "lives". crc32 is stable across runs, unlike hash()
+    words = [word for word in WORD.findall(text.lower()) if word not in STOP_WORDS]
+    features = list(words)
+    for word in words:
+        padded = f"<{word}>"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    vector = lazy_import("numpy").zeros(dim, dtype="float32")
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    return vector
+
+
+def normalize(matrix):
+    norms = lazy_import("numpy").linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype("float32", copy=False)
+
+
+class VectorIndex:
+    """
+    Append-only embedding matrix in a memory-mapped float32 file, with a parallel
+    (model, seq) row array and the texts in SQLite. Vectors are stored normalized, so
+    cosine similarity is a single matrix-vector product over the mapped rows.
+    """
+
+    def __init__(self, directory, dim, initial_capacity=1024):
+        self.directory = directory
+        self.dim = dim
+        self.lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self.db = sqlite3.connect(os.path.join(directory, "items.db"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            "CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, role TEXT NOT NULL, content TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS models (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        stored_dim = self.db.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        if stored_dim and int(stored_dim[0]) != dim:
+            raise ValueError(f"index at {directory} holds {stored_dim[0]}-d vectors, embedder produces {dim}-d")
+        with self.db:
+            self.db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dim', ?)", (str(dim),))
+        self.model_ids = dict(self.db.execute("SELECT name, id FROM models"))
+        # Rows past the committed item count are leftovers of an interrupted append
+        self.count = self.db.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        self.capacity = 0
+        self._map(max(initial_capacity, self.count))
+
+    def _map(self, capacity):
+        np = lazy_import("numpy")
+        row_dtype = np.dtype(ROW_FIELDS)
+        vectors_path = os.path.join(self.directory, "vectors.f32")
+        rows_path = os.path.join(self.directory, "rows.bin")
+        for path, itemsize in ((vectors_path, self.dim * 4), (rows_path, row_dtype.itemsize)):
+            with open(path, "ab") as handle:
+                if handle.tell() < capacity * itemsize:
+                    handle.truncate(capacity * itemsize)
+        # Searches already running keep their references to the previous maps
+        self.vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.rows = np.memmap(rows_path, dtype=row_dtype, mode="r+", shape=(capacity,))
+        self.capacity = capacity
+
+    def _model_id(self, model):
+        model_id = self.model_ids.get(model)
+        if model_id is None:
+            with self.db:
+                model_id = self.db.execute("INSERT INTO models (name) VALUES (?)", (model,)).lastrowid
+            self.model_ids[model] = model_id
+        return model_id
+
+    def add(self, model, items, vectors):
+        """items: [(seq, role, content)], vectors: normalized (len(items), dim) float32."""
+        with self.lock:
+            model_id = self._model_id(model)
+            start, end = self.count, self.count + len(items)
+            if end > self.capacity:
+                self.vectors.flush()
+                self._map(max(end, self.capacity * 2))
+            self.vectors[start:end] = vectors
+            self.rows['model'][start:end] = model_id
+            self.rows['seq'][start:end] = [seq for seq, _, _ in items]
+            with self.db:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO items (id, role, content) VALUES (?, ?, ?)",
+                    [(start + i, role, content) for i, (_, role, content) in enumerate(items)],
+                )
+            self.count = end
+
+    def search(self, model, query, k, min_score=0.0, before_seq=None):
+        """
+        Top-k (score, seq, role, content) for `model` by cosine similarity, best first.
+        `before_seq` skips rows at or after that sequence number.
+        """
+        with self.lock:
+            model_id = self.model_ids.get(model)
+            vectors, rows, count = self.vectors, self.rows, self.count
+        if model_id is None or not count:
+            return []
+
+        scores = vectors[:count] @ query
+        mask = rows['model'][:count] != model_id
+        if before_seq is not None:
+            mask |= rows['seq'][:count] >= before_seq
+        np = lazy_import("numpy")
+        scores[mask] = -np.inf
+
+        k = min(k, count)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        top = [int(i) for i in top if scores[i] >= min_score]
+        if not top:
+            return []
+
+        with self.lock:
+            placeholders = ",".join("?" * len(top))
+            texts = dict(
+                (row_id, (role, content))
+                for row_id, role, content in self.db.execute(
+                    f"SELECT id, role, content FROM items WHERE id IN ({placeholders})", top
+                )
+            )
+        return [
+            (float(scores[i]), int(rows['seq'][i]), *texts[i])
+            for i in top if i in texts
+        ]
+
+    def close(self):
+        with self.lock:
+            self.vectors.flush()
+            self.rows.flush()
+            self.db.close()
+
+
+class LongTermMemory:
+    """
+    Remembers every stored user/assistant message in a VectorIndex and recalls the ones
+    most similar to a new prompt, so older turns can be brought back into a request
+    without resending the transcript. Embedding and indexing run off the turn: messages
+    are queued and indexed in batches by a background task.
+
+    Rows are keyed by session sequence numbers, which only persist with the session store;
+    without `stable_seq` every restart would reuse them, so recall stays off.
+    """
+
+    def __init__(self, config=None, logger=None, clients=None, embedder=None, stable_seq=True):
+        self.config = config or ConfigLoader().load_config()
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        self.settings = self.snapshot.long_term_memory
+        self.clients = clients
+        self.stable_seq = stable_seq
+        # Any async embedder(texts) -> (len(texts), dim) array may be passed in instead
+        self.embedder = embedder or EMBEDDERS.bind(self, self.settings.embedder)
+        if self.embedder is None:
+            raise ValueError(f"Unknown embedder '{self.settings.embedder}' (registered: {EMBEDDERS.names()})")
+        self.index = None
+        self.index_lock = asyncio.Lock()
+        self.pending = asyncio.Queue()
+        self.worker = None
+        self.stats = {'indexed': 0, 'recalls': 0, 'hits': 0}
+        self._check_stable_seq()
+
+    @property
+    def enabled(self):
+        return self.settings.enabled and self.stable_seq
+
+    def _check_stable_seq(self):
+        if self.settings.enabled and not self.stable_seq:
+            self.logger.error(
+                "[Long-term Memory] Needs session_store enabled, message sequence numbers restart "
+                "at 0 without it; recall stays off."
+            )
+
+    def apply_config(self, config):
+        # The embedder and index location only change on restart
+        self.config = config
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.debug = self.snapshot.system.debug_mode
+        new_settings = self.snapshot.long_term_memory
+        if (new_settings.embedder, new_settings.path) != (self.settings.embedder, self.settings.path):
+            self.logger.warning("[Long-term Memory] Embedder/path changes apply after a restart.")
+        turned_on = new_settings.enabled and not self.settings.enabled
+        self.settings = new_settings
+        if turned_on:
+            self._check_stable_seq()
+
+    async def _embed_hashing(self, texts):
+        return lazy_import("numpy").stack([hash_embed(text, self.settings.embedding_dim) for text in texts])
+
+    async def _embed_node(self, texts):
+        # OpenAI compatible /embeddings on the node of `embedding_node` (LM Studio serves these)
+        model_config = self.snapshot.models[self.settings.embedding_node]
+        client = self.clients.get_client(model_config)
+        response = await client.embeddings.create(model=self.settings.embedding_model, input=texts)
+        return lazy_import("numpy").array([item.embedding for item in response.data], dtype="float32")
+
+    async def _embed(self, texts):
+        return normalize(lazy_import("numpy").asarray(await self.embedder(texts), dtype="float32"))
+
+    async def _get_index(self, dim):
+        async with self.index_lock:
+            if self.index is None:
+                self.index = await asyncio.to_thread(VectorIndex, self.settings.path, dim)
+                self.logger.info(f"[Long-term Memory] Index ready with {self.index.count} item(s).")
+        return self.index
+
+    def remember(self, model, seq, message):
+        # Session memory append listener; must stay cheap, the work happens in the worker
+        if not self.enabled or message.get('role') not in ('user', 'assistant'):
+            return
+        content = (message.get('content') or "").strip()
+        if not content:
+            return
+        self.pending.put_nowait((model, seq, message['role'], content))
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.get_running_loop().create_task(self._index_pending())
+
+    async def _index_pending(self):
+        while not self.pending.empty():
+            batch = []
+            while not self.pending.empty() and len(batch) < self.settings.batch_size:
+                batch.append(self.pending.get_nowait())
+            try:
+                vectors = await self._embed([content for _, _, _, content in batch])
+                index = await self._get_index(vectors.shape[1])
+                by_model = {}
+                for position, (model, seq, role, content) in enumerate(batch):
+                    by_model.setdefault(model, []).append((position, (seq, role, content)))
+                for model, entries in by_model.items():
+                    rows = vectors[[position for position, _ in entries]]
+                    await asyncio.to_thread(index.add, model, [item for _, item in entries], rows)
+                self.stats['indexed'] += len(batch)
+            except Exception as e:
+                self.logger.error(f"[Long-term Memory] Failed to index {len(batch)} message(s): {e}")
+
+    async def recall(self, model, text, before_seq=None):
+        """
+        Up to top_k earlier messages similar to `text`, as (seq, message) best first.
+        Never raises; a failing embedder just means no recall for this turn.
+        """
+        if not self.enabled or not text:
+            return []
+        started = time.perf_counter()
+        try:
+            query = (await self._embed([text]))[0]
+            index = await self._get_index(len(query))
+            hits = await asyncio.to_thread(
+                index.search, model, query, self.settings.top_k, self.settings.min_score, before_seq
+            )
+        except Exception as e:
+            self.logger.warning(f"[Long-term Memory] Recall failed: {e}")
+            return []
+        self.stats['recalls'] += 1
+        self.stats['hits'] += len(hits)
+        if self.debug:
+            self.logger.debug(
+                f"[Long-term Memory] {len(hits)} hit(s) in {(time.perf_counter() - started) * 1000:.1f} ms: "
+                f"{[round(score, 2) for score, *_ in hits]}"
+            )
+        limit = self.settings.max_snippet_chars
+        return [
+            (seq, {"role": role, "content": content if len(content) <= limit else content[:limit] + "..."})
+            for _, seq, role, content in hits
+        ]
+
+    async def close(self):
+        if self.worker and not self.worker.done():
+            await self.worker
+        if self.index:
+            await asyncio.to_thread(self.index.close)
+            self.index = None
+        self.logger.info(f"[Long-term Memory] Closed: {self.stats}")
+
@@ -1,6 +1,9 @@
 from core.system.utils.system_tools import SystemTools
 from core.system.logger import ThreadedLoggerManager
+from core.memory.context_window import ContextWindow, estimate_tokens
+from core.memory.session_store import SessionStore
 from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
 
 import asyncio
 
@@ -10,32 +13,238 @@ class SessionMemoryManager:
         self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
         self.debug = self.config['system_settings'].get('debug_mode', False)
         self.system_tools = SystemTools(config=self.config, logger=self.logger)
-        self.session_memory = {model: [] for model in SystemTools(self.config, self.logger).get_available_models()}
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        self.session_memory = {}
+        self.context_windows = {}
+        self.summarizer = None
+        self.append_listeners = []  # listener(model, seq, message) for every stored message
+        # Sequence number of session_memory[model][0] and of the next message, per model
+        self.first_seq = {}
+        self.next_seq = {}
+        # Messages of a speculative turn, held back from the store and listeners until commit
+        self.pending_turns = {}
+        self.pending_compactions = {}  # model -> model_config, compacted once its turn commits
+        # Stored messages neither restored nor covered by the summary begin here, per model
+        self.gap_start = {}
+        self.store = None
+        store_settings = self.snapshot.session_store
+        if store_settings.enabled:
+            try:
+                self.store = SessionStore(
+                    store_settings.path,
+                    flush_interval=store_settings.flush_interval,
+                    batch_size=store_settings.batch_size,
+                    logger=self.logger,
+                )
+            except Exception as e:
+                self.logger.error(f"Session store unavailable, history will not persist: {e}")
+        for model in self.system_tools.get_available_models():
+            self._ensure_session(model)
+
+    def _ensure_session(self, model):
+        if model in self.session_memory:
+            return
+        messages, first_seq, next_seq, summary, summary_seq = [], 0, 0, "", 0
+        if self.store:
+            try:
+                messages, first_seq, next_seq, summary, summary_seq = self.store.load_session(
+                    model, self.snapshot.session_store.restore_messages
+                )
+            except Exception as e:
+                self.logger.error(f"Failed to restore session memory for {model}, starting empty: {e}")
+        self.session_memory[model] = messages
+        self.first_seq[model] = first_seq
+        self.next_seq[model] = next_seq
+        if summary_seq < first_seq:
+            self.gap_start[model] = summary_seq
+        if summary:
+            self._context_window(model).restore_summary(summary)
+        if messages or summary:
+            self.logger.info(
+                f"Restored {len(messages)} message(s) for model: {model}"
+                + (f", {first_seq - summary_seq} older one(s) to summarize" if summary_seq < first_seq else "")
+            )
+        else:
+            self.logger.info(f"Created new session list for model: {model}")
+
+    def apply_config(self, config):
+        old_context = self.snapshot.context_window
+        self.config = config
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.debug = config['system_settings'].get('debug_mode', False)
+        self.system_tools.apply_config(config)
+        for window in self.context_windows.values():
+            window.debug = self.debug
+            if self.snapshot.context_window != old_context:
+                window.recount()
+        for model in self.system_tools.get_available_models():
+            self._ensure_session(model)
+
+    def set_summarizer(self, summarizer):
+        # async summarizer(previous_summary, messages, model_config) -> str
+        self.summarizer = summarizer
+
+    def _context_window(self, model):
+        window = self.context_windows.get(model)
+        if window is None:
+            window = self.context_windows[model] = ContextWindow(
+                model, debug=self.debug, on_summary=self._save_summary, logger=self.logger
+            )
+        return window
+
+    def _save_summary(self, model, summary, covered_messages):
+        if self.store:
+            self.store.save_summary(model, summary, self.first_seq[model] + covered_messages)
+
+    async def load_older_history(self, model, limit=50):
+        """
+        Messages of the current session from before the restored window, oldest first.
+        Reads from the store off the event loop; empty without a store.
+        """
+        if not self.store or model not in self.first_seq:
+            return []
+        return await asyncio.to_thread(self.store.load_before, model, self.first_seq[model], limit)
+
+    def build_context(self, model, model_config, extra=None, recalled=None, recall_tokens=0, prefix=()):
+        """
+        The messages to send for `model`, fitted to its token budget and led by `prefix`.
+        `extra` is appended for this request only and not stored; `recalled` is
+        [(seq, message)] from long-term memory, quoted within `recall_tokens`.
+        """
+        self._ensure_session(model)
+        history = self.session_memory[model]
+        if recalled:
+            recalled = [(seq - self.first_seq[model], message) for seq, message in recalled]
+        return self._context_window(model).build(
+            history, model_config, self.snapshot.context_window, extra=extra,
+            recalled=recalled, recall_tokens=recall_tokens, prefix=prefix,
+        )
+
+    def end_turn(self, model, model_config):
+        """
+        The reply of a turn is stored: let the context window summarize older messages in
+        the background. A speculative turn is only compacted once it commits.
+        """
+        if model in self.pending_turns:
+            self.pending_compactions[model] = model_config
+            return None
+        if not self.summarizer or model not in self.session_memory:
+            return None
+        window = self._context_window(model)
+        settings = self.snapshot.context_window
+        if model in self.gap_start and settings.enabled:
+            # The restore left older messages out; summarize those before anything newer
+            return window.compact_earlier(self._gap_pages(model, model_config), model_config, settings, self.summarizer)
+        return window.compact(self.session_memory[model], model_config, settings, self.summarizer)
+
+    async def _gap_pages(self, model, model_config):
+        # Pages of the restore gap that fit one summary request each, read off the event loop
+        settings = self.snapshot.context_window
+        page_tokens = ContextWindow.budget(model_config, settings) * settings.compact_at
+        first_seq = self.first_seq[model]
+        while model in self.gap_start and self.gap_start[model] < first_seq:
+            rows = await asyncio.to_thread(
+                self.store.load_after, model, self.gap_start[model], first_seq,
+                self.snapshot.session_store.restore_messages,
+            )
+            if not rows:
+                break
+            page, used = [], 0
+            for seq, message in rows:
+                used += estimate_tokens(message, settings)
+                if page and used > page_tokens:
+                    break
+                page.append((seq, message))
+            end = page[-1][0] + 1
+            yield [message for _, message in page], end - first_seq
+            self.gap_start[model] = end
+        self.gap_start.pop(model, None)
+
+    def window_start_seq(self, model):
+        # First message the context window sends verbatim rather than through the summary
+        self._ensure_session(model)
+        window = self.context_windows.get(model)
+        return self.first_seq[model] + (window.summary_upto if window else 0)
 
     def get_session_memory(self, model):
         self.logger.debug(f"Retrieving session memory for model: {model}")
         return self.session_memory.get(model, [])
 
     def append_to_session_memory(self, model, message):
-        if model not in self.session_memory:
-            self.session_memory[model] = []
-            self.logger.info(f"Created new session list for model: {model}")
+        self._ensure_session(model)
         safe_message = self.system_tools.safe_append_message(message['content'])
         if isinstance(safe_message, str) and safe_message.startswith("{'error':"):
             return self.logger.warning(f"Potential malformed input Rejected: {safe_message}")
         message['content'] = safe_message
         self.session_memory[model].append(message)
+        if model in self.pending_turns:
+            self.pending_turns[model].append((self.next_seq[model], message))
+        else:
+            self._publish(model, self.next_seq[model], message)
+        self.next_seq[model] += 1
         self.logger.debug(f"Appended message to {model}: {message}")
 
+    def _publish(self, model, seq, message):
+        if self.store:
+            self.store.append(model, seq, message)
+        for listener in self.append_listeners:
+            listener(model, seq, message)
+
+    def begin_turn(self, model):
+        """
+        Starts a speculative turn: messages appended to `model` from now on stay in memory
+        only, until commit_turn stores them or rollback_turn removes them again.
+        """
+        self._ensure_session(model)
+        self.pending_turns[model] = []
+
+    def commit_turn(self, model):
+        for seq, message in self.pending_turns.pop(model, ()):
+            self._publish(model, seq, message)
+        model_config = self.pending_compactions.pop(model, None)
+        if model_config:
+            self.end_turn(model, model_config)
+
+    def rollback_turn(self, model):
+        # Returns how many messages were dropped
+        self.pending_compactions.pop(model, None)
+        pending = self.pending_turns.pop(model, None)
+        if not pending:
+            return 0
+        history = self.session_memory[model]
+        del history[len(history) - len(pending):]
+        self.next_seq[model] = pending[0][0]
+        if model in self.context_windows:
+            self.context_windows[model].truncate(len(history))
+        return len(pending)
+
     def clear_session_memory(self, model=None):
         if model:
-            self.session_memory[model] = []
+            self._clear_model(model)
             self.logger.info(f"Cleared session memory for model: {model}")
         else:
             for key in self.session_memory:
-                self.session_memory[key] = []
+                self._clear_model(key)
             self.logger.info("Cleared all session memory")
 
+    def _clear_model(self, model):
+        # The stored history is kept; the next restore simply starts after this point
+        self._ensure_session(model)
+        self.pending_turns.pop(model, None)
+        self.pending_compactions.pop(model, None)
+        self.gap_start.pop(model, None)
+        self.session_memory[model] = []
+        self.first_seq[model] = self.next_seq[model]
+        if model in self.context_windows:
+            self.context_windows[model].reset()
+        if self.store:
+            self.store.start_session(model, self.next_seq[model])
+
+    def close(self):
+        if self.store:
+            self.store.close()
+            self.store = None
+
     def add_to_model_memory(self, role, model, message):
         input_data = {"role": role, "content": message}
         self.append_to_session_memory(model, input_data)
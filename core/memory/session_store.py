@@ -0,0 +1,181 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from core.system.logger import ThreadedLoggerManager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    model TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (model, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sessions (
+    model TEXT PRIMARY KEY,
+    start_seq INTEGER NOT NULL DEFAULT 0,
+    summary TEXT NOT NULL DEFAULT '',
+    summary_seq INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_STOP = object()
+
+
+class SessionStore:
+    """
+    SQLite (WAL) backed session history. Every message gets a per-model sequence number;
+    writes are queued and committed in batches by a writer thread, so appending from the
+    event loop never touches the disk. Reads use their own connection, which WAL lets run
+    alongside the writer.
+
+    A session starts at `start_seq` (moved forward by a clear) and the context summary
+    covers everything before `summary_seq`, so a restore only needs the newest rows after both.
+    """
+
+    def __init__(self, path, flush_interval=0.5, batch_size=100, logger=None):
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.read_lock = threading.Lock()
+        self.stats = {'written': 0, 'batches': 0, 'errors': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.reader = self._connect()
+        self.reader.executescript(SCHEMA)
+        self.writer = threading.Thread(target=self._write_loop, name="session-store", daemon=True)
+        self.writer.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")  # durable across crashes, fsync only at checkpoints
+        return connection
+
+    # Reads, called at startup or through asyncio.to_thread
+
+    def load_session(self, model, limit):
+        """
+        Returns (messages, first_seq, next_seq, summary, summary_seq): the newest `limit`
+        messages not covered by the summary, oldest first. When more are uncovered,
+        first_seq > summary_seq and the rows in between can be paged in with load_after.
+        """
+        with self.read_lock:
+            row = self.reader.execute(
+                "SELECT start_seq, summary, summary_seq FROM sessions WHERE model = ?", (model,)
+            ).fetchone()
+            start_seq, summary, summary_seq = row or (0, "", 0)
+            if summary_seq <= start_seq:
+                summary, summary_seq = "", start_seq
+            next_seq = self.reader.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE model = ?", (model,)
+            ).fetchone()[0]
+            rows = self.reader.execute(
+                "SELECT seq, role, content FROM messages WHERE model = ? AND seq >= ? ORDER BY seq DESC LIMIT ?",
+                (model, summary_seq, limit),
+            ).fetchall()
+        rows.reverse()
+        messages = [{"role": role, "content": content} for _, role, content in rows]
+        next_seq = max(next_seq, start_seq)
+        first_seq = rows[0][0] if rows else max(next_seq, summary_seq)
+        return messages, first_seq, next_seq, summary, summary_seq
+
+    def load_after(self, model, from_seq, before_seq, limit):
+        # [(seq, message)] from from_seq on, oldest first
+        with self.read_lock:
+            rows = self.reader.execute(
+                "SELECT seq, role, content FROM messages WHERE model = ? AND seq >= ? AND seq < ? "
+                "ORDER BY seq LIMIT ?",
+                (model, from_seq, before_seq, limit),
+            ).fetchall()
+        return [(seq, {"role": role, "content": content}) for seq, role, content in rows]
+
+    def load_before(self, model, before_seq, limit):
+        # Older history of the current session, oldest first
+        with self.read_lock:
+            start_seq = self.reader.execute(
+                "SELECT start_seq FROM sessions WHERE model = ?", (model,)
+            ).fetchone()
+            rows = self.reader.execute(
+                "SELECT role, content FROM messages WHERE model = ? AND seq >= ? AND seq < ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (model, start_seq[0] if start_seq else 0, before_seq, limit),
+            ).fetchall()
+        rows.reverse()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    # Writes, queued from any thread
+
+    def append(self, model, seq, message):
+        self.queue.put(("message", (model, seq, message['role'], message['content'], time.time())))
+
+    def save_summary(self, model, summary, summary_seq):
+        self.queue.put(("summary", (model, summary, summary_seq)))
+
+    def start_session(self, model, start_seq):
+        self.queue.put(("clear", (model, start_seq)))
+
+    def _write_loop(self):
+        connection = self._connect()
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0 or batch[-1] is _STOP:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                batch.pop()
+                stopping = True
+            if batch:
+                self._write_batch(connection, batch)
+        connection.close()
+
+    def _write_batch(self, connection, batch):
+        try:
+            with connection:
+                for kind, values in batch:
+                    if kind == "message":
+                        connection.execute(
+                            "INSERT OR REPLACE INTO messages (model, seq, role, content, created) VALUES (?, ?, ?, ?, ?)",
+                            values,
+                        )
+                    elif kind == "summary":
+                        connection.execute(
+                            "INSERT INTO sessions (model, summary, summary_seq) VALUES (?, ?, ?) "
+                            "ON CONFLICT(model) DO UPDATE SET summary = excluded.summary, summary_seq = excluded.summary_seq",
+                            values,
+                        )
+                    elif kind == "clear":
+                        connection.execute(
+                            "INSERT INTO sessions (model, start_seq) VALUES (?, ?) "
+                            "ON CONFLICT(model) DO UPDATE SET start_seq = excluded.start_seq, summary = '', summary_seq = 0",
+                            values,
+                        )
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+        except sqlite3.Error as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"[Session Store] Failed to write {len(batch)} record(s): {e}")
+
+    def close(self):
+        # Flushes everything queued so far
+        if self.writer.is_alive():
+            self.queue.put(_STOP)
+            self.writer.join()
+        with self.read_lock:
+            self.reader.close()
+        self.logger.info(f"[Session Store] Closed ({self.stats['written']} record(s) in {self.stats['batches']} batch(es))")
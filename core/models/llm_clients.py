@@ -0,0 +1,201 @@
+import asyncio
+import time
+from functools import lru_cache
+
+from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
+from core.system.logger import ThreadedLoggerManager
+from core.system.provider_registry import ProviderRegistry, lazy_import
+
+LLM_PROVIDERS = ProviderRegistry("llm")
+LLM_PROVIDERS.register("openai", "_create_openai_client", requires=("httpx", "openai"))
+
+
+@lru_cache(maxsize=1)
+def _counting_transport_class():
+    # httpx transport that keeps a request counted until its body is closed, so pool
+    # stats come from our own counters instead of the SDK's private internals
+    httpx = lazy_import("httpx")
+
+    class CountedStream(httpx.AsyncByteStream):
+        def __init__(self, stream, stats):
+            self.stream = stream
+            self.stats = stats
+            self.counted = True
+
+        async def __aiter__(self):
+            async for chunk in self.stream:
+                yield chunk
+
+        async def aclose(self):
+            if self.counted:
+                self.counted = False
+                self.stats['open_requests'] -= 1
+            await self.stream.aclose()
+
+    class CountingTransport(httpx.AsyncHTTPTransport):
+        def __init__(self, stats, **kwargs):
+            super().__init__(**kwargs)
+            self.stats = stats
+
+        async def handle_async_request(self, request):
+            self.stats['open_requests'] += 1
+            self.stats['peak_open_requests'] = max(self.stats['peak_open_requests'], self.stats['open_requests'])
+            try:
+                response = await super().handle_async_request(request)
+            except BaseException:
+                self.stats['open_requests'] -= 1
+                raise
+            return httpx.Response(
+                response.status_code, headers=response.headers,
+                stream=CountedStream(response.stream, self.stats), extensions=response.extensions,
+            )
+
+    return CountingTransport
+
+
+class LLMClientRegistry:
+    """
+    One long-lived AsyncOpenAI client (and httpx connection pool) per (node, api_key),
+    shared by every turn instead of rebuilding the client on each call.
+    """
+
+    def __init__(self, config=None, logger=None):
+        self.config = config or ConfigLoader().load_config()
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        self.clients = {}
+        self.stats = {}
+        self.keepalive_task = None
+
+    def apply_config(self, config):
+        old_snapshot, new_snapshot = self.snapshot, ConfigSnapshot.for_config(config)
+        self.config = config
+        self.snapshot = new_snapshot
+        self.debug = new_snapshot.system.debug_mode
+
+        if (old_snapshot.llm_clients != new_snapshot.llm_clients
+                or old_snapshot.system.assistant_timeout != new_snapshot.system.assistant_timeout):
+            stale = list(self.clients)
+        else:
+            live = {
+                (node, model.api_key)
+                for model in new_snapshot.models.values() if model.enabled
+                for node in model.nodes or (model.node,)
+            }
+            stale = [key for key in self.clients if key not in live]
+
+        if self.keepalive_task and old_snapshot.llm_clients.keepalive_ping_interval != new_snapshot.llm_clients.keepalive_ping_interval:
+            self.keepalive_task.cancel()
+            self.keepalive_task = None
+            if self.clients:
+                self._ensure_keepalive()
+
+        if stale:
+            clients = [(key, self.clients.pop(key)) for key in stale]
+            for key in stale:
+                self.stats.pop(key, None)
+            self.logger.info(f"[LLM Clients] Dropping {len(clients)} stale client(s) after config change.")
+            asyncio.get_running_loop().create_task(self._close_clients(clients))
+
+    def get_client(self, model_config):
+        key = (model_config.node, model_config.api_key)
+        client = self.clients.get(key) or self._register(key, model_config.provider)
+        self.stats[key]['requests'] += 1
+        self.stats[key]['last_used'] = time.time()
+        return client
+
+    def record_error(self, model_config):
+        key = (model_config.node, model_config.api_key)
+        if key in self.stats:
+            self.stats[key]['errors'] += 1
+
+    def warm_up(self):
+        for model_config in self.snapshot.models.values():
+            if not model_config.enabled:
+                continue
+            for node in model_config.nodes or (model_config.node,):
+                key = (node, model_config.api_key)
+                if node and key not in self.clients:
+                    self._register(key, model_config.provider)
+        self.logger.info(f"[LLM Clients] {len(self.clients)} client(s) ready.")
+
+    def get_pool_stats(self):
+        return {key[0]: dict(self.stats.get(key, {})) for key in self.clients}
+
+    async def close(self):
+        if self.keepalive_task and not self.keepalive_task.done():
+            self.keepalive_task.cancel()
+            try:
+                await self.keepalive_task
+            except asyncio.CancelledError:
+                pass
+        self.keepalive_task = None
+
+        await self._close_clients(list(self.clients.items()))
+        self.clients.clear()
+        self.stats.clear()
+
+    async def _close_clients(self, clients):
+        for key, client in clients:
+            try:
+                await client.close()
+                if self.debug:
+                    self.logger.debug(f"[LLM Clients] Closed client for {key[0]}")
+            except Exception as e:
+                self.logger.warning(f"[LLM Clients] Failed to close client for {key[0]}: {e}")
+
+    def _register(self, key, provider="openai"):
+        factory = LLM_PROVIDERS.bind(self, provider)
+        if factory is None:
+            raise ValueError(f"Unknown LLM provider '{provider}' (registered: {LLM_PROVIDERS.names()})")
+        self.stats[key] = {
+            'created_at': time.time(), 'requests': 0, 'errors': 0, 'last_used': None,
+            'open_requests': 0, 'peak_open_requests': 0,
+        }
+        client = factory(*key)
+        self.clients[key] = client
+        self._ensure_keepalive()
+        return client
+
+    def _create_openai_client(self, node, api_key):
+        httpx = lazy_import("httpx")
+        client_config = self.snapshot.llm_clients
+        limits = httpx.Limits(
+            max_connections=client_config.max_connections,
+            max_keepalive_connections=client_config.max_keepalive_connections,
+            keepalive_expiry=client_config.keepalive_expiry,
+        )
+        timeout = self.snapshot.system.assistant_timeout
+        transport = _counting_transport_class()(self.stats[(node, api_key)], limits=limits)
+        http_client = httpx.AsyncClient(transport=transport, timeout=httpx.Timeout(timeout, connect=5.0))
+        self.logger.info(f"[LLM Clients] Creating pooled client for {node}")
+        # Retries are paced by the pipeline (backoff, retry budget, other nodes), not by the SDK
+        return lazy_import("openai").AsyncOpenAI(
+            base_url=node, api_key=api_key, http_client=http_client, max_retries=0
+        )
+
+    def _ensure_keepalive(self):
+        interval = self.snapshot.llm_clients.keepalive_ping_interval
+        if not interval or (self.keepalive_task and not self.keepalive_task.done()):
+            return
+        try:
+            self.keepalive_task = asyncio.get_running_loop().create_task(self._keepalive_loop(interval))
+        except RuntimeError:
+            # No running loop yet; the next get_client from inside the loop starts it
+            pass
+
+    async def _keepalive_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            for key, client in list(self.clients.items()):
+                last_used = self.stats.get(key, {}).get('last_used') or 0
+                if time.time() - last_used < interval:
+                    continue
+                try:
+                    await client.models.list()
+                except Exception as e:
+                    if self.debug:
+                        self.logger.debug(f"[LLM Clients] Keep-alive ping to {key[0]} failed: {e}")
+
@@ -1,8 +1,28 @@
 import asyncio
+import re
 import time
-from openai import AsyncOpenAI, OpenAIError
+from dataclasses import replace
 from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
 from core.system.logger import ThreadedLoggerManager
+from core.models.llm_clients import LLMClientRegistry
+from core.models.prompt_builder import PromptBuilder, TTFTTracker
+from core.models.response_cache import ResponseCache
+from core.models.node_balancer import NodeBalancer
+from core.system.provider_health import ProviderError, ProviderHealth
+from core.system.provider_registry import lazy_import
+
+ERROR_RESPONSE = "I'm sorry, I encountered an error while processing your request."
+FAILURE_RESPONSE = "Astrape encountered an error while processing your request."
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below for your own future reference. Keep names, facts, "
+    "decisions and open questions; drop small talk. Reply with the summary only."
+)
+
+
+class PartialResponseError(ProviderError):
+    """The stream broke after part of the answer was yielded; that part stands and is not retried."""
 
 
 class LLMPipeline:
@@ -10,15 +30,39 @@ class LLMPipeline:
         self.config = config or ConfigLoader().load_config()
         self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
         self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        self.clients = LLMClientRegistry(config=self.config, logger=self.logger)
+        self.health = ProviderHealth("llm", self.snapshot.provider_health, logger=self.logger)
+        self.prompts = PromptBuilder(config=self.config, logger=self.logger)
+        self.ttft = TTFTTracker()
+        self.response_cache = ResponseCache(self.snapshot.response_cache, logger=self.logger)
+        self.balancer = NodeBalancer(self.health, self.clients, logger=self.logger)
+        # Cache entries of a speculative turn, held back until it is committed
+        self.pending_cache = {}
+
+    def apply_config(self, config):
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.config = config
+        self.debug = self.snapshot.system.debug_mode
+        self.clients.apply_config(config)
+        self.health.apply_settings(self.snapshot.provider_health)
+        self.prompts.apply_config(config)
+        self.response_cache.apply_settings(self.snapshot.response_cache)
 
     async def get_llm_response(self, user_input, session_chat_history, model_config):
         if not user_input:
             self.logger.warning("No user input transcript found.")
             return session_chat_history, None
 
-        session_chat_history.append({"role": "user", "content": user_input})
+        cache_key = self._cache_key(user_input, session_chat_history, model_config)
+        if cache_key:
+            cached = self.response_cache.get(model_config.key, cache_key)
+            if cached is not None:
+                self.logger.info("[LLM Cache] Serving cached response.")
+                return cached
+
         try:
-            if model_config.get("stream_output", False):
+            if model_config.stream_output:
                 # Use streaming and collect into full response
                 self.logger.debug("Using streaming LLM response.")
                 chunks = []
@@ -29,88 +73,223 @@ class LLMPipeline:
                 self.logger.debug("Using non-streaming LLM response.")
                 response = await self.call_llm_api_non_streaming(model_config, session_chat_history)
 
+        except PartialResponseError as e:
+            self.logger.warning(f"[LLM API] {e}")
+            response = "".join(chunks)
+            cache_key = None  # a cut-off answer is never reused
+
         except Exception as e:
             self.logger.error(f"Error during LLM response generation: {e}")
-            response = "I'm sorry, I encountered an error while processing your request."
+            response = ERROR_RESPONSE
 
+        self._cache_store(cache_key, user_input, response, model_config)
         return response
 
-    async def call_llm_api_non_streaming(self, model_config, session_chat_history):
-        client = AsyncOpenAI(base_url=model_config.get('node'), api_key=model_config.get('api_key'))
-        model_name = model_config.get('model', 'gpt-3.5-turbo')
+    def _cache_key(self, user_input, session_chat_history, model_config):
+        # None when this request must not be answered from (or stored in) the cache
+        role = None
+        if self.snapshot.response_cache.roles and model_config.temperature != 0:
+            role = self.prompts.system_tools.classify_intent(user_input)
+        if not self.response_cache.cacheable(model_config, user_input, role):
+            return None
+        return self.response_cache.make_key(model_config, user_input, session_chat_history)
 
-        self.logger.info(f"[LLM API Fallback] Using non-streamed method for '{model_name}'")
+    def _cache_store(self, cache_key, user_input, response, model_config):
+        if cache_key and response and response != ERROR_RESPONSE and not response.endswith(FAILURE_RESPONSE):
+            ttl = self.response_cache.ttl_for(user_input)
+            pending = self.pending_cache.get(model_config.key)
+            if pending is not None:
+                pending.append((cache_key, response, ttl))
+            else:
+                self.response_cache.put(model_config.key, cache_key, response, ttl)
 
-        response = await client.chat.completions.create(
-            model=model_name,
-            messages=session_chat_history,
-            temperature=model_config.get('temperature', 0.7),
-            max_tokens=model_config.get('max_tokens', 150),
-            stream=False
+    def begin_turn(self, model_key):
+        # Answers of a speculative turn only reach the cache once the turn is kept
+        self.pending_cache[model_key] = []
+
+    def commit_turn(self, model_key):
+        for cache_key, response, ttl in self.pending_cache.pop(model_key, ()):
+            self.response_cache.put(model_key, cache_key, response, ttl)
+
+    def rollback_turn(self, model_key):
+        self.pending_cache.pop(model_key, None)
+
+    async def summarize_history(self, previous_summary, messages, model_config):
+        # Used by the context window to fold old turns into its rolling summary
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        if previous_summary:
+            transcript = f"Summary so far: {previous_summary}\n\n{transcript}"
+        request = [
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": transcript},
+        ]
+        settings = replace(
+            model_config, max_tokens=self.snapshot.context_window.summary_max_tokens, temperature=0.2
         )
+        return await self.call_llm_api_non_streaming(settings, request, track_ttft=False)
+
+    async def call_llm_api_non_streaming(self, model_config, session_chat_history, track_ttft=True):
+        model_name = model_config.model
+        target = self.balancer.pick(model_config)
+        if target is None or not self.health.allow(target.node):
+            raise RuntimeError(f"No healthy node for model '{model_config.key}'")
+        node = target.node
+        self.logger.info(f"[LLM API Fallback] Using non-streamed method for '{model_name}' on {node}")
+
+        reuse = self.ttft.observe(model_config.key, session_chat_history) if track_ttft else 0.0
+        started = time.perf_counter()
+        outcome = None
+        try:
+            with self.balancer.track(node):
+                response = await self.clients.get_client(target).chat.completions.create(
+                    model=model_name,
+                    messages=session_chat_history,
+                    temperature=model_config.temperature,
+                    max_tokens=model_config.max_tokens,
+                    stream=False
+                )
+            outcome = True
+        except Exception:
+            outcome = False
+            self.clients.record_error(target)
+            self.balancer.on_failure(target)
+            raise
+        finally:
+            self._record_outcome(node, started, outcome)
+        if track_ttft:
+            # Without streaming the first token arrives with the last one
+            self.ttft.record(model_config.key, time.perf_counter() - started, reuse)
         return response.choices[0].message.content.strip()
 
-    async def call_llm_api(self, model_config, session_chat_history, tts_handler):
-        client = AsyncOpenAI(base_url=model_config.get('node'), api_key=model_config.get('api_key'))
-        model_name = model_config.get('model', 'gpt-3.5-turbo')
+    async def call_llm_api(self, model_config, session_chat_history):
+        model_name = model_config.model
 
-        system_settings = self.config.get('system_settings', {})
-        retry_attempts = system_settings.get('assistant_retry_attempts', 3)
-        retry_delay = system_settings.get('assistant_retry_delay', 5)
+        retry_attempts = self.snapshot.system.assistant_retry_attempts
+        retry_delay = self.snapshot.system.assistant_retry_delay
 
         max_attempts = float('inf') if retry_attempts == 0 else retry_attempts
         attempt = 0
+        self.health.begin()
+        reuse = self.ttft.observe(model_config.key, session_chat_history)
 
         while attempt < max_attempts:
+            # Every attempt picks again, so a retry lands on another node of the pool
+            target = self.balancer.pick(model_config)
+            if target is None or not self.health.allow(target.node):
+                self.logger.error(f"[LLM API] No healthy node for '{model_config.key}', failing fast.")
+                break
+            node = target.node
             attempt += 1
+            started = time.perf_counter()
+            final_response = ""
+            outcome = None
             try:
-                self.logger.info(f"[LLM API] Attempt {attempt} using model '{model_name}' with streaming")
-                stream = await client.chat.completions.create(
-                    model=model_name,
-                    messages=session_chat_history,
-                    temperature=model_config.get('temperature', 0.7),
-                    max_tokens=model_config.get('max_tokens', 150),
-                    stream=True
-                )
+                with self.balancer.track(node):
+                    self.logger.info(f"[LLM API] Attempt {attempt} using model '{model_name}' on {node} with streaming")
+                    stream = await self.clients.get_client(target).chat.completions.create(
+                        model=model_name,
+                        messages=session_chat_history,
+                        temperature=model_config.temperature,
+                        max_tokens=model_config.max_tokens,
+                        stream=True
+                    )
 
-                final_response = ""
-                async for chunk in stream:
-                    delta = chunk.choices[0].delta.content if chunk.choices[0].delta else ""
-                    if delta:
-                        final_response += delta
-                        yield delta  # Stream this partial to whatever is listening
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices[0].delta else ""
+                        if delta:
+                            if not final_response:
+                                ttft = time.perf_counter() - started
+                                self.ttft.record(model_config.key, ttft, reuse)
+                                if self.debug:
+                                    self.logger.debug(f"[LLM API] First token after {ttft * 1000:.0f} ms (prefix reuse {reuse:.0%})")
+                            final_response += delta
+                            yield delta  # Stream this partial to whatever is listening
 
+                outcome = True
                 self.logger.info("[LLM API] Streaming complete.")
                 return  # End the generator after successful stream
 
-            except OpenAIError as e:
+            except lazy_import("openai").OpenAIError as e:
+                outcome = False
+                self.clients.record_error(target)
+                self.balancer.on_failure(target)
+                if final_response:
+                    # The opening is already spoken and part of the turn, a retry would repeat it
+                    raise PartialResponseError(
+                        f"Stream from {node} broke after {len(final_response)} characters, ending the turn there: {e}"
+                    ) from e
                 self.logger.warning(f"[LLM API] Streaming failed on attempt {attempt}: {e}")
-                self.logger.info("[LLM API] Falling back to non-streaming mode")
+            except Exception:
+                # Not a backend error as such (a malformed chunk, say), but the node still failed the call
+                outcome = False
+                self.clients.record_error(target)
+                self.balancer.on_failure(target)
+                raise
+            finally:
+                self._record_outcome(node, started, outcome)
 
             if attempt < max_attempts:
-                delay = retry_delay * attempt
-                self.logger.info(f"[LLM API] Retrying in {delay} seconds...")
+                delay = self.health.retry_delay(attempt, retry_delay)
+                if delay is None:
+                    self.logger.error("[LLM API] Retry budget exhausted, giving up.")
+                    break
+                self.logger.info(f"[LLM API] Retrying in {delay:.2f} seconds...")
                 await asyncio.sleep(delay)
 
         self.logger.critical("[LLM API] All retry attempts failed.")
-        yield "Astrape encountered an error while processing your request."
+        yield FAILURE_RESPONSE
+
+    def _record_outcome(self, node, started, outcome):
+        # Runs on every exit path: a half-open node whose probe records nothing is never tried again
+        if outcome is None:
+            self.health.record_abandoned(node, time.perf_counter() - started)
+        else:
+            self.health.record(node, time.perf_counter() - started, ok=outcome)
 
     async def stream_llm_response(self, user_input, session_chat_history, model_config, tts_handler):
         if not user_input:
             self.logger.warning("No user input transcript found.")
             return session_chat_history, None
 
-        session_chat_history.append({"role": "user", "content": user_input})
+        cache_key = self._cache_key(user_input, session_chat_history, model_config)
+        cached = self.response_cache.get(model_config.key, cache_key) if cache_key else None
+        if cached is not None:
+            # Replayed through the same token path as a live answer, so it is chunked alike
+            self.logger.info("[LLM Cache] Serving cached response.")
+            tokens, cache_key = self._replay(cached), None
+        else:
+            self.logger.debug("Using streaming LLM response.")
+            tokens = self.call_llm_api(model_config, session_chat_history)
+
         response = ""
         try:
-            self.logger.debug("Using streaming LLM response.")
-            async for token in self.call_llm_api(model_config, session_chat_history):
+            async for token in tokens:
                 response += token
                 await tts_handler.handle_token(token)
 
+        except PartialResponseError as e:
+            self.logger.warning(f"[LLM API] {e}")
+            cache_key = None  # a cut-off answer is never reused
+
         except Exception as e:
             self.logger.error(f"Error during LLM streaming: {e}")
-            response = "I'm sorry, I encountered an error while processing your request."
+            response = ERROR_RESPONSE
             await tts_handler.speak(response)
 
-        return response
\ No newline at end of file
+        self._cache_store(cache_key, user_input, response, model_config)
+        return response
+
+    @staticmethod
+    async def _replay(text):
+        for token in re.findall(r"\s*\S+|\s+", text):
+            yield token
+
+    def get_pool_stats(self):
+        stats = self.clients.get_pool_stats()
+        for node, entry in self.balancer.summary().items():
+            stats.setdefault(node, {}).update(entry)
+        return stats
+
+    async def close(self):
+        await self.balancer.close()
+        await self.clients.close()
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+
+from core.system.logger import ThreadedLoggerManager
+from core.system.provider_health import CLOSED, OPEN
+
+
+class NodeBalancer:
+    """
+    Spreads a model's requests over its pool of nodes. Each request goes to the healthy
+    node with the lowest (outstanding requests + 1) x recent median latency, so a busy or
+    slow box gets less traffic. Failing nodes are drained by the ProviderHealth circuit
+    breakers; a background probe (GET /models) closes the circuit again once the node
+    answers, so user requests are not the ones testing a node that just came back.
+    """
+
+    def __init__(self, health, clients, probe_interval=2.0, logger=None):
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.health = health
+        self.clients = clients
+        self.probe_interval = probe_interval
+        self.nodes = {}
+        self.probe_tasks = {}
+
+    def _node(self, node):
+        entry = self.nodes.get(node)
+        if entry is None:
+            entry = self.nodes[node] = {'outstanding': 0, 'peak': 0, 'requests': 0}
+        return entry
+
+    def pick(self, model_config):
+        """
+        model_config with `node` set to the node to use, or None when the whole pool is
+        drained. Nodes whose circuit is merely waiting for a probe are only used when no
+        node is fully healthy.
+        """
+        pool = model_config.nodes or (model_config.node,)
+        if len(pool) == 1:
+            return model_config if self.health.available(pool[0]) else self._drained(model_config, pool)
+
+        candidates = self.health.route(pool)
+        closed = [node for node in candidates if self._state(node) == CLOSED]
+        candidates = closed or candidates
+        if not candidates:
+            return self._drained(model_config, pool)
+
+        fallback = min((self.health.percentile(node, 50) for node in candidates
+                        if self.health.percentile(node, 50) is not None), default=1.0)
+
+        def load(node):
+            latency = self.health.percentile(node, 50)
+            return (self._node(node)['outstanding'] + 1) * (latency if latency is not None else fallback)
+
+        node = min(candidates, key=load)
+        return model_config if node == model_config.node else replace(model_config, node=node)
+
+    def _state(self, node):
+        breaker = self.health.breakers.get(node)
+        return breaker.state if breaker else CLOSED
+
+    def _drained(self, model_config, pool):
+        self._ensure_probe(model_config)
+        self.logger.error(f"[LLM Balancer] Every node of '{model_config.key}' is drained: {list(pool)}")
+        return None
+
+    @contextmanager
+    def track(self, node):
+        entry = self._node(node)
+        entry['outstanding'] += 1
+        entry['requests'] += 1
+        entry['peak'] = max(entry['peak'], entry['outstanding'])
+        try:
+            yield
+        finally:
+            entry['outstanding'] -= 1
+
+    def on_failure(self, model_config):
+        # Called after a failed call so an opened circuit gets probed in the background
+        if self._state(model_config.node) == OPEN:
+            self._ensure_probe(model_config)
+
+    def _ensure_probe(self, model_config):
+        task = self.probe_tasks.get(model_config.key)
+        if task and not task.done():
+            return
+        self.probe_tasks[model_config.key] = asyncio.get_running_loop().create_task(self._probe_loop(model_config))
+
+    async def _probe_loop(self, model_config):
+        pool = model_config.nodes or (model_config.node,)
+        while any(self._state(node) != CLOSED for node in pool):
+            for node in pool:
+                if self._state(node) == CLOSED or not self.health.allow(node):
+                    continue  # healthy, or still cooling down
+                started = time.perf_counter()
+                try:
+                    client = self.clients.get_client(replace(model_config, node=node))
+                    await asyncio.wait_for(client.models.list(), timeout=5)
+                except Exception as e:
+                    self.health.record(node, time.perf_counter() - started, ok=False)
+                    self.logger.warning(f"[LLM Balancer] Probe of {node} failed: {e!r}")
+                else:
+                    # Probe latency says nothing about generation speed, keep it out of the window
+                    self.health.record_probe_success(node)
+                    self.logger.info(f"[LLM Balancer] {node} answered its probe, back in rotation.")
+            await asyncio.sleep(self.probe_interval)
+
+    def summary(self):
+        return {
+            node: dict(entry, state=self._state(node), p50_ms=(
+                round(self.health.percentile(node, 50) * 1000) if self.health.percentile(node, 50) is not None else None
+            ))
+            for node, entry in self.nodes.items()
+        }
+
+    async def close(self):
+        for task in self.probe_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.probe_tasks.values(), return_exceptions=True)
+        self.probe_tasks.clear()
@@ -0,0 +1,122 @@
+from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
+from core.system.logger import ThreadedLoggerManager
+from core.system.provider_stats import RollingLatency
+from core.system.utils.system_tools import SystemTools
+
+
+class PromptBuilder:
+    """
+    Builds the fixed head of every request: general system prompt, model persona and
+    tools, as one system message. It is rendered once per model and config version and
+    the very same string is reused, so the servers' prefix (KV) cache can skip it.
+    """
+
+    def __init__(self, config=None, logger=None):
+        self.config = config or ConfigLoader().load_config()
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        self.system_tools = SystemTools(config=self.config, logger=self.logger)
+        self.prefixes = {}
+
+    def apply_config(self, config):
+        self.config = config
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.debug = self.snapshot.system.debug_mode
+        self.system_tools.apply_config(config)
+        self.prefixes = {}
+
+    def prefix(self, model_config):
+        prefix = self.prefixes.get(model_config.key)
+        if prefix is None:
+            prefix = self.prefixes[model_config.key] = self._render(model_config)
+        return prefix
+
+    def _render(self, model_config):
+        parts = [self.snapshot.system.general_system_prompt.strip()]
+        parts.append(self.system_tools.generate_system_prompt_for_model(model_config.key))
+        tools = self.system_tools.get_available_tools() if 'tools' in self.config else []
+        if tools:
+            parts.append("Tools you can use: " + ", ".join(sorted(tools)) + ".")
+        content = "\n\n".join(part for part in parts if part)
+        if not content:
+            return ()
+        if self.debug:
+            self.logger.debug(f"[Prompt] Prefix for {model_config.key}: {content!r}")
+        return ({"role": "system", "content": content},)
+
+
+def common_prefix_length(a, b):
+    # Binary search on slice equality, so the comparisons run in C rather than per character
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class TTFTTracker:
+    """
+    Time to first token per model, split by how much of the request repeats the previous
+    one for that model: requests sharing most of their text should hit the server's
+    prefix cache, so their TTFT against the rest shows what the cache buys.
+    """
+
+    def __init__(self, window=50, warm_share=0.5):
+        self.window = window
+        self.warm_share = warm_share
+        self.last_requests = {}
+        self.models = {}
+
+    @staticmethod
+    def _render(message):
+        # Roughly what a chat template makes of a message; the role is part of the prefix
+        return f"<{message.get('role')}>{message.get('content') or ''}\n"
+
+    def observe(self, model, messages):
+        # Share of this request's text (in characters) the server has already seen as a
+        # prefix of the previous request, down to the first differing character
+        previous = self.last_requests.get(model, ())
+        rendered = [self._render(message) for message in messages]
+        total = sum(len(text) for text in rendered)
+        shared = 0
+        for old, new in zip(previous, rendered):
+            if old == new:
+                shared += len(new)
+                continue
+            shared += common_prefix_length(old, new)
+            break
+        self.last_requests[model] = rendered
+        return shared / total if total else 0.0
+
+    def record(self, model, seconds, reuse):
+        entry = self.models.get(model)
+        if entry is None:
+            entry = self.models[model] = {
+                'warm': RollingLatency(self.window),
+                'cold': RollingLatency(self.window),
+                'reuse': RollingLatency(self.window),
+                'warm_calls': 0,
+                'cold_calls': 0,
+            }
+        kind = 'warm' if reuse >= self.warm_share else 'cold'
+        entry[kind].record(seconds)
+        entry[f'{kind}_calls'] += 1
+        entry['reuse'].record(reuse)
+
+    def summary(self):
+        summary = {}
+        for model, entry in self.models.items():
+            report = {}
+            for kind in ('warm', 'cold'):
+                p50 = entry[kind].percentile(50)
+                report[f'{kind}_calls'] = entry[f'{kind}_calls']
+                report[f'{kind}_p50_ms'] = round(p50 * 1000) if p50 is not None else None
+            reuse = entry['reuse'].percentile(50)
+            report['median_prefix_reuse'] = round(reuse, 2) if reuse is not None else None
+            summary[model] = report
+        return summary
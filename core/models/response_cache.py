@@ -0,0 +1,98 @@
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+
+from core.system.logger import ThreadedLoggerManager
+from listen.phrase_matcher import PhraseMatcher
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_prompt(prompt):
+    # "What time is it?" and "what time is it" are the same question
+    return " ".join(PUNCTUATION.sub(" ", str(prompt).lower()).split())
+
+
+class ResponseCache:
+    """
+    In-memory LRU of finished LLM responses with a TTL per entry. The key covers the model
+    and its sampling parameters, the normalized prompt and a hash of the messages right
+    before it (prompt prefix plus the last `history_messages`), so an answer is only
+    reused in the same kind of context. Which requests may be cached is decided per model;
+    prompts naming something that changes by the minute (`volatile_words`) get their own TTL.
+    """
+
+    def __init__(self, settings, logger=None):
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.settings = settings
+        self.volatile = PhraseMatcher({"volatile": settings.volatile_words}, whole_words=True)
+        self.entries = OrderedDict()
+        self.stats = {}
+
+    def apply_settings(self, settings):
+        if settings != self.settings:
+            self.settings = settings
+            self.volatile = PhraseMatcher({"volatile": settings.volatile_words}, whole_words=True)
+            self.entries.clear()
+
+    def ttl_for(self, prompt):
+        if self.volatile.match(prompt):
+            return self.settings.volatile_ttl_seconds
+        return self.settings.ttl_seconds
+
+    def cacheable(self, model_config, prompt, role=None):
+        if not self.settings.enabled or not model_config.cache_responses or self.ttl_for(prompt) <= 0:
+            return False
+        if not self.settings.deterministic_only or model_config.temperature == 0:
+            return True
+        return role is not None and role in self.settings.roles
+
+    def make_key(self, model_config, prompt, messages):
+        context = [messages[0]] if messages and messages[0].get('role') == 'system' else []
+        # The prompt is the last message; the window is what came right before it
+        window = self.settings.history_messages
+        if window:
+            context += messages[-window - 1:-1]
+        payload = json.dumps(
+            [model_config.node, model_config.model, model_config.temperature, model_config.max_tokens,
+             normalize_prompt(prompt), context],
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _model_stats(self, model):
+        stats = self.stats.get(model)
+        if stats is None:
+            stats = self.stats[model] = {'hits': 0, 'misses': 0, 'expired': 0, 'stored': 0}
+        return stats
+
+    def get(self, model, key):
+        stats = self._model_stats(model)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self.entries[key]
+            stats['expired'] += 1
+            entry = None
+        if entry is None:
+            stats['misses'] += 1
+            return None
+        self.entries.move_to_end(key)
+        stats['hits'] += 1
+        return entry[1]
+
+    def put(self, model, key, response, ttl=None):
+        ttl = self.settings.ttl_seconds if ttl is None else ttl
+        self.entries[key] = (time.monotonic() + ttl, response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.settings.max_entries:
+            self.entries.popitem(last=False)
+        self._model_stats(model)['stored'] += 1
+
+    def summary(self):
+        summary = {}
+        for model, stats in self.stats.items():
+            lookups = stats['hits'] + stats['misses']
+            summary[model] = dict(stats, hit_rate=round(stats['hits'] / lookups, 2) if lookups else None)
+        return summary
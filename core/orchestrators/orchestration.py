@@ -1,86 +1,226 @@
-import concurrent.futures
 import traceback
 import asyncio
+import time
 
-from core.models.llm_pipeline import LLMPipeline
+from core.models.llm_pipeline import ERROR_RESPONSE, LLMPipeline
 from listen.mic_input import MicInput
 from listen.events import EventManager
+from listen.wake_gate import WakeGate
 from speech.speech_to_text import SpeechToText
 from speech.text_to_speech import TextToSpeech
+from speech.speech_stream import StreamingSpeechHandler
+from speech.stt_stream import StreamingSpeechToText
 from core.memory.session_memory import SessionMemoryManager
+from core.memory.long_term_memory import LongTermMemory
 from core.system.logger import ThreadedLoggerManager
 from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
 from core.system.utils.basic_tools import BasicTools
 from core.system.utils.system_tools import SystemTools
 from core.system.event_handler import EventQueue
+from core.system.provider_registry import lazy_import_times
+from core.system.http_transport import HttpTransport
 from listen.events import EventType
 
 import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../")))
 
-
 class OrchestrationPipeline:
     def __init__(self, config=None, logger=None):
         self.config = config or ConfigLoader().load_config()
         self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
         self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.snapshot = ConfigSnapshot.for_config(self.config)
         self.llm_pipeline = LLMPipeline(config=self.config, logger=self.logger)
         self.session_memory = SessionMemoryManager(config=self.config, logger=self.logger)
-        self.speech_to_text = SpeechToText(config=self.config, logger=self.logger)
+        self.http_transport = HttpTransport(config=self.config, logger=self.logger)
+        self.speech_to_text = SpeechToText(config=self.config, logger=self.logger, http=self.http_transport)
         self.mic_input = MicInput(config=self.config, logger=self.logger)
-        self.text_to_speech = TextToSpeech(config=self.config, logger=self.logger)
+        self.text_to_speech = TextToSpeech(config=self.config, logger=self.logger, http=self.http_transport)
         self.system_tools = SystemTools(config=self.config, logger=self.logger)
         self.event_manager = EventManager(config=self.config, logger=self.logger)
+        self.wake_gate = WakeGate(config=self.config, logger=self.logger)
         self.event_queue = EventQueue()
+        self.text_to_speech.playback_listeners.append(self.mic_input.set_playback_active)
+        self.session_memory.set_summarizer(self.llm_pipeline.summarize_history)
+        self.long_term_memory = LongTermMemory(
+            config=self.config, logger=self.logger, clients=self.llm_pipeline.clients,
+            stable_seq=self.session_memory.store is not None,
+        )
+        self.session_memory.append_listeners.append(self.long_term_memory.remember)
+        capture_engine = self.mic_input.capture_engine
+        self.stream_stt = StreamingSpeechToText(
+            self.speech_to_text, sample_rate=capture_engine.sample_rate if capture_engine else 16000,
+            config=self.config, logger=self.logger,
+        )
+        self.stream_stt.partial_listeners.append(self.check_partial_transcript)
+        if capture_engine:
+            capture_engine.stream_listeners.append(self.stream_stt.handle_audio)
+        elif self.stream_stt.enabled:
+            self.logger.warning("Streaming STT needs mic_capture_mode 'persistent', utterances are uploaded whole.")
         if self.debug:
             self.logger.debug("OrchestrationPipeline initialized with debug mode ON")
 
-    async def run_llm_pipeline(self, user_speech_as_text):
-        parsed_response, model_designation, model_config = None, None, None
-        model_designation = self.config['system_settings'].get('default_model_designation')
+    def apply_config(self, config):
+        changed = ConfigLoader.diff_sections(self.config, config)
+        if not changed:
+            return False
+
+        # Everything below is synchronous, so no turn can observe a half-applied config
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.config = config
+        self.debug = self.snapshot.system.debug_mode
+        for component in (
+            self.llm_pipeline,
+            self.session_memory,
+            self.long_term_memory,
+            self.speech_to_text,
+            self.stream_stt,
+            self.mic_input,
+            self.text_to_speech,
+            self.system_tools,
+            self.event_manager,
+            self.wake_gate,
+            self.http_transport,
+        ):
+            component.apply_config(config)
+
+        self.logger.info(f"Config version {self.snapshot.version} applied, changed: {sorted(changed)}")
+        return True
+
+    def select_model(self, user_speech_as_text):
+        # Role from the compiled keyword router, then the best scoring enabled model for it
+        # that still has a reachable node; the default model otherwise
+        default = self.snapshot.system.default_model_designation
+        role = self.system_tools.classify_intent(user_speech_as_text)
+        for designation in self.system_tools.get_model_based_on_role(role):
+            model_config = self.snapshot.models.get(designation)
+            if not model_config or not model_config.enabled:
+                continue
+            if any(self.llm_pipeline.health.available(node) for node in model_config.nodes or (model_config.node,)):
+                if designation != default:
+                    self.logger.info(f"[Router] '{role}' request routed to {designation}")
+                return designation
+        return default
+
+    async def run_llm_pipeline(self, user_speech_as_text, model_designation=None, speech_gate=None):
+        parsed_response, model_config = None, None
+        model_designation = model_designation or self.select_model(user_speech_as_text)
+        tts_handler = None
         try:
-            model_config = self.config['models'].get(model_designation)
+            model_config = self.snapshot.models.get(model_designation)
+            if model_config.stream_output:
+                tts_handler = StreamingSpeechHandler(
+                    self.text_to_speech, model_config, config=self.config, logger=self.logger, gate=speech_gate
+                )
+                tts_handler.start()
             parsed_response = await self.process_llm_call(
                 user_speech_as_text,
                 model_designation,
                 model_config,
                 append_who="user",
+                tts_handler=tts_handler,
             )
+        except asyncio.CancelledError:
+            # Nothing of a cancelled turn may still be spoken
+            if tts_handler:
+                tts_handler.cancel()
+                tts_handler = None
+            raise
         except Exception as e:
             self.logger.error(f"Error in LLM pipeline: {e}\n{traceback.format_exc()}")
+        finally:
+            if tts_handler:
+                await tts_handler.finish()
+
+        if parsed_response and tts_handler:
+            # Everything was already spoken chunk by chunk while the model generated
+            parsed_response['spoken'] = True
         return parsed_response, model_designation, model_config
 
+    async def run_speculative_pipeline(self, user_speech_as_text):
+        """
+        Starts the LLM turn right away and checks the transcript for events alongside it.
+        Returns (event_check, llm_result); on any event the turn is cancelled, its messages
+        are rolled back out of session memory and llm_result is None, so the main loop deals
+        with the event first (an emergency must not wait for an answer to finish playing).
+        Streamed speech is held until the event check has passed.
+        """
+        model_designation = self.select_model(user_speech_as_text)
+        self.session_memory.begin_turn(model_designation)
+        self.llm_pipeline.begin_turn(model_designation)
+        speech_gate = asyncio.Event()
+        started = time.perf_counter()
+        llm_task = asyncio.create_task(
+            self.run_llm_pipeline(user_speech_as_text, model_designation=model_designation, speech_gate=speech_gate)
+        )
+        try:
+            event_check = await self.process_event(user_speech_as_text)
+            if event_check.get('event_type', EventType.CONTINUE) != EventType.CONTINUE:
+                llm_task.cancel()
+                await asyncio.gather(llm_task, return_exceptions=True)
+                dropped = self.session_memory.rollback_turn(model_designation)
+                self.llm_pipeline.rollback_turn(model_designation)
+                self.logger.info(
+                    f"[Speculative] {event_check['event_type'].value} event after "
+                    f"{(time.perf_counter() - started) * 1000:.0f} ms, LLM turn cancelled and "
+                    f"{dropped} message(s) rolled back"
+                )
+                return event_check, None
+            speech_gate.set()
+            result = await llm_task
+        except BaseException:
+            llm_task.cancel()
+            await asyncio.gather(llm_task, return_exceptions=True)
+            self.session_memory.rollback_turn(model_designation)
+            self.llm_pipeline.rollback_turn(model_designation)
+            raise
+        self.session_memory.commit_turn(model_designation)
+        self.llm_pipeline.commit_turn(model_designation)
+        return event_check, result
+
     async def speak_statement(self, parsed_response, model_config):
+        # Returns the queued playback handle; await it to wait for the end of the statement
         try:
             natural_output = parsed_response.get('natural_output', False)
             if natural_output:
-                await self.text_to_speech.give_text_to_speech(natural_output, model_config)
-            else:
-                self.logger.info("No natural output to speak.")
+                return await self.text_to_speech.queue_speech(natural_output, model_config)
+            self.logger.info("No natural output to speak.")
         except Exception as e:
             self.logger.error(f"Error in speaking statement: {e}\n{traceback.format_exc()}")
+        return None
 
     async def speak_questions(self, parsed_response, model_config):
         try:
             confirmation = parsed_response.get('confirmation', False)
             if confirmation:
-                await self.text_to_speech.give_text_to_speech(confirmation, model_config)
-            else:
-                self.logger.info("No confirmation to speak.")
+                return await self.text_to_speech.queue_speech(confirmation, model_config)
+            self.logger.info("No confirmation to speak.")
         except Exception as e:
             self.logger.error(f"Error in speaking confirmation: {e}\n{traceback.format_exc()}")
+        return None
 
     async def llm_response_pipeline(self, parsed_response, model_config, model_designation):
-        try:
-            # Run TTS and tool execution concurrently
-            speak_task = asyncio.create_task(self.speak_statement(parsed_response, model_config))
-
-            await asyncio.gather(speak_task)
+        if parsed_response.get('spoken', False):
+            if self.debug:
+                self.logger.debug("Response already spoken during streaming, skipping TTS.")
+            return
 
-            # Handle confirmations
-            await self.speak_questions(parsed_response, model_config)
-            
+        handles = []
+        try:
+            # The confirmation is synthesized while the statement plays and queued right
+            # behind it, so the two are spoken back to back
+            handles.append(await self.speak_statement(parsed_response, model_config))
+            handles.append(await self.speak_questions(parsed_response, model_config))
+            for handle in handles:
+                if handle:
+                    await handle
+        except asyncio.CancelledError:
+            for handle in handles:
+                if handle:
+                    handle.cancel()
+            raise
         except Exception as e:
             self.logger.error(f"Error Executing Async Response Pipeline: {e}\n{traceback.format_exc()}")
 
@@ -89,21 +229,34 @@ class OrchestrationPipeline:
         parsed_response = await self.process_llm_call(reprompt, model_designation, model_config, append_who="tool")
         return parsed_response
 
-    async def process_llm_call(self, prompt, model_designation, model_config, append_who="user"):
+    async def process_llm_call(self, prompt, model_designation, model_config, append_who="user", tts_handler=None):
         try:
-            session_memory = self.session_memory.get_session_memory(model_designation)
-
+            extra = None
             if append_who == "user":
                 self.session_memory.add_to_model_memory(append_who, model_designation, prompt)
             else:
-                self.logger.warning(f"Append_who is None for {model_designation}, not appending prompt to session memory.")
+                self.logger.warning(f"Append_who is {append_who} for {model_designation}, sending prompt without storing it in session memory.")
+                extra = {"role": "user", "content": prompt}
+            # Messages not yet folded into the summary are mostly in the window already
+            recalled = await self.long_term_memory.recall(
+                model_designation, prompt, before_seq=self.session_memory.window_start_seq(model_designation)
+            )
+            session_memory = self.session_memory.build_context(
+                model_designation, model_config, extra=extra,
+                recalled=recalled, recall_tokens=self.snapshot.long_term_memory.inject_tokens,
+                prefix=self.llm_pipeline.prompts.prefix(model_config),
+            )
 
-            response = await self.llm_pipeline.get_llm_response(prompt,session_memory,model_config)
+            if tts_handler and model_config.stream_output:
+                response = await self.llm_pipeline.stream_llm_response(prompt, session_memory, model_config, tts_handler)
+            else:
+                response = await self.llm_pipeline.get_llm_response(prompt,session_memory,model_config)
 
-            if response == "I'm sorry, I encountered an error while processing your request.":
+            if response == ERROR_RESPONSE:
                 self.session_memory.append_system_to_model_memory(model_designation, response)
             else:
                 self.session_memory.append_model_to_model_memory(model_designation, response)
+            self.session_memory.end_turn(model_designation, model_config)
 
             parsed_response = self.system_tools.parse_llm_output(response)
             return parsed_response
@@ -130,27 +283,82 @@ class OrchestrationPipeline:
     async def sleep_mode_loop(self):  # Asyncified sleep mode
         sleep = True
         self.logger.info("Sleep mode activated. Listening for wake word only.")
-        
-        while sleep: #TODO: I need to add a wake to confirm sleep if active/deactivated.
-            user_speech_as_text, listen_obj = await self.run_audio_input_pipeline_async()
-            if not user_speech_as_text:
-                continue
+        if self.wake_gate.enabled and self.wake_gate.missing_events():
+            self.logger.info(f"[Wake Gate] No templates for {self.wake_gate.missing_events()} yet, every utterance goes to STT.")
+
+        # While asleep the wake gate decides what reaches STT, nothing is streamed
+        self.stream_stt.paused = True
+        try:
+            while sleep: #TODO: I need to add a wake to confirm sleep if active/deactivated.
+                user_speech_as_text, listen_obj = await self.run_audio_input_pipeline_async(gated=True)
+                if not user_speech_as_text:
+                    continue
 
-            initial_event_check = await self.process_event(user_speech_as_text)
+                initial_event_check = await self.process_event(user_speech_as_text)
+                await self.enroll_wake_template(initial_event_check, listen_obj, user_speech_as_text)
 
-            if initial_event_check.get('event_type', EventType.CONTINUE) == EventType.EMERGENCY: #NOTE: Make the values weight hold presedence
-                self.logger.info("Emergency event detected. Activating emergency protocols.")
-                sleep = False
-            elif initial_event_check.get('event_type', EventType.CONTINUE)  == EventType.WAKE:
-                self.logger.info("Sleep mode exited: normal/wake event.")
-                sleep = False
-            elif initial_event_check.get('event_type', EventType.CONTINUE)  == EventType.SHUTDOWN:
-                self.logger.info("Shutdown command received. Exiting sleep mode.")
-                sleep = False
-                exit(0)
+                if initial_event_check.get('event_type', EventType.CONTINUE) == EventType.EMERGENCY: #NOTE: Make the values weight hold presedence
+                    self.logger.info("Emergency event detected. Activating emergency protocols.")
+                    sleep = False
+                elif initial_event_check.get('event_type', EventType.CONTINUE)  == EventType.WAKE:
+                    self.logger.info("Sleep mode exited: normal/wake event.")
+                    sleep = False
+                elif initial_event_check.get('event_type', EventType.CONTINUE)  == EventType.SHUTDOWN:
+                    self.logger.info("Shutdown command received. Exiting sleep mode.")
+                    sleep = False
+                    exit(0)
+        finally:
+            self.stream_stt.paused = False
 
         return user_speech_as_text, listen_obj, initial_event_check
 
+    async def enroll_wake_template(self, event_check, listen_obj, user_speech_as_text):
+        # STT confirmed a wake phrase: a short enough recording becomes a wake gate template
+        event = event_check.get('event_type', EventType.CONTINUE).value
+        if not listen_obj or event not in WakeGate.EVENTS or not self.wake_gate.enabled:
+            return
+        try:
+            await asyncio.to_thread(
+                self.wake_gate.enroll, event, listen_obj['audio_data'], user_speech_as_text, event_check.get('matches', ())
+            )
+        except Exception as e:
+            self.logger.warning(f"[Wake Gate] Enrolling a template failed: {e}")
+
+    def check_partial_transcript(self, utterance_id, text):
+        # An event phrase ends the utterance right there, it need not be spoken to the end,
+        # unless a longer phrase could still follow ("astrape" before "astrape emergency")
+        if self.event_manager.is_settled_event(text):
+            self.logger.info(f"[STT Stream] Event phrase heard mid-utterance: '{text}'")
+            self.mic_input.cut_utterance(utterance_id, text)
+
+    async def warm_up(self):
+        self.text_to_speech.start_playback()
+        try:
+            await self.text_to_speech.prerender_cache()
+        except Exception as e:
+            self.logger.error(f"Error during warm up: {e}\n{traceback.format_exc()}")
+
+    async def shutdown(self):
+        self.logger.info(f"LLM client pool stats at shutdown: {self.llm_pipeline.get_pool_stats()}")
+        self.logger.info(f"STT provider health: {self.speech_to_text.health.summary()}")
+        self.logger.info(f"Streaming STT: {self.stream_stt.stats}")
+        self.logger.info(f"Wake gate: {self.wake_gate.stats}")
+        self.logger.info(f"TTS provider health: {self.text_to_speech.health.summary()}")
+        self.logger.info(f"LLM node health: {self.llm_pipeline.health.summary()}")
+        self.logger.info(f"LLM time to first token: {self.llm_pipeline.ttft.summary()}")
+        self.logger.info(f"LLM response cache: {self.llm_pipeline.response_cache.summary()}")
+        self.logger.info(f"HTTP transport stats: {self.http_transport.get_pool_stats()}")
+        if self.debug:
+            self.logger.debug(f"Lazily imported provider modules (seconds): {lazy_import_times()}")
+        # Pending embeddings may still need the LLM clients (node embedder)
+        await self.long_term_memory.close()
+        await self.llm_pipeline.close()
+        self.text_to_speech.close()
+        await self.http_transport.close()
+        await self.stream_stt.close()
+        self.session_memory.close()
+        self.mic_input.stop()
+
     def set_state(self, state: str):
         self.logger.info(f"Astrape state set to: {state}")
         self.state = state  # You can later use this to skip logic while "asleep"
@@ -159,18 +367,33 @@ class OrchestrationPipeline:
         self.logger.warning("Executing emergency protocol — override in subclass if needed.")
         # You could eventually call a dedicated module or play a warning sound
 
-    async def run_audio_input_pipeline_async(self):
+    async def run_audio_input_pipeline_async(self, gated=False):
         if self.debug:
             self.logger.debug("Running audio input pipeline")
 
-        listen_obj = await asyncio.to_thread(self.mic_input.listen_with_mic)
+        listen_obj = await self.mic_input.listen_async()
         if not listen_obj or not listen_obj.get('audio_data'):
             self.logger.warning("No valid audio input.")
             return None, None
 
-        user_speech_as_text = await asyncio.to_thread(self.speech_to_text.get_speech_to_text, listen_obj['wav_data'])
+        if gated and self.wake_gate.enabled:
+            forward, detail = await asyncio.to_thread(self.wake_gate.check, listen_obj['audio_data'])
+            if self.debug:
+                self.logger.debug(f"[Wake Gate] {'Forwarded' if forward else 'Dropped'} before STT: {detail}")
+            if not forward:
+                return None, None
+
+        # Cut short on an event phrase, or already transcribed while it was spoken
+        user_speech_as_text = listen_obj.get('transcript')
+        if user_speech_as_text:
+            self.stream_stt.discard(listen_obj['utterance_id'])
+        elif 'utterance_id' in listen_obj:
+            user_speech_as_text = await self.stream_stt.final_transcript(listen_obj['utterance_id'])
+        if user_speech_as_text is None:
+            user_speech_as_text = await self.speech_to_text.get_speech_to_text(listen_obj['wav_data'])
 
-        await asyncio.to_thread(BasicTools().cleanup_temp_audio)
+        if self.snapshot.system.persist_audio:
+            await asyncio.to_thread(BasicTools().cleanup_temp_audio)
 
         if not user_speech_as_text:
             self.logger.info("No speech detected — skipping to next iteration.")
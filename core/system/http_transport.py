@@ -0,0 +1,198 @@
+import asyncio
+import json
+import uuid
+from urllib.parse import urlsplit
+
+from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
+from core.system.logger import ThreadedLoggerManager
+from core.system.provider_health import RetryBudget, backoff_delay
+from core.system.provider_registry import lazy_import
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class HttpResponse:
+    __slots__ = ("status_code", "headers", "content")
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class MultipartFile:
+    """
+    multipart/form-data body with a single file field, streamed in `chunk_size` pieces
+    instead of being assembled in memory. Iterable any number of times, so retries resend it.
+    """
+
+    def __init__(self, field, filename, data, content_type, chunk_size=64 * 1024):
+        self.data = memoryview(data)
+        self.chunk_size = chunk_size
+        boundary = uuid.uuid4().hex
+        self.head = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode()
+        self.tail = f'\r\n--{boundary}--\r\n'.encode()
+        self.headers = {
+            'Content-Type': f'multipart/form-data; boundary={boundary}',
+            'Content-Length': str(len(self.head) + len(self.data) + len(self.tail)),
+        }
+
+    async def __aiter__(self):
+        yield self.head
+        for offset in range(0, len(self.data), self.chunk_size):
+            yield bytes(self.data[offset:offset + self.chunk_size])
+        yield self.tail
+
+
+class HttpTransport:
+    """
+    Async HTTP client for the URL based STT/TTS providers of one pipeline: one pooled httpx
+    client, a concurrency cap per host, bodies streamed in and out, and asyncio.sleep between
+    retries so a slow or dead service never blocks the event loop or holds a worker thread.
+    The pool and the per-host semaphores belong to the loop that created them and are
+    rebuilt when the transport is used from another one.
+    """
+
+    def __init__(self, config=None, logger=None):
+        self.config = config or ConfigLoader().load_config()
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        self.client = None
+        self.loop = None
+        self.host_slots = {}
+        self.retry_budgets = {}
+        self.stats = {'requests': 0, 'retries': 0, 'errors': 0, 'queued': 0}
+
+    def apply_config(self, config):
+        old_settings = self.snapshot.http_clients
+        self.config = config
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.debug = self.snapshot.system.debug_mode
+        health = self.snapshot.provider_health
+        for budget in self.retry_budgets.values():
+            budget.configure(health.retry_budget_ratio, health.retry_budget_min)
+        if self.snapshot.http_clients != old_settings:
+            # In-flight requests keep their semaphores; new ones pick up the new limits
+            self.host_slots = {}
+            if self.client is not None:
+                client, self.client = self.client, None
+                if not self.loop.is_closed():
+                    self.loop.create_task(client.aclose())
+                self.logger.info("[HTTP] Connection pool rebuilt after config change.")
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            # The previous loop is gone or belongs to another caller; its pool cannot be reused
+            self.loop = loop
+            self.client = None
+            self.host_slots = {}
+
+    def _get_client(self):
+        if self.client is None:
+            httpx = lazy_import("httpx")
+            settings = self.snapshot.http_clients
+            limits = httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_keepalive_connections,
+                keepalive_expiry=settings.keepalive_expiry,
+            )
+            self.client = httpx.AsyncClient(limits=limits)
+        return self.client
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        slot = self.host_slots.get(host)
+        if slot is None:
+            slot = self.host_slots[host] = asyncio.Semaphore(self.snapshot.http_clients.per_host_limit)
+        return slot
+
+    def _retry_budget(self, url):
+        host = urlsplit(url).netloc
+        budget = self.retry_budgets.get(host)
+        if budget is None:
+            health = self.snapshot.provider_health
+            budget = self.retry_budgets[host] = RetryBudget(health.retry_budget_ratio, health.retry_budget_min)
+        return budget
+
+    async def stream(self, method, url, timeout=None, **kwargs):
+        """
+        Yields the response body chunk by chunk as it arrives, after the status line and
+        headers as an HttpResponse with empty content. A single attempt, never retried.
+        """
+        self._bind_loop()
+        slot = self._host_slot(url)
+        if slot.locked():
+            self.stats['queued'] += 1
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        async with slot:
+            self.stats['requests'] += 1
+            async with self._get_client().stream(method, url, **kwargs) as response:
+                yield HttpResponse(response.status_code, response.headers, b"")
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+
+    async def request(self, method, url, retry_attempts=1, retry_delay=0, timeout=None, label="HTTP", **kwargs):
+        """
+        Buffers the streamed body into an HttpResponse. Transport errors and retryable status
+        codes are retried with jittered exponential backoff while the host's retry budget
+        lasts; retry_attempts=0 retries until it runs out. Returns the last response (or
+        None if nothing came back at all).
+        """
+        httpx = lazy_import("httpx")
+        budget = self._retry_budget(url)
+        budget.on_request()
+        attempt = 0
+        response = None
+        while retry_attempts == 0 or attempt < retry_attempts:
+            attempt += 1
+            chunks = self.stream(method, url, timeout=timeout, **kwargs)
+            try:
+                body = bytearray()
+                response = await chunks.__anext__()
+                async for chunk in chunks:
+                    body.extend(chunk)
+                response.content = bytes(body)
+                if self.debug:
+                    self.logger.debug(f"[{label}] Attempt {attempt}: {response.status_code} ({len(body)} bytes)")
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+                self.logger.warning(f"[{label}] {url} answered {response.status_code}")
+            except httpx.HTTPError as e:
+                response = None  # a body cut off mid-stream is no response at all
+                self.stats['errors'] += 1
+                self.logger.warning(f"[{label}] Request error: {e!r}")
+            finally:
+                await chunks.aclose()
+
+            if retry_attempts and attempt >= retry_attempts:
+                break
+            if not budget.try_spend():
+                self.logger.warning(f"[{label}] Retry budget for {urlsplit(url).netloc} exhausted, giving up.")
+                break
+            self.stats['retries'] += 1
+            delay = backoff_delay(attempt, retry_delay, self.snapshot.provider_health.backoff_max)
+            self.logger.info(f"[{label}] Retrying in {delay:.2f} seconds...")
+            await asyncio.sleep(delay)
+        return response
+
+    def get_pool_stats(self):
+        return dict(self.stats, hosts=len(self.host_slots))
+
+    async def close(self):
+        if self.client is not None and self.loop is asyncio.get_running_loop():
+            client, self.client = self.client, None
+            await client.aclose()
@@ -0,0 +1,197 @@
+import random
+import time
+from collections import deque
+
+from core.system.logger import ThreadedLoggerManager
+from core.system.provider_stats import ProviderStats
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderError(Exception):
+    """Raised by a provider handler when the backend failed, as opposed to an empty result."""
+
+
+def backoff_delay(attempt, base, cap):
+    # Exponential backoff with full jitter, so retries from several callers do not line up
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class RetryBudget:
+    """
+    Token bucket for retries: every first attempt earns `ratio` of a retry and every retry
+    spends a whole one, so retries can never multiply the load on a failing backend.
+    """
+
+    def __init__(self, ratio=0.2, capacity=3):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+
+    def configure(self, ratio, capacity):
+        # New limits for a config reload; what was already spent stays spent
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = min(self.tokens, capacity)
+
+    def on_request(self):
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def try_spend(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Breaker:
+    __slots__ = ("state", "outcomes", "consecutive_failures", "opened_at", "open_seconds", "probing", "trips")
+
+    def __init__(self, window, open_seconds):
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.open_seconds = open_seconds
+        self.probing = False
+        self.trips = 0
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class ProviderHealth(ProviderStats):
+    """
+    ProviderStats plus a circuit breaker per provider. A breaker opens on a run of failures
+    or a high rolling error rate, rejects calls while it cools down, then lets a single
+    probe through (half-open); the probe closes it again or reopens it for twice as long.
+    """
+
+    def __init__(self, kind, settings, logger=None):
+        super().__init__(kind, window=settings.window)
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.settings = settings
+        self.breakers = {}
+        self.budget = RetryBudget(settings.retry_budget_ratio, settings.retry_budget_min)
+
+    def apply_settings(self, settings):
+        if settings == self.settings:
+            return
+        self.settings = settings
+        # Open circuits and the spent budget carry over; only the limits change
+        self.budget.configure(settings.retry_budget_ratio, settings.retry_budget_min)
+        for breaker in self.breakers.values():
+            breaker.outcomes = deque(breaker.outcomes, maxlen=settings.window)
+
+    def _breaker(self, name):
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = Breaker(self.settings.window, self.settings.open_seconds)
+        return breaker
+
+    def available(self, name):
+        breaker = self.breakers.get(name)
+        if breaker is None or breaker.state == CLOSED:
+            return True
+        if breaker.state == OPEN:
+            return time.monotonic() - breaker.opened_at >= breaker.open_seconds
+        return not breaker.probing
+
+    def allow(self, name):
+        # Like available(), but claims the half-open probe slot for the caller
+        if not self.available(name):
+            return False
+        breaker = self._breaker(name)
+        if breaker.state == OPEN:
+            breaker.state = HALF_OPEN
+            self.logger.info(f"[Health] {self.kind} provider '{name}' half-open, sending a probe.")
+        if breaker.state == HALF_OPEN:
+            breaker.probing = True
+        return True
+
+    def route(self, names):
+        # Healthy providers only, fastest first once every candidate has latency samples
+        candidates = [name for name in dict.fromkeys(names) if name and self.available(name)]
+        latencies = [self.percentile(name, 50) for name in candidates]
+        if len(candidates) > 1 and None not in latencies:
+            candidates = [name for _, _, name in sorted(zip(latencies, range(len(candidates)), candidates))]
+        return candidates
+
+    def begin(self):
+        self.budget.on_request()
+
+    def retry_delay(self, attempt, base):
+        # None means the retry budget is spent and the caller should give up now
+        if not self.budget.try_spend():
+            return None
+        return backoff_delay(attempt, base, self.settings.backoff_max)
+
+    def record(self, name, seconds, ok=True):
+        super().record(name, seconds, ok)
+        breaker = self._breaker(name)
+        breaker.outcomes.append(ok)
+        if ok:
+            breaker.consecutive_failures = 0
+            if breaker.state == HALF_OPEN:
+                self._close(name, breaker)
+            return
+
+        breaker.consecutive_failures += 1
+        if breaker.state == HALF_OPEN:
+            self._trip(name, breaker, min(self.settings.max_open_seconds, breaker.open_seconds * 2))
+        elif breaker.state == CLOSED and (
+            breaker.consecutive_failures >= self.settings.consecutive_failures
+            or (len(breaker.outcomes) >= self.settings.min_calls
+                and breaker.error_rate >= self.settings.failure_threshold)
+        ):
+            self._trip(name, breaker, self.settings.open_seconds)
+
+    def record_probe_success(self, name):
+        # A health check passed; closes a half-open circuit without touching the latency window
+        breaker = self.breakers.get(name)
+        if breaker and breaker.state == HALF_OPEN:
+            breaker.consecutive_failures = 0
+            self._close(name, breaker)
+
+    def _close(self, name, breaker):
+        breaker.state = CLOSED
+        breaker.probing = False
+        breaker.open_seconds = self.settings.open_seconds
+        breaker.outcomes.clear()
+        entry = self.providers.get(name)
+        if entry:
+            # Latencies from before the outage would keep a recovered provider out of routing
+            entry['latency'].samples.clear()
+        self.logger.info(f"[Health] {self.kind} provider '{name}' recovered, circuit closed.")
+
+    def record_abandoned(self, name, seconds):
+        super().record_abandoned(name, seconds)
+        breaker = self.breakers.get(name)
+        if breaker and breaker.state == HALF_OPEN:
+            # The probe never finished; let the next call probe instead
+            breaker.probing = False
+
+    def _trip(self, name, breaker, open_seconds):
+        breaker.state = OPEN
+        breaker.opened_at = time.monotonic()
+        breaker.open_seconds = open_seconds
+        breaker.probing = False
+        breaker.trips += 1
+        self.logger.warning(
+            f"[Health] {self.kind} provider '{name}' circuit open for {open_seconds:g}s "
+            f"(error rate {breaker.error_rate:.0%}, {breaker.consecutive_failures} failure(s) in a row)"
+        )
+
+    def summary(self):
+        summary = super().summary()
+        for name, entry in summary.items():
+            breaker = self.breakers.get(name)
+            entry['state'] = breaker.state if breaker else CLOSED
+            entry['error_rate'] = round(breaker.error_rate, 2) if breaker else 0.0
+            entry['trips'] = breaker.trips if breaker else 0
+        return summary
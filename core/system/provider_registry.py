@@ -0,0 +1,86 @@
+import importlib
+import sys
+import time
+from functools import partial
+from threading import Lock
+
+from core.system.utils.basic_tools import BasicTools
+
+_import_times = {}
+_import_lock = Lock()
+
+
+def lazy_import(name):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _import_lock:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        _import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def lazy_import_times():
+    return dict(_import_times)
+
+
+class Provider:
+    __slots__ = ("name", "handler", "requires", "is_url", "loaded")
+
+    def __init__(self, name, handler, requires=(), is_url=False):
+        self.name = name
+        self.handler = handler
+        self.requires = tuple(requires)
+        self.is_url = is_url
+        self.loaded = False
+
+    def load(self):
+        if not self.loaded:
+            for module in self.requires:
+                lazy_import(module)
+            self.loaded = True
+
+
+class ProviderRegistry:
+    """
+    Name -> backend mapping for STT/TTS/LLM providers. A handler is either the name of a
+    method on the owning component or a callable taking the component as first argument;
+    its `requires` modules are imported the first time the provider is used.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.providers = {}
+        self.url_provider = None
+
+    def register(self, name, handler, requires=()):
+        self.providers[name] = Provider(name, handler, requires)
+
+    def register_url(self, handler, requires=()):
+        # Any http(s) service string is routed here with the URL as first argument
+        self.url_provider = Provider("url", handler, requires, is_url=True)
+
+    def names(self):
+        names = list(self.providers)
+        if self.url_provider:
+            names.append("<url>")
+        return names
+
+    def resolve(self, service):
+        provider = self.providers.get(service)
+        if provider is None and self.url_provider and service and BasicTools.is_url(service):
+            provider = self.url_provider
+        if provider is not None:
+            provider.load()
+        return provider
+
+    def bind(self, owner, service):
+        provider = self.resolve(service)
+        if provider is None:
+            return None
+        if isinstance(provider.handler, str):
+            handler = getattr(owner, provider.handler)
+        else:
+            handler = partial(provider.handler, owner)
+        return partial(handler, service) if provider.is_url else handler
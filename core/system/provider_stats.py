@@ -0,0 +1,87 @@
+from collections import deque
+
+
+class RollingLatency:
+    def __init__(self, window=50):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, percent):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class ProviderStats:
+    """
+    Per-provider call counters and a rolling latency window for one service kind
+    (stt/tts/llm). Calls that were abandoned before finishing are recorded with the time
+    they had run so far, so slow providers cannot hide their tail by always losing.
+    Failed calls (often timeouts or instant refusals) go to a separate window, so they
+    do not skew the percentiles that hedging and routing act on.
+    """
+
+    def __init__(self, kind, window=50):
+        self.kind = kind
+        self.window = window
+        self.providers = {}
+
+    def _entry(self, name):
+        entry = self.providers.get(name)
+        if entry is None:
+            entry = self.providers[name] = {
+                'latency': RollingLatency(self.window),
+                'failure_latency': RollingLatency(self.window),
+                'calls': 0,
+                'failures': 0,
+                'abandoned': 0,
+                'wins': 0,
+            }
+        return entry
+
+    def record(self, name, seconds, ok=True):
+        entry = self._entry(name)
+        entry['calls'] += 1
+        if ok:
+            entry['latency'].record(seconds)
+        else:
+            entry['failures'] += 1
+            entry['failure_latency'].record(seconds)
+
+    def record_abandoned(self, name, seconds):
+        entry = self._entry(name)
+        entry['abandoned'] += 1
+        entry['latency'].record(seconds)
+
+    def record_win(self, name):
+        self._entry(name)['wins'] += 1
+
+    def percentile(self, name, percent, min_samples=5):
+        entry = self.providers.get(name)
+        if entry is None or len(entry['latency']) < min_samples:
+            return None
+        return entry['latency'].percentile(percent)
+
+    def summary(self):
+        summary = {}
+        for name, entry in self.providers.items():
+            p50 = entry['latency'].percentile(50)
+            p90 = entry['latency'].percentile(90)
+            failed_p50 = entry['failure_latency'].percentile(50)
+            summary[name] = {
+                'calls': entry['calls'],
+                'failures': entry['failures'],
+                'abandoned': entry['abandoned'],
+                'wins': entry['wins'],
+                'p50_ms': round(p50 * 1000) if p50 is not None else None,
+                'p90_ms': round(p90 * 1000) if p90 is not None else None,
+                'failed_p50_ms': round(failed_p50 * 1000) if failed_p50 is not None else None,
+            }
+        return summary
@@ -0,0 +1,60 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from core.system.provider_registry import lazy_import_times
+
+
+def import_time_report(target="main", limit=20):
+    """
+    Runs `python -X importtime -c "import <target>"` in a fresh interpreter and sums the
+    self time of every imported module per top-level package, slowest first.
+    """
+    repo_root = Path(__file__).resolve().parents[2]
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=repo_root,
+        capture_output=True,
+        text=True,
+    )
+
+    totals = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        entry = totals.setdefault(package, [0, 0])
+        entry[0] += int(self_us)
+        entry[1] += 1
+        if name.strip() == target:
+            total_us = int(cumulative_us)
+
+    rows = sorted(((us, count, package) for package, (us, count) in totals.items()), reverse=True)
+    return total_us, rows[:limit], result.returncode, result.stderr if result.returncode else ""
+
+
+def format_report(total_us, rows):
+    lines = [f"total {total_us / 1000:.1f} ms", f"{'self ms':>10} {'modules':>8}  package"]
+    for self_us, count, package in rows:
+        lines.append(f"{self_us / 1000:10.1f} {count:8d}  {package}")
+    lazy = lazy_import_times()
+    if lazy:
+        lines.append("")
+        lines.append("lazily imported providers (this process):")
+        for module, seconds in sorted(lazy.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"{seconds * 1000:10.1f} ms  {module}")
+    return "\n".join(lines)
+
+
+# Optional CLI/Direct use: python -m core.system.startup_report [module] [limit]
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "main"
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    total_us, rows, returncode, error = import_time_report(target, limit)
+    if returncode:
+        print(f"Importing '{target}' failed:\n{error}")
+        sys.exit(returncode)
+    print(f"Cold import breakdown for '{target}':")
+    print(format_report(total_us, rows))
@@ -1,6 +1,8 @@
 import re
 import os
 import time
+import uuid
+from datetime import datetime
 from core.system.logger import ThreadedLoggerManager
 
 class BasicTools:
@@ -46,3 +48,21 @@ class BasicTools:
                     BasicTools.logger.info(f"Deleted old temp file: {path}")
             except Exception as e:
                 BasicTools.logger.warning(f"Failed to delete {path}: {e}")
+
+    @staticmethod
+    def save_temp_audio(data, prefix="output", extension="wav"):
+        """
+        Debug-only persistence of an in-memory audio buffer to temp_audio/.
+        """
+        try:
+            temp_dir = os.path.join(os.getcwd(), "temp_audio")
+            os.makedirs(temp_dir, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            file_path = os.path.join(temp_dir, f"{prefix}_{timestamp}_{uuid.uuid4().hex[:6]}.{extension}")
+            with open(file_path, "wb") as f:
+                f.write(data)
+            BasicTools.logger.debug(f"Saved debug audio: {file_path}")
+            return file_path
+        except Exception as e:
+            BasicTools.logger.warning(f"Failed to save debug audio: {e}")
+            return None
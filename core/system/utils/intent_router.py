@@ -0,0 +1,59 @@
+from threading import Lock
+
+from core.system.provider_registry import lazy_import
+from listen.phrase_matcher import PhraseMatcher
+
+DEFAULT_ROLE = "conversation"
+
+
+class IntentRouter:
+    """
+    All roles' keywords in one whole-word PhraseMatcher (Aho-Corasick), so a prompt is
+    scanned once no matter how many roles and keywords there are. Every hit adds its
+    keyword's word count to its role's score, and the highest score wins, ties going to
+    the role listed first.
+    """
+
+    _cache = {}
+    _lock = Lock()
+
+    def __init__(self, role_keywords, default_role=DEFAULT_ROLE):
+        self.default_role = default_role
+        self.roles = list(role_keywords)
+        self.role_index = {role: index for index, role in enumerate(self.roles)}
+        self.matcher = PhraseMatcher(role_keywords, whole_words=True)
+        # "what time" outweighs a lone "what"
+        self.weights = {
+            keyword: len(keyword.split()) for keywords in role_keywords.values() for keyword in keywords
+        }
+
+    @classmethod
+    def for_snapshot(cls, snapshot):
+        # Built once per config version and shared by every caller
+        with cls._lock:
+            cached = cls._cache.get(id(snapshot))
+            if cached and cached[0] is snapshot:
+                return cached[1]
+            router = cls(snapshot.role_keywords)
+            cls._cache = {id(snapshot): (snapshot, router)}
+            return router
+
+    def scores(self, text):
+        np = lazy_import("numpy")
+        scores = np.zeros(len(self.roles), dtype=np.float32)
+        if not self.matcher.phrase_count or not text:
+            return scores
+        hits = list(self.matcher.iter_matches(text))
+        if hits:
+            scores += np.bincount(
+                [self.role_index[role] for role, _ in hits],
+                weights=[self.weights[keyword] for _, keyword in hits],
+                minlength=len(self.roles),
+            ).astype(np.float32)
+        return scores
+
+    def classify(self, text):
+        scores = self.scores(text)
+        if not len(scores) or scores.max() <= 0:
+            return self.default_role
+        return self.roles[int(scores.argmax())]
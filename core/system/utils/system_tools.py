@@ -3,54 +3,47 @@ import json
 import concurrent.futures
 
 from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
 from core.system.logger import ThreadedLoggerManager
+from core.system.utils.intent_router import IntentRouter
 
 class SystemTools:
     def __init__(self, config=None, logger=None):
         self.config = config or ConfigLoader().load_config()
         self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
         self.debug = self.config['system_settings'].get('debug_mode', False)
-        
-        self.model_config = self.config['models']
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+
+    def apply_config(self, config):
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.config = config
+        self.debug = self.snapshot.system.debug_mode
 
     def get_words(self, word_type: str):
         words = []
         try:
-            for model in self.model_config:
-                if self.model_config[model].get('enabled') and self.model_config[model].get(word_type):
-                    value = self.model_config[model][word_type]
-                    # Ensure value is iterable and not nested
-                    if not isinstance(value, str):
-                        for item in value:
-                            words.append(str(item))
-                    else:
-                        words.append(value)
-                    if self.debug:
-                        self.logger.debug(f"Loaded {word_type}: {words}")
+            for model in self.snapshot.models.values():
+                if model.enabled:
+                    words.extend(getattr(model, word_type, ()))
+            if self.debug:
+                self.logger.debug(f"Loaded {word_type}: {words}")
         except Exception as e:
             self.logger.error(f"Error getting words for type {word_type}: {e}")
         return words
 
-    def get_wake_words(self): return self.get_words('wake_phrases')
-    def get_sleep_words(self): return self.get_words('sleep_phrases')
-    def get_emergency_words(self): return self.get_words('emergency_phrases')
-    def get_shutdown_words(self): return self.config['system_settings'].get('immediate_halt_phrases', [])
+    def get_wake_words(self): return list(self.snapshot.phrases['wake'])
+    def get_sleep_words(self): return list(self.snapshot.phrases['sleep'])
+    def get_emergency_words(self): return list(self.snapshot.phrases['emergency'])
+    def get_shutdown_words(self): return list(self.snapshot.phrases['shutdown'])
 
     def get_available_roles(self):
-        roles = set()
-        try:
-            for model in self.model_config:
-                if self.model_config[model].get('enabled'):
-                    roles.update(self.model_config[model].get('roles', []))
-        except Exception as e:
-            self.logger.error(f"Error getting available roles: {e}")
-        return roles
+        return set(self.snapshot.role_model_scores)
 
     def get_roles(self):
-        return list(self.config.get('roles', {}).keys())
+        return list(self.snapshot.role_keywords)
 
     def get_role_keywords(self, role: str):
-        return self.config['roles'].get(role, {}).get("key_words", [])
+        return list(self.snapshot.role_keywords.get(role, ()))
 
     def get_available_tools(self):
         tools = []
@@ -63,48 +56,42 @@ class SystemTools:
 
     def classify_intent(self, text: str):
         default_role = "conversation"
-        text = text.lower()
         try:
-            for role in self.get_available_roles():
-                for keyword in self.get_role_keywords(role):
-                    if keyword in text:
-                        return role
+            return IntentRouter.for_snapshot(self.snapshot).classify(text)
         except Exception as e:
             self.logger.warning(f"Intent classification fallback to default due to error: {e}")
         return default_role
 
     def get_all_models(self):
-        return [self.model_config[model].get('designation') for model in self.model_config]
+        return [model.designation for model in self.snapshot.models.values()]
 
     def get_available_models(self):
-        return [self.model_config[model].get('designation') for model in self.model_config if self.model_config[model].get('enabled', False)]
+        return list(self.snapshot.enabled_models)
 
     def get_model_based_on_role(self, role: str):
         try:
-            config = self.config
-            candidates = [config['system_settings'].get('default_model_designation', 'model_1')]
-            best_score = 0
-            for model in self.get_available_models():
-                model_attrs = self.model_config[model].get('roles', {})
-                score = model_attrs.get(role, 0)
-                if score > best_score:
-                    candidates = [model]
-                    best_score = score
-                elif score == best_score:
-                    candidates.append(model)
-            return candidates
+            # role_model_scores is sorted best-first when the snapshot is built
+            scores = self.snapshot.role_model_scores.get(role, ())
+            if scores and scores[0][1] > 0:
+                return [model for model, score in scores if score == scores[0][1]]
+            scored = dict(scores)
+            default = self.snapshot.system.default_model_designation
+            return [default] + [
+                model for model in self.snapshot.enabled_models if model != default and scored.get(model, 0) == 0
+            ]
         except Exception as e:
             self.logger.error(f"Error selecting model for role {role}: {e}")
             return []
 
     def get_roles_of_model(self, model):
-        return list(self.model_config.get(model, {}).get('roles', []))
+        model_settings = self.snapshot.models.get(model)
+        return list(model_settings.roles) if model_settings else []
 
     def generate_system_prompt_for_model(self, model):
         try:
             roles = self.get_roles_of_model(model)
-            current_model = self.model_config[model]
-            prompt = f"You are {current_model['name']}, a specialized AI agent."
+            current_model = self.snapshot.models[model]
+            prompt = f"You are {current_model.name}, a specialized AI agent."
             return prompt
         except Exception as e:
             self.logger.error(f"Error generating system prompt: {e}")
@@ -0,0 +1,257 @@
+import asyncio
+import threading
+import sounddevice as sd
+
+from core.system.logger import ThreadedLoggerManager
+from core.system.provider_registry import lazy_import
+from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
+from speech.audio_clip import AudioClip
+
+
+class RingBuffer:
+    def __init__(self, capacity, dtype="int16"):
+        self.buffer = lazy_import("numpy").zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.written = 0  # absolute sample count since start, positions below are in this space
+        self.data_ready = threading.Condition()
+
+    def write(self, samples):
+        n = len(samples)
+        with self.data_ready:
+            if n > self.capacity:
+                samples = samples[-self.capacity:]
+                self.written += n - self.capacity
+                n = self.capacity
+            start = self.written % self.capacity
+            first = min(n, self.capacity - start)
+            self.buffer[start:start + first] = samples[:first]
+            self.buffer[:n - first] = samples[first:]
+            self.written += n
+            self.data_ready.notify_all()
+
+    def read(self, start, end):
+        np = lazy_import("numpy")
+        with self.data_ready:
+            start = max(start, self.written - self.capacity)
+            end = min(end, self.written)
+            if end <= start:
+                return np.empty(0, dtype=self.buffer.dtype)
+            return self.buffer[np.arange(start, end) % self.capacity]
+
+    def wait_for(self, position, timeout=None):
+        with self.data_ready:
+            return self.data_ready.wait_for(lambda: self.written >= position, timeout=timeout)
+
+
+class CaptureEngine:
+    """
+    Keeps one input stream open for the process lifetime. Frames land in a preallocated
+    ring buffer, a detector thread tracks the noise floor and cuts utterances, and
+    finished utterances are handed to the event loop through an asyncio.Queue.
+
+    While an utterance is still being spoken its audio is also passed, block by block, to
+    `stream_listeners` (listener(kind, utterance_id, pcm) on the event loop, kind being
+    "start", "audio", "end" or "discard"), and `cut_utterance` may end it early.
+    """
+
+    BLOCK_SECONDS = 0.03
+
+    def __init__(self, config=None, logger=None):
+        self.config = config or ConfigLoader().load_config()
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+
+        settings = self.snapshot.system
+        self.sample_rate = settings.mic_sample_rate
+        self.block_size = int(self.sample_rate * self.BLOCK_SECONDS)
+        self.ring = RingBuffer(int(self.sample_rate * settings.mic_ring_seconds))
+        self.queue_size = settings.mic_queue_size
+        self._apply_detection(settings)
+
+        self.noise_floor = None
+        self.energy_threshold = self.min_energy
+        self.playback_active = False
+        self.suppress_until = 0
+
+        self.loop = None
+        self.utterances = None
+        self.stream = None
+        self.worker = None
+        self.running = False
+        self.overflows = 0
+        self.stream_listeners = []
+        self.utterance_id = 0
+        self.cut_request = None  # (utterance_id, transcript), set from the event loop
+
+    def apply_config(self, config):
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.config = config
+        self.debug = self.snapshot.system.debug_mode
+        # Read by the detector thread on its next block
+        self._apply_detection(self.snapshot.system)
+
+    def _apply_detection(self, settings):
+        self.preroll = int(self.sample_rate * settings.mic_preroll)
+        self.pause_blocks = max(1, int(settings.mic_pause_threshold / self.BLOCK_SECONDS))
+        self.min_voiced_blocks = max(1, int(settings.mic_min_phrase / self.BLOCK_SECONDS))
+        self.max_samples = int(self.sample_rate * settings.phrase_timeout)
+        self.energy_ratio = settings.mic_energy_ratio
+        self.min_energy = settings.mic_min_energy
+        self.noise_adaptation = settings.mic_noise_adaptation
+        self.playback_tail = int(self.sample_rate * settings.mic_playback_tail)
+
+    def start(self, loop=None):
+        if self.running:
+            return
+        self.loop = loop or asyncio.get_running_loop()
+        self.utterances = asyncio.Queue(maxsize=self.queue_size)
+        self.stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype='int16',
+            blocksize=self.block_size,
+            callback=self._on_audio,
+        )
+        self.running = True
+        self.stream.start()
+        self.worker = threading.Thread(target=self._detect_loop, name="mic-capture", daemon=True)
+        self.worker.start()
+        self.logger.info(f"[Capture] Persistent input stream opened at {self.sample_rate} Hz")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        try:
+            self.stream.stop()
+            self.stream.close()
+        except Exception as e:
+            self.logger.warning(f"[Capture] Failed to close input stream: {e}")
+        with self.ring.data_ready:
+            self.ring.data_ready.notify_all()
+        if self.worker:
+            self.worker.join(timeout=1)
+        self.logger.info(f"[Capture] Input stream closed ({self.overflows} overflow(s))")
+
+    async def get_utterance(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.utterances.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def cut_utterance(self, utterance_id, transcript):
+        # Ends the utterance at the next block; it is emitted with its transcript attached
+        self.cut_request = (utterance_id, transcript)
+
+    def set_playback_active(self, active):
+        # Our own TTS output must not be picked up as user speech
+        self.playback_active = active
+        if not active:
+            self.suppress_until = self.ring.written + self.playback_tail
+
+    def _on_audio(self, indata, frames, time_info, status):
+        if status:
+            self.overflows += 1
+        self.ring.write(indata[:, 0])
+
+    def _detect_loop(self):
+        np = lazy_import("numpy")
+        position = self.ring.written
+        speech_start = None
+        silent_blocks = 0
+        voiced_blocks = 0
+
+        while self.running:
+            if not self.ring.wait_for(position + self.block_size, timeout=0.5):
+                continue
+            if self.ring.written - position > self.ring.capacity:
+                self.logger.warning("[Capture] Detector fell behind the ring buffer, skipping ahead.")
+                position = self.ring.written - self.block_size
+                if speech_start is not None:
+                    self._post("discard")
+                speech_start = None
+
+            block = self.ring.read(position, position + self.block_size)
+            position += self.block_size
+            energy = float(np.sqrt(np.mean(block.astype(np.float32) ** 2))) if len(block) else 0.0
+
+            if self.playback_active or position < self.suppress_until:
+                if speech_start is not None:
+                    self._post("discard")
+                speech_start = None
+                continue
+
+            if speech_start is None:
+                if energy > self.energy_threshold:
+                    speech_start = max(0, position - self.block_size - self.preroll)
+                    silent_blocks = 0
+                    voiced_blocks = 1
+                    self.utterance_id += 1
+                    self._post("start", self.ring.read(speech_start, position))
+                else:
+                    self._track_noise(energy)
+                continue
+
+            if energy > self.energy_threshold:
+                silent_blocks = 0
+                voiced_blocks += 1
+            else:
+                silent_blocks += 1
+            self._post("audio", block)
+
+            cut = self.cut_request
+            if cut and cut[0] == self.utterance_id:
+                self.cut_request = None
+                self._post("end")
+                self._emit(speech_start, position, transcript=cut[1])
+                speech_start = None
+            elif silent_blocks >= self.pause_blocks or position - speech_start >= self.max_samples:
+                if voiced_blocks >= self.min_voiced_blocks:
+                    self._post("end")
+                    self._emit(speech_start, position - silent_blocks * self.block_size + self.block_size)
+                else:
+                    self._post("discard")
+                    if self.debug:
+                        self.logger.debug("[Capture] Discarded short noise burst.")
+                speech_start = None
+
+    def _track_noise(self, energy):
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        else:
+            self.noise_floor += (energy - self.noise_floor) * self.noise_adaptation
+        self.energy_threshold = max(self.min_energy, self.noise_floor * self.energy_ratio)
+
+    def _post(self, kind, samples=None):
+        if self.stream_listeners:
+            pcm = samples.tobytes() if samples is not None else None
+            self.loop.call_soon_threadsafe(self._notify, kind, self.utterance_id, pcm)
+
+    def _notify(self, kind, utterance_id, pcm):
+        for listener in self.stream_listeners:
+            try:
+                listener(kind, utterance_id, pcm)
+            except Exception as e:
+                self.logger.error(f"[Capture] Stream listener failed: {e}")
+
+    def _emit(self, start, end, transcript=None):
+        pcm = self.ring.read(start, end).tobytes()
+        audio_data = AudioClip(pcm, self.sample_rate, channels=1, sample_width=2)
+        listen_obj = {'audio_data': audio_data, 'wav_data': audio_data.to_wav_bytes(), 'utterance_id': self.utterance_id}
+        if transcript:
+            # Cut short on a partial transcript; no need to transcribe it again
+            listen_obj['transcript'] = transcript
+        if self.debug:
+            self.logger.debug(
+                f"[Capture] Utterance of {(end - start) / self.sample_rate:.2f}s "
+                f"(threshold {self.energy_threshold:.0f})"
+            )
+        self.loop.call_soon_threadsafe(self._enqueue, listen_obj)
+
+    def _enqueue(self, listen_obj):
+        if self.utterances.full():
+            self.utterances.get_nowait()
+            self.logger.warning("[Capture] Utterance queue full, dropping the oldest utterance.")
+        self.utterances.put_nowait(listen_obj)
@@ -1,10 +1,10 @@
-import concurrent.futures
 import re
 import string
 from enum import Enum
 from core.system.logger import ThreadedLoggerManager
 from setup.config_loader import ConfigLoader
 from core.system.utils.system_tools import SystemTools
+from listen.phrase_matcher import PhraseMatcher, normalize_text
 
 class EventType(Enum):
     EMERGENCY = "emergency"
@@ -29,6 +29,37 @@ class EventManager:
         self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
         self.debug = self.config['system_settings'].get('debug_mode', False)
         self.system_tools = SystemTools(config=self.config, logger=self.logger)
+        self.phrase_sources = None
+        self.matcher = None
+        self.phrase_words = ()
+        self.build_matcher()
+
+    def apply_config(self, config):
+        self.config = config
+        self.debug = config['system_settings'].get('debug_mode', False)
+        self.system_tools.apply_config(config)
+        # No-op unless a wake/sleep/emergency/halt phrase actually changed
+        self.build_matcher()
+
+    def build_matcher(self):
+        sources = {
+            EventType.EMERGENCY: tuple(self.system_tools.get_emergency_words()),
+            EventType.WAKE: tuple(self.system_tools.get_wake_words()),
+            EventType.SLEEP: tuple(self.system_tools.get_sleep_words()),
+            EventType.SHUTDOWN: tuple(self.system_tools.get_shutdown_words()),
+        }
+        if sources == self.phrase_sources:
+            return False
+
+        self.matcher = PhraseMatcher(sources)
+        # Phrases of several words, which a partial transcript may hold only the start of
+        self.phrase_words = tuple({
+            tuple(words) for phrases in sources.values() for phrase in phrases
+            if len(words := normalize_text(phrase).split()) > 1
+        })
+        self.phrase_sources = sources
+        self.logger.info(f"Event phrase matcher built with {self.matcher.phrase_count} phrases.")
+        return True
 
     def check_for_event_words(self, text: str) -> dict:
         if not text:
@@ -37,28 +68,33 @@ class EventManager:
 
         self.logger.info(f"Checking for event words in: {text}")
 
-        results = {}
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {
-                EventType.EMERGENCY: executor.submit(self.check_for_emergency_word, text),
-                EventType.WAKE: executor.submit(self.check_for_wake_word, text),
-                EventType.SLEEP: executor.submit(self.check_for_sleep_word, text),
-                EventType.SHUTDOWN: executor.submit(self.check_for_shutdown_word, text),
-            }
-
-            for key, future in futures.items():
-                try:
-                    matches = future.result()
-                    if matches:
-                        results[key] = matches
-                except Exception as e:
-                    self.logger.error(f"Error checking for {key.value} words: {e}")
-
-        if not results:
+        results = self.matcher.match(text)
+
+        if results:
+            self.logger.info(f"Matched event keywords: { {k.value: v for k, v in results.items()} } in '{text}'")
+        else:
             self.logger.info("No event words detected.")
         return results
 
+    def has_event_words(self, text: str) -> bool:
+        # Quiet check for partial transcripts, which arrive many times per utterance
+        return bool(text) and bool(self.matcher.match(text))
+
+    def can_extend(self, text: str) -> bool:
+        # True while the last words of `text` are the start of a longer phrase, e.g.
+        # "astrape" may still become "astrape emergency"
+        words = normalize_text(text).split()
+        for phrase in self.phrase_words:
+            for length in range(min(len(phrase) - 1, len(words)), 0, -1):
+                if tuple(words[-length:]) == phrase[:length]:
+                    return True
+        return False
+
+    def is_settled_event(self, text: str) -> bool:
+        # A partial transcript can end the utterance only once no more words could
+        # change which phrase, and so which event, it holds
+        return self.has_event_words(text) and not self.can_extend(text)
+
     def normalize_input(self, text):
         text = text.lower().strip()
         # Remove punctuation but keep spaces
@@ -109,6 +145,20 @@ class EventManager:
             self.logger.debug(f"Shutdown Words:{shutdown_words}'")
         return shutdown_words
 
+    @staticmethod
+    def drop_contained(events: dict) -> dict:
+        # "astrape" inside "astrape sleep" is not a wake phrase of its own
+        spans = [f" {normalize_text(p)} " for phrases in events.values() for p in phrases]
+        kept = {}
+        for event_type, phrases in events.items():
+            own = [
+                p for p in phrases
+                if not any(f" {normalize_text(p)} " in span and f" {normalize_text(p)} " != span for span in spans)
+            ]
+            if own:
+                kept[event_type] = own
+        return kept
+
     @staticmethod
     def resolve_event_priority(events: list[dict]) -> dict | None:
         if not events:
@@ -118,7 +168,7 @@ class EventManager:
 
     def determine_event_action(self, text: str) -> dict:
         self.logger.info(f"Determining event action for text: {text}")
-        events = self.check_for_event_words(text)
+        events = self.drop_contained(self.check_for_event_words(text))
         if not events:
             return {'event_type': EventType.CONTINUE, 'matches': []}
 
@@ -1,26 +1,71 @@
-import speech_recognition as sr
-from datetime import datetime
-import uuid
-import os
+import asyncio
 from core.system.logger import ThreadedLoggerManager
+from core.system.utils.basic_tools import BasicTools
+from core.system.provider_registry import lazy_import
 from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
 
 class MicInput:
+    # Fixed while the input stream, ring buffer and queue are open; other mic_* settings apply on reload
+    RESTART_SETTINGS = ('mic_capture_mode', 'mic_sample_rate', 'mic_ring_seconds', 'mic_queue_size')
+
     def __init__(self, config=None, logger=None):
         self.config = config or ConfigLoader().load_config()
         self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
         self.debug = self.config['system_settings'].get('debug_mode', False)
-        self.recognizer = sr.Recognizer()
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        self.recognizer = None
+        self.capture_engine = None
+        if self.snapshot.system.mic_capture_mode == 'persistent':
+            # numpy/sounddevice are only needed for persistent capture
+            capture_engine = lazy_import("listen.capture_engine")
+            self.capture_engine = capture_engine.CaptureEngine(config=self.config, logger=self.logger)
+
+    def apply_config(self, config):
+        old_settings = self.snapshot.system
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.config = config
+        self.debug = self.snapshot.system.debug_mode
+
+        restart_changes = [
+            key for key in self.RESTART_SETTINGS if getattr(old_settings, key) != getattr(self.snapshot.system, key)
+        ]
+        if restart_changes:
+            self.logger.warning(f"Microphone capture settings {restart_changes} take effect after a restart.")
+        if self.capture_engine:
+            self.capture_engine.apply_config(config)
+
+    async def listen_async(self):
+        if not self.capture_engine:
+            return await asyncio.to_thread(self.listen_with_mic)
+
+        if not self.capture_engine.running:
+            self.capture_engine.start()
+        listen_obj = await self.capture_engine.get_utterance(timeout=self.snapshot.system.mic_ingest_timeout)
+        if listen_obj and self.snapshot.system.persist_audio:
+            BasicTools.save_temp_audio(listen_obj['wav_data'], prefix="output")
+        return listen_obj
+
+    def cut_utterance(self, utterance_id, transcript):
+        if self.capture_engine:
+            self.capture_engine.cut_utterance(utterance_id, transcript)
+
+    def set_playback_active(self, active):
+        if self.capture_engine:
+            self.capture_engine.set_playback_active(active)
+
+    def stop(self):
+        if self.capture_engine:
+            self.capture_engine.stop()
 
     def listen_with_mic(self):
         """
         Blocking function — must be called using `await asyncio.to_thread(...)`.
         """
-        system_config = self.config.get('system_settings', {})
-        
-        if not (system_config):
-            self.logger.info("System settings configuration is missing.")
-            return None
+        system_config = self.snapshot.system
+        sr = lazy_import("speech_recognition")
+        if self.recognizer is None:
+            self.recognizer = sr.Recognizer()
 
         try:
             self.logger.info("Listening for audio input...")
@@ -28,8 +73,8 @@ class MicInput:
                 self.recognizer.adjust_for_ambient_noise(source)
                 audio_data = self.recognizer.listen(
                     source,
-                    timeout=system_config.get('mic_ingest_timeout', 5),
-                    phrase_time_limit=system_config.get('phrase_timeout', 15)
+                    timeout=system_config.mic_ingest_timeout,
+                    phrase_time_limit=system_config.phrase_timeout
                 )
             self.logger.info("Audio data captured.")
         except sr.WaitTimeoutError:
@@ -52,15 +97,9 @@ class MicInput:
 
         try:
             wav_data = audio_data.get_wav_data()
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            temp_dir = os.path.join(os.getcwd(), "temp_audio")
-            os.makedirs(temp_dir, exist_ok=True)
-
-            file_path = os.path.join(temp_dir, f"output_{timestamp}_{uuid.uuid4().hex[:6]}.wav")
-            with open(file_path, "wb") as f:
-                f.write(wav_data)
-
-            return file_path
+            if self.snapshot.system.persist_audio:
+                BasicTools.save_temp_audio(wav_data, prefix="output")
+            return wav_data
         except Exception as e:
             self.logger.error(f"Error converting audio to WAV: {e}")
             return None
@@ -0,0 +1,80 @@
+import string
+from collections import deque
+
+_PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+
+
+def normalize_text(text):
+    # Same result as EventManager.normalize_input's regex passes, without the regex
+    return " ".join(str(text).lower().translate(_PUNCTUATION_TABLE).split())
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over every configured event phrase. One pass over the
+    normalized text reports all phrases it contains (overlaps included), grouped by key.
+    With `whole_words` a phrase only matches on word boundaries ("time" is not found in
+    "sometimes").
+    """
+
+    def __init__(self, phrases_by_key, whole_words=False):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.phrase_count = 0
+        self.whole_words = whole_words
+
+        for key, phrases in phrases_by_key.items():
+            for phrase in phrases:
+                normalized = normalize_text(phrase)
+                if normalized:
+                    self._add(f" {normalized} " if whole_words else normalized, (key, phrase))
+        self._link()
+
+    def _add(self, normalized, entry):
+        node = 0
+        for char in normalized:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = next_node
+        if entry not in self.output[node]:
+            self.output[node].append(entry)
+            self.phrase_count += 1
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def iter_matches(self, text):
+        # Every (key, phrase) occurrence, repeats and overlaps included
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        text = normalize_text(text)
+        for char in f" {text} " if self.whole_words else text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            yield from output[node]
+
+    def match(self, text):
+        found = {}
+        for key, phrase in self.iter_matches(text):
+            matches = found.setdefault(key, [])
+            if phrase not in matches:
+                matches.append(phrase)
+        return found
+
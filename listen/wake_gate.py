@@ -0,0 +1,269 @@
+import os
+import time
+from functools import lru_cache
+from threading import Lock
+
+from core.system.logger import ThreadedLoggerManager
+from core.system.provider_registry import lazy_import
+from listen.phrase_matcher import normalize_text
+from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
+from speech.audio_clip import AudioClip
+
+SAMPLE_RATE = 16000
+VAD_FRAME = 480  # 30 ms at 16 kHz, a frame size webrtcvad accepts
+
+
+@lru_cache(maxsize=4)
+def _mel_filterbank(sample_rate, nfft, n_mels):
+    np = lazy_import("numpy")
+
+    def hz_to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+
+    mels = np.linspace(hz_to_mel(0), hz_to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.floor((nfft + 1) * 700 * (10 ** (mels / 2595) - 1) / sample_rate).astype(int)
+    bank = np.zeros((n_mels, nfft // 2 + 1), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        if center > left:
+            bank[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            bank[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    return bank
+
+
+@lru_cache(maxsize=4)
+def _dct_matrix(n_mels, n_mfcc):
+    # DCT-II rows 1..n_mfcc; c0 (loudness) is left out
+    np = lazy_import("numpy")
+    n = np.arange(n_mels)
+    return np.cos(np.pi / n_mels * (n + 0.5)[None, :] * np.arange(1, n_mfcc + 1)[:, None]).astype(np.float32)
+
+
+def mfcc(samples, sample_rate=SAMPLE_RATE, n_mfcc=12, n_mels=26, frame_ms=25, hop_ms=10):
+    """(frames, n_mfcc) MFCCs of int16 samples, normalized to zero mean and unit variance."""
+    np = lazy_import("numpy")
+    frame = int(sample_rate * frame_ms / 1000)
+    hop = int(sample_rate * hop_ms / 1000)
+    x = samples.astype(np.float32) / 32768.0
+    x = np.append(x[:1], x[1:] - 0.97 * x[:-1])
+    if len(x) < frame:
+        x = np.pad(x, (0, frame - len(x)))
+    frames = np.lib.stride_tricks.sliding_window_view(x, frame)[::hop] * np.hamming(frame).astype(np.float32)
+    nfft = 1 << (frame - 1).bit_length()
+    power = np.abs(np.fft.rfft(frames, nfft)) ** 2 / nfft
+    log_mel = np.log(power @ _mel_filterbank(sample_rate, nfft, n_mels).T + 1e-10)
+    features = log_mel @ _dct_matrix(n_mels, n_mfcc).T
+    features -= features.mean(axis=0)
+    features /= features.std(axis=0) + 1e-5
+    return features
+
+
+def match_distance(template, features):
+    """
+    Mean per-frame distance of the best alignment of `template` with any stretch of
+    `features` (subsequence DTW, local slopes between 1/2 and 2), inf when impossible.
+    """
+    np = lazy_import("numpy")
+    rows, columns = len(template), len(features)
+    if not rows or columns * 2 < rows:
+        return float("inf")
+    squared = (template ** 2).sum(axis=1)[:, None] + (features ** 2).sum(axis=1)[None, :] - 2 * template @ features.T
+    cost = np.sqrt(np.maximum(squared, 0))
+
+    inf = np.full(2, np.inf)
+    before, previous = np.full(columns, np.inf), cost[0].copy()  # the match may start anywhere
+    for i in range(1, rows):
+        shifted = np.concatenate((inf, previous))
+        current = cost[i] + np.minimum.reduce((
+            shifted[1:-1],                           # (i-1, j-1)
+            shifted[:-2],                            # (i-1, j-2)
+            np.concatenate((inf[:1], before[:-1])),  # (i-2, j-1)
+        ))
+        before, previous = previous, current
+    return float(previous.min() / rows)
+
+
+class WakeGate:
+    """
+    On-device check that runs in sleep mode before an utterance goes to STT. webrtcvad
+    drops audio with too little speech. What is left always goes to STT while emergency
+    phrases are configured, since a missed emergency costs far more than an upload.
+    Otherwise it is compared against recorded templates of the wake phrases (NumPy MFCCs
+    aligned by subsequence DTW, so the phrase may sit anywhere in the utterance and be
+    spoken faster or slower) and only a close enough match is forwarded.
+
+    Templates are WAV files named wake_<id>.wav in `templates_path`. They are added by
+    `enroll` whenever full STT confirms a short utterance was a wake phrase, or from the
+    command line. Until there is one, speech is forwarded as before.
+    """
+
+    EVENTS = ("wake",)
+
+    def __init__(self, config=None, logger=None):
+        self.config = config or ConfigLoader().load_config()
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        self.settings = self.snapshot.wake_gate
+        self.lock = Lock()
+        self.vad = None
+        self.templates = None  # event -> [(path, features)], loaded on first use
+        self.stats = {'checked': 0, 'forwarded': 0, 'no_speech': 0, 'no_match': 0, 'enrolled': 0}
+
+    def apply_config(self, config):
+        old_settings = self.settings
+        self.config = config
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.debug = self.snapshot.system.debug_mode
+        self.settings = self.snapshot.wake_gate
+        with self.lock:
+            if self.settings.vad_aggressiveness != old_settings.vad_aggressiveness:
+                self.vad = None
+            if self.settings.templates_path != old_settings.templates_path:
+                self.templates = None
+
+    @property
+    def enabled(self):
+        return self.settings.enabled
+
+    def _samples(self, audio):
+        # 16 kHz int16 mono, or None for audio the gate cannot judge
+        if hasattr(audio, 'get_raw_data'):
+            pcm = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+        elif audio.sample_rate == SAMPLE_RATE and audio.sample_width == 2 and audio.channels == 1:
+            pcm = audio.pcm
+        else:
+            return None
+        return lazy_import("numpy").frombuffer(pcm, dtype="int16")
+
+    def _voiced(self, samples):
+        # The speech frames per webrtcvad, padded by one frame on each side of every run
+        if self.vad is None:
+            self.vad = lazy_import("webrtcvad").Vad(self.settings.vad_aggressiveness)
+        count = len(samples) // VAD_FRAME
+        if not count:
+            return samples[:0]
+        frames = samples[:count * VAD_FRAME].reshape(count, VAD_FRAME)
+        speech = lazy_import("numpy").array([self.vad.is_speech(frame.tobytes(), SAMPLE_RATE) for frame in frames])
+        keep = speech.copy()
+        keep[1:] |= speech[:-1]
+        keep[:-1] |= speech[1:]
+        return frames[keep].reshape(-1)
+
+    def _load_templates(self):
+        templates = {event: [] for event in self.EVENTS}
+        directory = self.settings.templates_path
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                event = name.split("_", 1)[0]
+                if event not in templates or not name.endswith(".wav"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    with open(path, "rb") as handle:
+                        samples = self._samples(AudioClip.from_wav_bytes(handle.read()))
+                    if samples is not None and len(samples):
+                        templates[event].append((path, mfcc(samples)))
+                except Exception as e:
+                    self.logger.warning(f"[Wake Gate] Skipping template {path}: {e}")
+        self.templates = templates
+        self.logger.info(f"[Wake Gate] Templates loaded: { {event: len(items) for event, items in templates.items()} }")
+
+    def missing_events(self):
+        # Events with configured phrases but nothing recorded to compare against
+        with self.lock:
+            if self.templates is None:
+                self._load_templates()
+            return [event for event in self.EVENTS if self.snapshot.phrases.get(event) and not self.templates[event]]
+
+    def check(self, audio):
+        """
+        Blocking, run it through asyncio.to_thread. Returns (forward, detail).
+        """
+        self.stats['checked'] += 1
+        samples = self._samples(audio)
+        if samples is None:
+            self.stats['forwarded'] += 1
+            return True, "audio format not supported by the gate"
+        voiced = self._voiced(samples)
+        if len(voiced) < self.settings.min_speech_seconds * SAMPLE_RATE:
+            self.stats['no_speech'] += 1
+            return False, f"{len(voiced) / SAMPLE_RATE:.2f}s of speech"
+        if self.snapshot.phrases.get('emergency'):
+            self.stats['forwarded'] += 1
+            return True, f"{len(voiced) / SAMPLE_RATE:.2f}s of speech, emergency phrases are not gated"
+        missing = self.missing_events()
+        if missing:
+            self.stats['forwarded'] += 1
+            return True, f"no templates for {missing} yet"
+
+        started = time.perf_counter()
+        features = mfcc(voiced)
+        with self.lock:
+            candidates = [(event, template) for event, items in self.templates.items() for _, template in items]
+        best_event, best = None, float("inf")
+        for event, template in candidates:
+            distance = match_distance(template, features)
+            if distance < best:
+                best_event, best = event, distance
+        detail = f"closest {best_event} template at {best:.2f} in {(time.perf_counter() - started) * 1000:.1f} ms"
+        if best <= self.settings.match_threshold:
+            self.stats['forwarded'] += 1
+            return True, detail
+        self.stats['no_match'] += 1
+        return False, detail
+
+    def enroll(self, event, audio, transcript=None, phrases=(), force=False):
+        """
+        Blocking. Stores `audio` as a template of `event` when it holds little more than
+        the phrase: at most one extra word in the transcript and max_template_seconds of
+        speech. `force` enrolls even with wake_gate.enroll off, for deliberate recordings.
+        Returns the template path or None.
+        """
+        if event not in self.EVENTS or not (self.settings.enroll or force):
+            return None
+        if transcript and phrases:
+            longest = max(len(normalize_text(phrase).split()) for phrase in phrases)
+            if len(normalize_text(transcript).split()) > longest + 1:
+                return None
+        samples = self._samples(audio)
+        if samples is None:
+            return None
+        voiced = self._voiced(samples)
+        seconds = len(voiced) / SAMPLE_RATE
+        if seconds < self.settings.min_speech_seconds or seconds > self.settings.max_template_seconds:
+            return None
+
+        with self.lock:
+            if self.templates is None:
+                self._load_templates()
+            os.makedirs(self.settings.templates_path, exist_ok=True)
+            path = os.path.join(self.settings.templates_path, f"{event}_{time.time_ns()}.wav")
+            with open(path, "wb") as handle:
+                handle.write(AudioClip(voiced.tobytes(), SAMPLE_RATE).to_wav_bytes())
+            items = self.templates[event]
+            items.append((path, mfcc(voiced)))
+            while len(items) > self.settings.max_templates:
+                old_path, _ = items.pop(0)
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        self.stats['enrolled'] += 1
+        self.logger.info(f"[Wake Gate] Enrolled a {event} template ({seconds:.2f}s): {transcript!r}")
+        return path
+
+
+# Enroll from WAV files: python -m listen.wake_gate enroll wake <file.wav>...
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 4 or sys.argv[1] != "enroll":
+        sys.exit("usage: python -m listen.wake_gate enroll <event> <file.wav>...")
+    gate = WakeGate()
+    for wav_path in sys.argv[3:]:
+        with open(wav_path, "rb") as wav_file:
+            stored = gate.enroll(sys.argv[2], AudioClip.from_wav_bytes(wav_file.read()), force=True)
+        print(f"{wav_path}: {stored or 'rejected (no speech, too long or wrong format)'}")
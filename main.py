@@ -9,7 +9,9 @@ import asyncio
 
 class MainController:
     def __init__(self, config=None, logger=None):
-        self.config = config or ConfigLoader().load_config()
+        self.config_loader = ConfigLoader()
+        self.owns_config = config is None
+        self.config = config or self.config_loader.load_config()
         self.logger = logger or ThreadedLoggerManager(__name__).get_logger()
         self.debug = self.config['system_settings'].get('debug_mode', False)
         self.orchestration_pipeline = OrchestrationPipeline(config=self.config, logger=self.logger)
@@ -45,8 +47,15 @@ class MainController:
                             break
                         continue
 
-                    # Process event from transcript
-                    event_type = await self.orchestration_pipeline.process_event(user_speech_as_text)
+                    # Process event from transcript; in speculative mode the LLM turn is already running
+                    llm_result = None
+                    if self.orchestration_pipeline.snapshot.system.speculative_llm:
+                        event_type, llm_result = await self.orchestration_pipeline.run_speculative_pipeline(
+                            user_speech_as_text
+                        )
+                    else:
+                        event_type = await self.orchestration_pipeline.process_event(user_speech_as_text)
+                    await self.orchestration_pipeline.enroll_wake_template(event_type, listen_obj, user_speech_as_text)
                     if event_type.get('event_type', EventType.CONTINUE) == EventType.EMERGENCY:
                         self.logger.warning("Emergency protocol activated!")
                         # Custom emergency logic can go here
@@ -59,9 +68,9 @@ class MainController:
                     elif event_type.get('event_type', EventType.CONTINUE) != EventType.CONTINUE:
                         continue
 
-                    parsed_response, model_designation, model_config = await self.orchestration_pipeline.run_llm_pipeline(
-                        user_speech_as_text
-                    )
+                    if llm_result is None:
+                        llm_result = await self.orchestration_pipeline.run_llm_pipeline(user_speech_as_text)
+                    parsed_response, model_designation, model_config = llm_result
                     if not parsed_response:
                         if run_once:
                             break
@@ -82,6 +91,27 @@ class MainController:
                 if run_once:
                     break
 
+    def apply_config(self, config):
+        self.config = config
+        self.debug = config['system_settings'].get('debug_mode', False)
+        self.orchestration_pipeline.apply_config(config)
+
+    async def run(self):
+        watcher = None
+        system_settings = self.orchestration_pipeline.snapshot.system
+        if self.owns_config and system_settings.config_hot_reload:
+            watcher = asyncio.create_task(
+                self.config_loader.watch(self.apply_config, interval=system_settings.config_reload_interval)
+            )
+        warm_up = asyncio.create_task(self.orchestration_pipeline.warm_up())
+        try:
+            await self.run_async()
+        finally:
+            warm_up.cancel()
+            if watcher:
+                watcher.cancel()
+            await self.orchestration_pipeline.shutdown()
+
 if __name__ == "__main__":
     controller = MainController()
-    asyncio.run(controller.run_async())
\ No newline at end of file
+    asyncio.run(controller.run())
\ No newline at end of file
@@ -1,8 +1,11 @@
+import asyncio
+import inspect
 from pathlib import Path
 from omegaconf import OmegaConf
 import yaml
 
 from core.system.logger import ThreadedLoggerManager
+from setup.config_snapshot import ConfigSnapshot
 
 class ConfigLoader:
     def __init__(self, config_path=None, default_path=None, logger=None):
@@ -10,8 +13,12 @@ class ConfigLoader:
         self.config_path = config_path or base_path / "config.yaml"
         self.default_path = default_path or base_path / "config_defaults.yaml"
         self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.snapshot = None
+        self.version = 0
+        self.mtimes = None
 
     def load_config(self):
+        mtimes = self.get_mtimes()
         try:
             with open(self.default_path, "r") as f:
                 default_cfg = OmegaConf.create(yaml.safe_load(f))
@@ -32,9 +39,76 @@ class ConfigLoader:
             return None
 
         final_cfg = OmegaConf.merge(default_cfg, user_cfg)
+
+        try:
+            snapshot = ConfigSnapshot.build(final_cfg, version=self.version + 1)
+        except Exception as e:
+            self.logger.error(f"Failed to build config snapshot: {e}")
+            return None
+        if snapshot.errors:
+            for error in snapshot.errors:
+                self.logger.error(f"Invalid configuration: {error}")
+            return None
+
+        self.version += 1
+        self.mtimes = mtimes
+        self.snapshot = ConfigSnapshot.register(final_cfg, snapshot)
         self.logger.info("Configuration successfully merged and loaded.")
         return final_cfg
 
+    def get_mtimes(self):
+        mtimes = []
+        for path in (self.default_path, self.config_path):
+            try:
+                mtimes.append(Path(path).stat().st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def reload_if_changed(self):
+        mtimes = self.get_mtimes()
+        if mtimes == self.mtimes:
+            return None
+
+        self.logger.info("Configuration files changed on disk, reloading.")
+        config = self.load_config()
+        if config is None:
+            # Don't retry the same broken file every poll; wait for the next edit
+            self.mtimes = mtimes
+            self.logger.error("Reloaded configuration is invalid, keeping the current version.")
+        return config
+
+    async def watch(self, on_change, interval=2.0):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                config = await asyncio.to_thread(self.reload_if_changed)
+                if config is None:
+                    continue
+                result = on_change(config)
+                if inspect.isawaitable(result):
+                    await result
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Config reload failed: {e}")
+
+    @staticmethod
+    def diff_sections(old_config, new_config):
+        old = OmegaConf.to_container(old_config, resolve=True) if old_config is not None else {}
+        new = OmegaConf.to_container(new_config, resolve=True)
+        changed = set()
+        for section in set(old) | set(new):
+            old_value, new_value = old.get(section), new.get(section)
+            if old_value == new_value:
+                continue
+            changed.add(section)
+            if isinstance(old_value, dict) and isinstance(new_value, dict):
+                for key in set(old_value) | set(new_value):
+                    if old_value.get(key) != new_value.get(key):
+                        changed.add(f"{section}.{key}")
+        return changed
+
 
 # Optional CLI/Direct use
 if __name__ == "__main__":
@@ -0,0 +1,330 @@
+import weakref
+from dataclasses import dataclass, field, fields, replace
+from threading import RLock
+from types import MappingProxyType
+
+from omegaconf import OmegaConf
+
+EMPTY_MAPPING = MappingProxyType({})
+
+
+def _as_tuple(value):
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    return tuple(str(item) for item in value)
+
+
+def _section(cls, values):
+    # Only pick keys the dataclass knows about; unknown keys stay reachable through the DictConfig
+    known = {f.name for f in fields(cls) if f.init}
+    return {key: value for key, value in (values or {}).items() if key in known}
+
+
+@dataclass(frozen=True, slots=True)
+class SystemSettings:
+    debug_mode: bool = False
+    timeout_unit: str = "seconds"
+    mic_ingest_timeout: float = 5
+    phrase_timeout: float = 15
+    persist_audio: bool = False
+    mic_capture_mode: str = "per_turn"
+    mic_sample_rate: int = 16000
+    mic_ring_seconds: float = 60
+    mic_pause_threshold: float = 0.8
+    mic_min_phrase: float = 0.25
+    mic_preroll: float = 0.3
+    mic_energy_ratio: float = 1.5
+    mic_min_energy: float = 300
+    mic_noise_adaptation: float = 0.05
+    mic_playback_tail: float = 0.3
+    mic_queue_size: int = 8
+    immediate_halt_phrases: tuple = ()
+    default_model_designation: str = "model_1"
+    general_system_prompt: str = ""
+    assistant_timeout: float = 20
+    assistant_retry_attempts: int = 3
+    assistant_retry_delay: float = 1
+    config_hot_reload: bool = False
+    config_reload_interval: float = 2
+    speculative_llm: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class ServiceSettings:
+    mode: int = 2
+    primary_service: str = ""
+    secondary_service: str = ""
+    timeout: float = 5
+    retry_attempts: int = 3
+    retry_delay: float = 1
+    hedge_delay: float = 1.5
+    hedge_percentile: float = 90
+    stream_min_chars: int = 8
+    stream_clause_min_chars: int = 80
+    stream_prefetch: int = 2
+    stream_playback: bool = False
+    stream_service: str = ""
+    stream_final_timeout: float = 2
+    playback_sample_rate: int = 24000
+    cache_enabled: bool = False
+    cache_dir: str = "cache/tts"
+    cache_memory_mb: float = 32
+    cache_disk_mb: float = 256
+    cache_prerender: bool = False
+    cache_prerender_phrases: tuple = ()
+
+
+@dataclass(frozen=True, slots=True)
+class LLMClientSettings:
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 60
+    keepalive_ping_interval: float = 0
+
+
+@dataclass(frozen=True, slots=True)
+class HttpClientSettings:
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60
+    per_host_limit: int = 4
+
+
+@dataclass(frozen=True, slots=True)
+class HealthSettings:
+    window: int = 20
+    failure_threshold: float = 0.5
+    min_calls: int = 4
+    consecutive_failures: int = 3
+    open_seconds: float = 5
+    max_open_seconds: float = 120
+    retry_budget_ratio: float = 0.2
+    retry_budget_min: int = 3
+    backoff_max: float = 10
+
+
+@dataclass(frozen=True, slots=True)
+class ContextSettings:
+    enabled: bool = True
+    chars_per_token: float = 3.5
+    message_overhead: int = 4
+    reply_reserve_tokens: int = 1024
+    keep_recent_messages: int = 6
+    compact_at: float = 0.75
+    trim_to: float = 0.6
+    summary_max_tokens: int = 256
+
+
+@dataclass(frozen=True, slots=True)
+class SessionStoreSettings:
+    enabled: bool = False
+    path: str = "data/session_memory.db"
+    restore_messages: int = 200
+    flush_interval: float = 0.5
+    batch_size: int = 100
+
+
+@dataclass(frozen=True, slots=True)
+class LongTermMemorySettings:
+    enabled: bool = False
+    path: str = "data/long_term"
+    embedder: str = "hashing"
+    embedding_dim: int = 256
+    embedding_model: str = ""
+    embedding_node: str = ""
+    top_k: int = 4
+    min_score: float = 0.3
+    inject_tokens: int = 400
+    max_snippet_chars: int = 500
+    batch_size: int = 32
+
+
+@dataclass(frozen=True, slots=True)
+class WakeGateSettings:
+    enabled: bool = False
+    vad_aggressiveness: int = 2
+    min_speech_seconds: float = 0.3
+    match_threshold: float = 1.45
+    templates_path: str = "data/wake_templates"
+    enroll: bool = False
+    max_templates: int = 5
+    max_template_seconds: float = 3
+
+
+@dataclass(frozen=True, slots=True)
+class ResponseCacheSettings:
+    enabled: bool = False
+    ttl_seconds: float = 600
+    max_entries: int = 256
+    history_messages: int = 2
+    deterministic_only: bool = True
+    roles: tuple = ()
+    volatile_words: tuple = ()
+    volatile_ttl_seconds: float = 0
+
+
+@dataclass(frozen=True, slots=True)
+class ModelSettings:
+    key: str
+    designation: str
+    name: str = ""
+    provider: str = "openai"
+    voice: str = "en-IE-EmilyNeural"
+    model: str = "gpt-3.5-turbo"
+    node: str = ""
+    nodes: tuple = ()
+    api_key: str = ""
+    max_tokens: int = 150
+    context_tokens: int = 4096
+    temperature: float = 0.7
+    stream_output: bool = False
+    cache_responses: bool = False
+    enabled: bool = False
+    wake_phrases: tuple = ()
+    sleep_phrases: tuple = ()
+    emergency_phrases: tuple = ()
+    roles: MappingProxyType = field(default_factory=lambda: EMPTY_MAPPING)
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigSnapshot:
+    """
+    Immutable, typed view of a merged DictConfig with the derived lookups the hot paths need.
+    """
+
+    system: SystemSettings
+    speech_to_text: ServiceSettings
+    text_to_speech: ServiceSettings
+    llm_clients: LLMClientSettings
+    http_clients: HttpClientSettings
+    provider_health: HealthSettings
+    context_window: ContextSettings
+    session_store: SessionStoreSettings
+    long_term_memory: LongTermMemorySettings
+    response_cache: ResponseCacheSettings
+    wake_gate: WakeGateSettings
+    models: MappingProxyType
+    enabled_models: tuple
+    phrases: MappingProxyType
+    role_keywords: MappingProxyType
+    role_model_scores: MappingProxyType
+    version: int = 0
+    errors: tuple = ()
+
+    # id(config) -> (weakref to the config, snapshot); an entry goes when its config is
+    # collected, so hot reloads do not pile up old versions
+    _cache = {}
+    _lock = RLock()  # the weakref callback can run from a collection inside the lock
+
+    @classmethod
+    def build(cls, config, version=0):
+        raw = OmegaConf.to_container(config, resolve=True) if OmegaConf.is_config(config) else dict(config or {})
+
+        system_raw = dict(raw.get('system_settings') or {})
+        system_raw['immediate_halt_phrases'] = _as_tuple(system_raw.get('immediate_halt_phrases'))
+        system = SystemSettings(**_section(SystemSettings, system_raw))
+
+        tts_raw = dict(raw.get('text_to_speech') or {})
+        tts_raw['cache_prerender_phrases'] = _as_tuple(tts_raw.get('cache_prerender_phrases'))
+
+        cache_raw = dict(raw.get('response_cache') or {})
+        cache_raw['roles'] = _as_tuple(cache_raw.get('roles'))
+        cache_raw['volatile_words'] = _as_tuple(cache_raw.get('volatile_words'))
+
+        models = {}
+        for key, model_raw in (raw.get('models') or {}).items():
+            model_raw = dict(model_raw or {})
+            for phrase_key in ('wake_phrases', 'sleep_phrases', 'emergency_phrases'):
+                model_raw[phrase_key] = _as_tuple(model_raw.get(phrase_key))
+            roles = model_raw.get('roles') or {}
+            if not isinstance(roles, dict):
+                roles = {role: 1 for role in roles}
+            model_raw['roles'] = MappingProxyType(dict(roles))
+            # `nodes` is the pool to balance over, `node` its first member when not given
+            model_raw['nodes'] = _as_tuple(model_raw.get('nodes'))
+            model_raw['node'] = model_raw.get('node') or (model_raw['nodes'][0] if model_raw['nodes'] else "")
+            if model_raw['nodes'] and model_raw['node'] not in model_raw['nodes']:
+                model_raw['nodes'] = (model_raw['node'],) + model_raw['nodes']
+            model_raw['designation'] = model_raw.get('designation') or key
+            model_raw['key'] = key
+            models[key] = ModelSettings(**_section(ModelSettings, model_raw))
+
+        enabled = tuple(model for model in models.values() if model.enabled)
+        phrases = {
+            'wake': tuple(p for model in enabled for p in model.wake_phrases),
+            'sleep': tuple(p for model in enabled for p in model.sleep_phrases),
+            'emergency': tuple(p for model in enabled for p in model.emergency_phrases),
+            'shutdown': system.immediate_halt_phrases,
+        }
+
+        role_keywords = {
+            role: tuple(str(word).lower() for word in (role_raw or {}).get('key_words', []))
+            for role, role_raw in (raw.get('roles') or {}).items()
+        }
+        role_model_scores = {}
+        for model in enabled:
+            for role, score in model.roles.items():
+                role_model_scores.setdefault(role, []).append((model.designation, score))
+        role_model_scores = {
+            role: tuple(sorted(scores, key=lambda item: item[1], reverse=True))
+            for role, scores in role_model_scores.items()
+        }
+
+        snapshot = cls(
+            system=system,
+            speech_to_text=ServiceSettings(**_section(ServiceSettings, raw.get('speech_to_text'))),
+            text_to_speech=ServiceSettings(**_section(ServiceSettings, tts_raw)),
+            llm_clients=LLMClientSettings(**_section(LLMClientSettings, raw.get('llm_clients'))),
+            http_clients=HttpClientSettings(**_section(HttpClientSettings, raw.get('http_clients'))),
+            provider_health=HealthSettings(**_section(HealthSettings, raw.get('provider_health'))),
+            context_window=ContextSettings(**_section(ContextSettings, raw.get('context_window'))),
+            session_store=SessionStoreSettings(**_section(SessionStoreSettings, raw.get('session_store'))),
+            long_term_memory=LongTermMemorySettings(**_section(LongTermMemorySettings, raw.get('long_term_memory'))),
+            response_cache=ResponseCacheSettings(**_section(ResponseCacheSettings, cache_raw)),
+            wake_gate=WakeGateSettings(**_section(WakeGateSettings, raw.get('wake_gate'))),
+            models=MappingProxyType(models),
+            enabled_models=tuple(model.designation for model in enabled),
+            phrases=MappingProxyType(phrases),
+            role_keywords=MappingProxyType(role_keywords),
+            role_model_scores=MappingProxyType(role_model_scores),
+            version=version,
+        )
+        return replace(snapshot, errors=tuple(snapshot.validate()))
+
+    def validate(self):
+        errors = []
+        for name, service in (('speech_to_text', self.speech_to_text), ('text_to_speech', self.text_to_speech)):
+            if service.mode not in (1, 2, 3):
+                errors.append(f"{name}.mode must be 1, 2 or 3 (got {service.mode})")
+        default_model = self.models.get(self.system.default_model_designation)
+        if not default_model:
+            errors.append(f"default_model_designation '{self.system.default_model_designation}' is not a configured model")
+        elif not default_model.enabled:
+            errors.append(f"default model '{default_model.key}' is disabled")
+        for model in self.models.values():
+            if model.enabled and not model.node:
+                errors.append(f"enabled model '{model.key}' has no node")
+        return errors
+
+    @classmethod
+    def register(cls, config, snapshot):
+        key = id(config)
+
+        def forget(ref):
+            with cls._lock:
+                if cls._cache.get(key, (None,))[0] is ref:
+                    del cls._cache[key]
+
+        with cls._lock:
+            cls._cache[key] = (weakref.ref(config, forget), snapshot)
+        return snapshot
+
+    @classmethod
+    def for_config(cls, config):
+        with cls._lock:
+            cached = cls._cache.get(id(config))
+            if cached and cached[0]() is config:
+                return cached[1]
+        return cls.register(config, cls.build(config))
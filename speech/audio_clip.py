@@ -0,0 +1,43 @@
+import io
+import wave
+
+
+class AudioClip:
+    """
+    Raw PCM audio kept in memory between synthesis/capture and playback/STT.
+    """
+
+    __slots__ = ("pcm", "sample_rate", "channels", "sample_width")
+
+    def __init__(self, pcm, sample_rate, channels=1, sample_width=2):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+
+    def __bool__(self):
+        return len(self.pcm) > 0
+
+    @property
+    def duration(self):
+        frame_size = self.channels * self.sample_width
+        return len(self.pcm) / float(frame_size * self.sample_rate) if frame_size and self.sample_rate else 0.0
+
+    @classmethod
+    def from_wav_bytes(cls, data):
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            return cls(
+                pcm=wav_file.readframes(wav_file.getnframes()),
+                sample_rate=wav_file.getframerate(),
+                channels=wav_file.getnchannels(),
+                sample_width=wav_file.getsampwidth(),
+            )
+
+    def to_wav_bytes(self):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(self.channels)
+            wav_file.setsampwidth(self.sample_width)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(self.pcm)
+        return buffer.getvalue()
@@ -0,0 +1,164 @@
+import io
+
+from core.system.provider_registry import lazy_import
+from speech.audio_clip import AudioClip
+
+_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    2.5: (11025, 12000, 8000),
+}
+_VERSIONS = {0b00: 2.5, 0b10: 2, 0b11: 1}
+_decode_supported = None
+
+
+def mp3_decode_supported():
+    # libsndfile gained MP3 support in 1.1.0; older builds fall back to pydub/ffmpeg
+    global _decode_supported
+    if _decode_supported is None:
+        try:
+            _decode_supported = "MP3" in lazy_import("soundfile").available_formats()
+        except (ImportError, OSError):
+            _decode_supported = False
+    return _decode_supported
+
+
+def parse_frame_header(data, offset):
+    # Returns (frame_length, samples_per_frame, sample_rate) for a Layer III header, else None
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+    version = _VERSIONS.get((data[offset + 1] >> 3) & 0b11)
+    layer = (data[offset + 1] >> 1) & 0b11
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0b11
+    padding = (data[offset + 2] >> 1) & 0b1
+    if version is None or layer != 0b01 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    if version == 1:
+        return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+    return 72 * bitrate // sample_rate + padding, 576, sample_rate
+
+
+def xing_frame(header, frame_count):
+    """
+    Builds an audio-less Xing frame announcing `frame_count` frames. libsndfile reports the
+    length libmpg123 estimates from the first frame's bitrate, which truncates VBR streams.
+    """
+    mpeg1 = (header[1] >> 3) & 0b11 == 0b11
+    mono = header[3] >> 6 == 0b11
+    # 64 kbps keeps the frame large enough for the tag at every sample rate
+    first = bytes((0xFF, header[1] | 0x01, (0x50 if mpeg1 else 0x80) | (header[2] & 0x0C), header[3]))
+    frame_length = parse_frame_header(first, 0)[0]
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    tag = b"Xing" + (1).to_bytes(4, "big") + frame_count.to_bytes(4, "big")
+    frame = first + bytes(side_info) + tag
+    return frame + bytes(frame_length - len(frame))
+
+
+class Mp3StreamDecoder:
+    """
+    Decodes an MP3 byte stream to PCM as it arrives, in-process via libsndfile.
+    Each batch of complete frames is decoded together with a few preceding frames so the
+    bit reservoir and MDCT overlap are primed; the samples of those context frames are dropped.
+    """
+
+    # main_data_begin reaches up to 511 bytes back, and the frame before the first new one
+    # must decode cleanly as well since its IMDCT tail overlaps into it
+    CONTEXT_BYTES = 1024
+
+    def __init__(self, min_frames=6):
+        self.min_frames = min_frames
+        self.buffer = bytearray()
+        self.frames = []  # (start, end) offsets of complete frames in buffer not yet decoded
+        self.context = []  # raw bytes of the last decoded frames
+        self.scan = 0
+        self.samples_per_frame = None
+        self.sample_rate = None
+
+    def feed(self, data):
+        self.buffer.extend(data)
+        self._split()
+        if len(self.frames) < self.min_frames:
+            return None
+        return self._decode()
+
+    def flush(self):
+        self._split()
+        if not self.frames:
+            return None
+        return self._decode()
+
+    def _split(self):
+        buffer = self.buffer
+        while self.scan + 4 <= len(buffer):
+            if buffer[self.scan:self.scan + 3] == b"ID3":
+                # ID3v2 tag: 10 byte header followed by a syncsafe size
+                if self.scan + 10 > len(buffer):
+                    break
+                size = 0
+                for byte in buffer[self.scan + 6:self.scan + 10]:
+                    size = (size << 7) | (byte & 0x7F)
+                if self.scan + 10 + size > len(buffer):
+                    break
+                self.scan += 10 + size
+                continue
+            header = parse_frame_header(buffer, self.scan)
+            if header is None:
+                # Lost sync, skip ahead to the next candidate frame header
+                next_sync = buffer.find(b"\xff", self.scan + 1)
+                self.scan = next_sync if next_sync != -1 else len(buffer)
+                continue
+            frame_length, samples_per_frame, sample_rate = header
+            if self.scan + frame_length > len(buffer):
+                break
+            if not self._is_info_frame(self.scan, self.scan + frame_length):
+                self.samples_per_frame = samples_per_frame
+                self.sample_rate = sample_rate
+                self.frames.append((self.scan, self.scan + frame_length))
+            self.scan += frame_length
+
+    def _is_info_frame(self, start, end):
+        # Xing/Info/VBRI headers carry no audio and would make libmpg123 trim "gapless" padding
+        head = bytes(self.buffer[start:min(end, start + 48)])
+        return b"Xing" in head or b"Info" in head or b"VBRI" in head
+
+    def _decode(self):
+        soundfile = lazy_import("soundfile")
+        new_frames = [bytes(self.buffer[start:end]) for start, end in self.frames]
+        frames = self.context + new_frames
+        segment = xing_frame(frames[0], len(frames)) + b"".join(frames)
+        pcm, _ = soundfile.read(io.BytesIO(segment), dtype="int16", always_2d=True)
+
+        # libmpg123 drops its decoder delay from the front of every segment, so the context
+        # frames account for that many fewer output samples
+        delay = max(0, len(frames) * self.samples_per_frame - len(pcm))
+        pcm = pcm[max(0, len(self.context) * self.samples_per_frame - delay):]
+
+        self.context = self._trim_context(self.context + new_frames)
+        consumed = self.frames[-1][1]
+        del self.buffer[:consumed]
+        self.scan -= consumed
+        self.frames = []
+
+        if not len(pcm):
+            return None
+        return AudioClip(pcm.tobytes(), self.sample_rate, channels=pcm.shape[1], sample_width=2)
+
+    def _trim_context(self, frames):
+        kept = []
+        size = 0
+        for frame in reversed(frames):
+            if size >= self.CONTEXT_BYTES and len(kept) >= 2:
+                break
+            kept.append(frame)
+            size += len(frame)
+        kept.reverse()
+        return kept
+
@@ -0,0 +1,209 @@
+import asyncio
+from collections import deque
+from threading import Lock
+
+from core.system.logger import ThreadedLoggerManager
+from core.system.provider_registry import lazy_import
+
+
+def to_stream_format(audio_clip, sample_rate):
+    # Mono int16 at the stream rate; TTS backends disagree on width, channels and rate
+    np = lazy_import("numpy")
+    samples = np.frombuffer(audio_clip.pcm, dtype={1: np.uint8, 2: np.int16, 4: np.int32}[audio_clip.sample_width])
+    if audio_clip.sample_width == 1:
+        samples = (samples.astype(np.int16) - 128) << 8
+    elif audio_clip.sample_width == 4:
+        samples = (samples >> 16).astype(np.int16)
+    if audio_clip.channels > 1:
+        samples = samples.reshape(-1, audio_clip.channels).mean(axis=1).astype(np.int16)
+    if audio_clip.sample_rate != sample_rate and len(samples):
+        length = int(round(len(samples) * sample_rate / audio_clip.sample_rate))
+        positions = np.linspace(0, len(samples) - 1, length)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+    return samples
+
+
+class PlaybackHandle:
+    """
+    One queued utterance. Await it to wait for the end of playback, cancel it to cut it
+    short (or drop it before it starts). Streamed handles receive audio via `write` and
+    end once `close` is called and everything written has played.
+    """
+
+    def __init__(self, loop, sample_rate, label=""):
+        self.loop = loop
+        self.sample_rate = sample_rate
+        self.label = label
+        self.chunks = deque()
+        self.offset = 0
+        self.closed = False
+        self.cancelled = False
+        self.samples_played = 0
+        self.finished = loop.create_future()
+        self.finished.add_done_callback(self._on_done)
+
+    def __await__(self):
+        return self.finished.__await__()
+
+    def write(self, audio_clip):
+        samples = to_stream_format(audio_clip, self.sample_rate)
+        if len(samples):
+            self.chunks.append(samples)
+
+    def close(self):
+        self.closed = True
+
+    def cancel(self):
+        self.cancelled = True
+        self.finished.cancel()
+
+    def done(self):
+        return self.finished.done()
+
+    @property
+    def duration(self):
+        return self.samples_played / self.sample_rate
+
+    def _on_done(self, future):
+        # Cancelling the awaiting task cancels the future, which must stop the audio as well
+        if future.cancelled():
+            self.cancelled = True
+
+    def _read_into(self, out):
+        # Audio thread: copies as many samples as are available, returns the count
+        filled = 0
+        while filled < len(out) and self.chunks:
+            chunk = self.chunks[0]
+            count = min(len(out) - filled, len(chunk) - self.offset)
+            out[filled:filled + count] = chunk[self.offset:self.offset + count]
+            filled += count
+            self.offset += count
+            if self.offset == len(chunk):
+                self.chunks.popleft()
+                self.offset = 0
+        self.samples_played += filled
+        return filled
+
+    def _exhausted(self):
+        return self.cancelled or (self.closed and not self.chunks)
+
+
+class PlaybackEngine:
+    """
+    Owns a single output stream for the process lifetime. Clips are converted to the
+    stream format when queued and mixed into the device callback back to back, so the
+    next clip is already buffered when the current one ends. Nothing here blocks the loop.
+    """
+
+    def __init__(self, sample_rate=24000, on_state=None, logger=None):
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.sample_rate = sample_rate
+        self.on_state = on_state
+        self.pending = deque()
+        self.lock = Lock()
+        self.loop = None
+        self.stream = None
+        self.latency = 0.0  # read by the audio thread, which must not touch a closing stream
+        self.active = False
+        self.device_active = False  # owned by the audio thread, `active` follows it on the loop
+        self.underruns = 0
+
+    def start(self, loop=None):
+        if self.stream is not None:
+            return
+        self.loop = loop or asyncio.get_running_loop()
+        sd = lazy_import("sounddevice")
+        self.stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype='int16',
+            callback=self._callback,
+        )
+        self.latency = self.stream.latency
+        self.stream.start()
+        self.logger.info(f"[Playback] Output stream opened at {self.sample_rate} Hz")
+
+    def close(self):
+        self.stop_all()
+        if self.stream is None:
+            return
+        try:
+            self.stream.stop()
+            self.stream.close()
+        except Exception as e:
+            self.logger.warning(f"[Playback] Failed to close output stream: {e}")
+        self.stream = None
+        with self.lock:
+            self.pending.clear()
+        self.active = self.device_active = False
+        self.logger.info(f"[Playback] Output stream closed ({self.underruns} underrun(s))")
+
+    def set_sample_rate(self, sample_rate):
+        # The stream is reopened on the next play with the new rate
+        if sample_rate != self.sample_rate:
+            self.close()
+            self.sample_rate = sample_rate
+
+    def play(self, audio_clip, label=""):
+        handle = self.open_stream(label)
+        handle.write(audio_clip)
+        handle.close()
+        return handle
+
+    def open_stream(self, label=""):
+        self.start()
+        handle = PlaybackHandle(self.loop, self.sample_rate, label)
+        with self.lock:
+            self.pending.append(handle)
+        return handle
+
+    def stop_all(self):
+        with self.lock:
+            handles = list(self.pending)
+        for handle in handles:
+            handle.cancelled = True
+            if self.loop and not self.loop.is_closed():
+                self.loop.call_soon_threadsafe(handle.cancel)
+
+    def _callback(self, outdata, frames, time_info, status):
+        out = outdata[:, 0]
+        filled = 0
+        finished = []
+        with self.lock:
+            while self.pending:
+                handle = self.pending[0]
+                if not handle.cancelled:
+                    filled += handle._read_into(out[filled:])
+                if handle._exhausted():
+                    finished.append(self.pending.popleft())
+                    continue
+                if filled < frames and handle.samples_played:
+                    self.underruns += 1  # streamed handle ran dry mid-utterance
+                break
+            active = bool(self.pending) or filled > 0
+        out[filled:] = 0
+
+        if (finished or active != self.device_active) and not self.loop.is_closed():
+            self.device_active = active
+            # Futures and listeners belong to the loop; report after the buffer latency
+            # so "finished" means heard, not merely handed to the device
+            self.loop.call_soon_threadsafe(self._report, finished, active, self.latency)
+
+    def _report(self, finished, active, latency):
+        if active != self.active:
+            self.active = active
+            if not active:
+                self.loop.call_later(latency, self._notify_state)
+            else:
+                self._notify_state()
+        for handle in finished:
+            self.loop.call_later(latency, self._finish, handle)
+
+    def _notify_state(self):
+        if self.on_state:
+            self.on_state(self.active)
+
+    @staticmethod
+    def _finish(handle):
+        if not handle.finished.done():
+            handle.finished.set_result(handle.duration)
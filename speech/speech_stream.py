@@ -0,0 +1,236 @@
+import asyncio
+import time
+from collections import deque
+
+from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
+from core.system.logger import ThreadedLoggerManager
+
+
+class SentenceSegmenter:
+    SENTENCE_END = ".!?"
+    CLAUSE_END = ",;:"
+    CLOSERS = "\"')]}”’"
+    FENCE = "```"
+    ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "st", "vs", "etc", "e.g", "i.e", "jr", "sr", "prof", "no"}
+
+    def __init__(self, min_chars=8, clause_min_chars=80):
+        self.min_chars = min_chars
+        self.clause_min_chars = clause_min_chars
+        self.buffer = ""
+        self.scan_from = 0
+        self.in_code_block = False
+
+    def feed(self, token):
+        if not token:
+            return []
+        self.buffer += token
+        return self._drain(final=False)
+
+    def flush(self):
+        chunks = self._drain(final=True)
+        self.buffer = ""
+        self.scan_from = 0
+        self.in_code_block = False
+        return chunks
+
+    def _drain(self, final):
+        chunks = []
+        while self.buffer:
+            if self.in_code_block:
+                # Code blocks (tool JSON etc.) are never spoken, see SystemTools.extract_natural_output
+                fence_idx = self.buffer.find(self.FENCE)
+                if fence_idx == -1:
+                    self.buffer = "" if final else self.buffer[-(len(self.FENCE) - 1):]
+                    self.scan_from = 0
+                    break
+                self.buffer = self.buffer[fence_idx + len(self.FENCE):]
+                self.scan_from = 0
+                self.in_code_block = False
+                continue
+
+            fence_idx = self.buffer.find(self.FENCE)
+            limit = fence_idx if fence_idx != -1 else len(self.buffer)
+            split_at = self._find_boundary(limit)
+
+            if split_at is not None:
+                self._emit(self.buffer[:split_at], chunks)
+                self.buffer = self.buffer[split_at:]
+                self.scan_from = 0
+                continue
+
+            if fence_idx != -1:
+                self._emit(self.buffer[:fence_idx], chunks)
+                self.buffer = self.buffer[fence_idx + len(self.FENCE):]
+                self.scan_from = 0
+                self.in_code_block = True
+                continue
+
+            if final:
+                self._emit(self.buffer, chunks)
+                self.buffer = ""
+            else:
+                # Only the tail can still turn into a boundary once more tokens arrive
+                self.scan_from = max(0, len(self.buffer) - 4)
+            break
+        return chunks
+
+    def _find_boundary(self, limit):
+        text = self.buffer
+        for i in range(self.scan_from, limit):
+            char = text[i]
+            if char == "\n":
+                if text[:i].strip():
+                    return i + 1
+                continue
+            if char not in self.SENTENCE_END and char not in self.CLAUSE_END:
+                continue
+
+            end = i + 1
+            while end < limit and text[end] in self.CLOSERS:
+                end += 1
+            if end >= limit:
+                # Can't tell "3." from "3.5" until the next character arrives; flush() handles the tail
+                return None
+            if not text[end].isspace():
+                continue
+
+            length = len(text[:end].strip())
+            if char in self.SENTENCE_END:
+                if length >= self.min_chars and not self._is_abbreviation(text, i):
+                    return end
+            elif length >= self.clause_min_chars:
+                return end
+        return None
+
+    def _is_abbreviation(self, text, dot_idx):
+        if text[dot_idx] != ".":
+            return False
+        start = dot_idx
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+        word = text[start:dot_idx].lower().lstrip("\"'([")
+        return word in self.ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+    @staticmethod
+    def _emit(text, chunks):
+        text = text.strip()
+        if text:
+            chunks.append(text)
+
+
+class StreamingSpeechHandler:
+    """
+    Receives LLM tokens via `handle_token`, cuts them into sentences/clauses and keeps
+    synthesis of the next chunk running while the current one plays. With a `gate`
+    (asyncio.Event) nothing is played before it is set; synthesis still runs ahead.
+    """
+
+    def __init__(self, text_to_speech, model_config, config=None, logger=None, gate=None):
+        self.config = config or ConfigLoader().load_config()
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.text_to_speech = text_to_speech
+        self.model_config = model_config
+        self.gate = gate
+
+        text_config = ConfigSnapshot.for_config(self.config).text_to_speech
+        self.segmenter = SentenceSegmenter(
+            min_chars=text_config.stream_min_chars,
+            clause_min_chars=text_config.stream_clause_min_chars,
+        )
+        self.text_queue = asyncio.Queue()
+        self.prefetch = text_config.stream_prefetch
+        self.audio_queue = asyncio.Queue(maxsize=self.prefetch)
+        self.synth_task = None
+        self.playback_task = None
+        self.spoken_chunks = 0
+        self.started_at = None
+        self.first_audio_at = None
+
+    def start(self):
+        if self.synth_task:
+            return
+        self.started_at = time.perf_counter()
+        self.synth_task = asyncio.create_task(self._synthesis_worker())
+        self.playback_task = asyncio.create_task(self._playback_worker())
+
+    async def handle_token(self, token):
+        for chunk in self.segmenter.feed(token):
+            await self._enqueue(chunk)
+
+    async def speak(self, text):
+        for chunk in self.segmenter.flush():
+            await self._enqueue(chunk)
+        await self._enqueue(text)
+
+    async def finish(self):
+        if not self.synth_task:
+            return
+        for chunk in self.segmenter.flush():
+            await self._enqueue(chunk)
+        await self.text_queue.put(None)
+        try:
+            await asyncio.gather(self.synth_task, self.playback_task)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"[TTS Stream] Worker error: {e}")
+        if self.debug and self.first_audio_at:
+            self.logger.debug(
+                f"[TTS Stream] {self.spoken_chunks} chunk(s) spoken, first audio after "
+                f"{self.first_audio_at - self.started_at:.2f}s"
+            )
+
+    def cancel(self):
+        for task in (self.synth_task, self.playback_task):
+            if task and not task.done():
+                task.cancel()
+        self.segmenter.flush()
+
+    async def _enqueue(self, chunk):
+        if not self.synth_task:
+            self.start()
+        if self.debug:
+            self.logger.debug(f"[TTS Stream] Queued chunk: {chunk}")
+        await self.text_queue.put(chunk)
+
+    async def _synthesis_worker(self):
+        try:
+            while True:
+                chunk = await self.text_queue.get()
+                if chunk is None:
+                    break
+                audio = await self.text_to_speech.synthesize(chunk, self.model_config)
+                if audio:
+                    await self.audio_queue.put(audio)
+                else:
+                    self.logger.warning(f"[TTS Stream] No audio for chunk: {chunk}")
+        finally:
+            await self.audio_queue.put(None)
+
+    async def _playback_worker(self):
+        # Chunks are queued on the playback engine as soon as they are synthesized so they
+        # play back to back; only `stream_prefetch` of them may be waiting at a time
+        queued = deque()
+        try:
+            while True:
+                audio = await self.audio_queue.get()
+                if audio is None:
+                    break
+                if self.gate and not self.gate.is_set():
+                    await self.gate.wait()
+                if self.first_audio_at is None:
+                    self.first_audio_at = time.perf_counter()
+                handle = self.text_to_speech.play(audio)
+                if handle:
+                    queued.append(handle)
+                    self.spoken_chunks += 1
+                while len(queued) > self.prefetch:
+                    await queued.popleft()
+            while queued:
+                await queued.popleft()
+        except asyncio.CancelledError:
+            for handle in queued:
+                handle.cancel()
+            raise
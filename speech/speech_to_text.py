@@ -1,43 +1,69 @@
-import requests
-import concurrent.futures
+import asyncio
+import inspect
+import io
 import time
-import speech_recognition as sr
 
 from setup.config_loader import ConfigLoader
-from core.system.utils.basic_tools import BasicTools
+from setup.config_snapshot import ConfigSnapshot
 from core.system.logger import ThreadedLoggerManager
+from core.system.http_transport import HttpTransport, MultipartFile
+from core.system.provider_registry import ProviderRegistry, lazy_import
+from core.system.provider_health import ProviderError, ProviderHealth
+
+STT_PROVIDERS = ProviderRegistry("stt")
+STT_PROVIDERS.register("google", "speech_to_text_google", requires=("speech_recognition",))
+STT_PROVIDERS.register_url("speech_to_text_api", requires=("httpx",))
 
 class SpeechToText:
-    def __init__(self, config=None, logger=None):
+    def __init__(self, config=None, logger=None, http=None):
         self.config = config or ConfigLoader().load_config()
         self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
         self.debug = self.config['system_settings'].get('debug_mode', False)
-
-    def get_speech_to_text(self, audio_file):
-        speech_config = self.config.get('speech_to_text', False)
-
-        if not speech_config:
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        self.enabled = bool(self.config.get('speech_to_text', False))
+        self.health = ProviderHealth("stt", self.snapshot.provider_health, logger=self.logger)
+        self.http = http or HttpTransport(config=self.config, logger=self.logger)
+
+    def apply_config(self, config):
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.config = config
+        self.debug = self.snapshot.system.debug_mode
+        self.enabled = bool(config.get('speech_to_text', False))
+        self.health.apply_settings(self.snapshot.provider_health)
+
+    async def get_speech_to_text(self, wav_data):
+        if not self.enabled:
             self.logger.warning("Speech to text is disabled in the configuration.")
             return None
 
-        mode = speech_config.get('mode', 3)
-        primary = speech_config.get('primary_service', 'google')
-        secondary = speech_config.get('secondary_service', 'google')
+        speech_config = self.snapshot.speech_to_text
+        mode = speech_config.mode
+        primary = speech_config.primary_service or 'google'
+        secondary = speech_config.secondary_service or 'google'
 
-        if mode == 1:
-            return self.stt_trusted_call(primary, audio_file)
-        elif mode == 2:
-            return self.stt_reliable_call(primary, secondary, audio_file)
-        elif mode == 3:
-            return self.stt_no_trust_call(primary, secondary, audio_file)
-        else:
+        if mode not in (1, 2, 3):
             self.logger.error("Invalid STT mode selected in the configuration.")
             return None
 
-    def stt_trusted_call(self, service, audio_file):
+        # Providers with an open circuit are skipped outright instead of paying their retries
+        services = self.health.route([primary] if mode == 1 else [primary, secondary])
+        if not services:
+            self.logger.error("[STT] No healthy STT provider available, skipping this utterance.")
+            return None
+        if mode == 1 or len(services) == 1:
+            return await self.stt_trusted_call(services[0], wav_data)
+        elif mode == 2:
+            return await self.stt_reliable_call(services[0], services[1], wav_data)
+        return await self.stt_hedged_call(services[0], services[1], wav_data)
+
+    def get_speech_to_text_sync(self, wav_data):
+        # The blocking entry point from before mode 3 went async, for callers without a loop
+        return asyncio.run(self.get_speech_to_text(wav_data))
+
+    async def stt_trusted_call(self, service, wav_data):
         self.logger.info("Running STT Mode 1 Trusted Call: Primary only")
         try:
-            text = self.stt_service(service, audio_file)
+            text = await self.stt_service(service, wav_data)
             if not text:
                 self.logger.warning("Primary service failed in Mode 1.")
             if self.debug:
@@ -47,15 +73,15 @@ class SpeechToText:
             self.logger.exception(f"Error in STT Mode 1: {e}")
             return None
 
-    def stt_reliable_call(self, primary, secondary, audio_file):
+    async def stt_reliable_call(self, primary, secondary, wav_data):
         self.logger.info("Running STT Mode 2 Reliable Call: Primary with failover")
         try:
-            text = self.stt_service(primary, audio_file)
+            text = await self.stt_service(primary, wav_data)
             if text:
                 return text
 
             self.logger.warning("Primary failed. Trying secondary.")
-            text = self.stt_service(secondary, audio_file)
+            text = await self.stt_service(secondary, wav_data)
             if not text:
                 self.logger.error("Both services failed in Mode 2.")
             if self.debug:
@@ -65,102 +91,109 @@ class SpeechToText:
             self.logger.exception(f"Error in STT Mode 2 Reliable Call: {e}")
             return None
 
-    def stt_no_trust_call(self, primary, secondary, audio_file):
-        self.logger.info("Running STT Mode 3 Zero Trust: Concurrent fallback (first valid wins)")
+    def hedge_delay(self, service):
+        speech_config = self.snapshot.speech_to_text
+        delay = self.health.percentile(service, speech_config.hedge_percentile)
+        return speech_config.hedge_delay if delay is None else delay
+
+    async def stt_hedged_call(self, primary, secondary, wav_data):
+        # The secondary only runs when the primary is slower than its usual p90 (or fails),
+        # and whichever valid transcript lands first is returned without waiting on the other
+        delay = self.hedge_delay(primary)
+        self.logger.info(f"Running STT Mode 3 Hedged Call: secondary after {delay * 1000:.0f} ms")
+        tasks = {asyncio.create_task(self.stt_service(primary, wav_data)): primary}
+        hedged = False
         try:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future_map = {
-                    executor.submit(self.stt_service, primary, audio_file): primary,
-                    executor.submit(self.stt_service, secondary, audio_file): secondary,
-                }
-
-                valid_result = None
-
-                while future_map and not valid_result:
-                    done_batch, _ = concurrent.futures.wait(
-                        future_map.keys(),
-                        return_when=concurrent.futures.FIRST_COMPLETED
-                    )
-
-                    for completed_future in done_batch:
-                        service_name = future_map.pop(completed_future)
-                        try:
-                            result = completed_future.result(timeout=2)
-
-                            if result and isinstance(result, str) and result.strip():
-                                self.logger.info(f"[STT Mode 3] Winner: {service_name} | Result: {result}")
-                                valid_result = result
-                                break
-                            else:
-                                self.logger.warning(f"[STT Mode 3] {service_name} returned empty or invalid transcription.")
-                        except Exception as e:
-                            self.logger.warning(f"[STT Mode 3] {service_name} failed: {e}")
-
-                # Cancel any leftovers
-                for future in future_map:
-                    future.cancel()
-
-                if valid_result:
-                    return valid_result
-
-                self.logger.error("Both STT services failed in Mode 3.")
-                return None
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=None if hedged else delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    service_name = tasks.pop(task)
+                    result = task.result()
+                    if result and isinstance(result, str) and result.strip():
+                        self.health.record_win(service_name)
+                        self.logger.info(f"[STT Mode 3] Winner: {service_name} | Result: {result}")
+                        return result
+                    self.logger.warning(f"[STT Mode 3] {service_name} returned empty or invalid transcription.")
+
+                if not hedged:
+                    # Primary is past its hedge delay or came back empty
+                    hedged = True
+                    if self.debug:
+                        self.logger.debug(f"[STT Mode 3] Hedging to {secondary}")
+                    tasks[asyncio.create_task(self.stt_service(secondary, wav_data))] = secondary
 
-        except Exception as e:
-            self.logger.exception("Fatal error in Mode 3 Zero Trust STT.")
+            self.logger.error("Both STT services failed in Mode 3.")
+            return None
+
+        except Exception:
+            self.logger.exception("Fatal error in Mode 3 Hedged STT.")
             return None
+        finally:
+            # Losers are abandoned, not awaited; blocking providers finish in their worker thread
+            for task in tasks:
+                task.cancel()
 
-    def stt_service(self, service, audio_file):
+    async def stt_service(self, service, wav_data):
         self.logger.debug(f"[STT] Calling service: {service}")
         text = None
+        handler = STT_PROVIDERS.bind(self, service)
+        if handler is None:
+            self.logger.error(f"Unknown STT service: {service} (registered: {STT_PROVIDERS.names()})")
+            return None
+        if not self.health.allow(service):
+            self.logger.warning(f"[STT] Circuit open for '{service}', not calling it.")
+            return None
+        self.health.begin()
+        started = time.perf_counter()
         try:
-            if BasicTools.is_url(service):
-                if self.debug:
-                    self.logger.debug(f"URL detected for STT service: {service}")
-                text = self.speech_to_text_api(service, audio_file)
-            elif service == "google":
-                if self.debug:
-                    self.logger.debug(f"Google detected for STT service: {service}")
-                text = self.speech_to_text_google(audio_file)
+            if inspect.iscoroutinefunction(handler):
+                text = await handler(wav_data)
             else:
-                self.logger.error(f"Unknown STT service: {service}")
+                text = await asyncio.to_thread(handler, wav_data)
+            # No transcript (silence, mumbling) is a healthy answer, only errors count against it
+            self.health.record(service, time.perf_counter() - started, ok=True)
+        except asyncio.CancelledError:
+            self.health.record_abandoned(service, time.perf_counter() - started)
+            raise
+        except ProviderError as e:
+            self.health.record(service, time.perf_counter() - started, ok=False)
+            self.logger.warning(f"STT service '{service}' failed: {e}")
         except Exception as e:
+            self.health.record(service, time.perf_counter() - started, ok=False)
             self.logger.exception(f"Exception while invoking STT service '{service}': {e}")
         return text
 
-    def speech_to_text_api(self, api, audio_file):
-        speech_cfg = self.config['speech_to_text']
-        RE_ATTEMPS = speech_cfg.get('retry_attempts', 3)
-        RE_DELAY = speech_cfg.get('retry_delay', 5)
-        TIMEOUT = speech_cfg.get('timeout', 5)
-        retry_attempts = 0
-
-        while RE_ATTEMPS == 0 or retry_attempts < RE_ATTEMPS:
-            if self.debug:
-                self.logger.debug(f"[STT API] Attempting to call API: {api} (Attempt {retry_attempts + 1})")
-            try:
-                with open(audio_file, 'rb') as f:
-                    response = requests.post(api, files={'audio': f}, timeout=TIMEOUT)
-
-                if response.status_code == 200:
-                    if self.debug:
-                        self.logger.debug(f"[STT API] Response from {api}: {response.json()}")
-                    return response.json().get("transcript")
-
-            except requests.RequestException as e:
-                self.logger.warning(f"[STT API] Request error: {e}")
-
-            retry_attempts += 1
-            self.logger.info(f"[STT API] Retrying in {RE_DELAY * retry_attempts} seconds...")
-            time.sleep(RE_DELAY * retry_attempts)
-
-        self.logger.error("STT API retries exhausted.")
-        return None
-
-    def speech_to_text_google(self, audio_file):
+    async def speech_to_text_api(self, api, wav_data):
+        speech_cfg = self.snapshot.speech_to_text
+        if self.debug:
+            self.logger.debug(f"[STT API] Calling API: {api}")
+        body = MultipartFile('audio', 'audio.wav', wav_data, 'audio/wav')
+        response = await self.http.request(
+            "POST",
+            api,
+            content=body,
+            headers=body.headers,
+            retry_attempts=speech_cfg.retry_attempts,
+            retry_delay=speech_cfg.retry_delay,
+            timeout=speech_cfg.timeout,
+            label="STT API",
+        )
+
+        if response is None or response.status_code != 200:
+            status = response.status_code if response is not None else "no response"
+            raise ProviderError(f"[STT API] Request to {api} failed ({status}).")
+        payload = response.json()
+        if self.debug:
+            self.logger.debug(f"[STT API] Response from {api}: {payload}")
+        return payload.get("transcript")
+
+    def speech_to_text_google(self, wav_data):
+        sr = lazy_import("speech_recognition")
         recognizer = sr.Recognizer()
         try:
-            with sr.AudioFile(audio_file) as source:
+            with sr.AudioFile(io.BytesIO(wav_data)) as source:
                 audio = recognizer.record(source)
 
             text = recognizer.recognize_google(audio)
@@ -172,5 +205,4 @@ class SpeechToText:
             self.logger.warning("Google STT could not understand the audio.")
             return None
         except sr.RequestError as e:
-            self.logger.error(f"Google STT API error: {e}")
-            return None
+            raise ProviderError(f"Google STT API error: {e}") from e
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import time
+from functools import partial
+
+from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
+from core.system.logger import ThreadedLoggerManager
+from core.system.provider_registry import ProviderRegistry, lazy_import
+from core.system.provider_health import ProviderError
+
+STT_STREAM_PROVIDERS = ProviderRegistry("stt_stream")
+STT_STREAM_PROVIDERS.register_url("stream_websocket", requires=("aiohttp",))
+
+
+class StreamingSpeechToText:
+    """
+    Transcribes utterances while they are still being spoken. `handle_audio` is a
+    CaptureEngine stream listener: each utterance opens one session with the streaming
+    backend and its audio is sent block by block. Partial transcripts are passed to
+    `partial_listeners` (listener(utterance_id, text)) as they arrive, and once the
+    utterance has ended `final_transcript` returns the backend's final text, usually
+    without waiting for a whole upload.
+
+    Wire protocol of the URL backend (one WebSocket per utterance):
+      -> {"type": "start", "sample_rate": 16000, "encoding": "pcm_s16le"}
+      -> binary frames of raw PCM
+      -> {"type": "end"}
+      <- {"type": "partial", "transcript": "..."}  any number of times
+      <- {"type": "final", "transcript": "..."}
+    """
+
+    MAX_SESSIONS = 8
+
+    def __init__(self, speech_to_text, sample_rate=16000, config=None, logger=None):
+        self.config = config or ConfigLoader().load_config()
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        # Shares the provider health of the batch STT services
+        self.health = speech_to_text.health
+        self.sample_rate = sample_rate
+        self.sessions = {}  # utterance_id -> {'audio': Queue, 'task': Task, 'started': float}
+        self.partial_listeners = []
+        self.client_session = None
+        self.paused = False  # no new sessions, e.g. in sleep mode where the wake gate decides
+        self.stats = {'sessions': 0, 'partials': 0, 'finals': 0, 'fallbacks': 0}
+
+    def apply_config(self, config):
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.config = config
+        self.debug = self.snapshot.system.debug_mode
+
+    @property
+    def service(self):
+        return self.snapshot.speech_to_text.stream_service
+
+    @property
+    def enabled(self):
+        return bool(self.service)
+
+    def handle_audio(self, kind, utterance_id, pcm):
+        if kind == "start":
+            if self.enabled and not self.paused and self.health.allow(self.service):
+                self._open(utterance_id, pcm)
+            return
+        session = self.sessions.get(utterance_id)
+        if session is None:
+            return
+        if kind == "audio":
+            session['audio'].put_nowait(pcm)
+        elif kind == "end":
+            session['audio'].put_nowait(None)
+        elif kind == "discard":
+            self.discard(utterance_id)
+
+    def _open(self, utterance_id, pcm):
+        while len(self.sessions) >= self.MAX_SESSIONS:
+            # Utterances nobody collected (dropped from a full capture queue)
+            self.discard(next(iter(self.sessions)))
+        audio = asyncio.Queue()
+        if pcm:
+            audio.put_nowait(pcm)
+        self.health.begin()
+        started = time.perf_counter()
+        task = asyncio.get_running_loop().create_task(self._run_session(utterance_id, self.service, audio))
+        task.add_done_callback(partial(self._session_done, utterance_id, self.service, started))
+        self.sessions[utterance_id] = {'audio': audio, 'task': task, 'started': started}
+        self.stats['sessions'] += 1
+
+    async def _run_session(self, utterance_id, service, audio):
+        handler = STT_STREAM_PROVIDERS.bind(self, service)
+        if handler is None:
+            raise ProviderError(f"Unknown streaming service: {service} (registered: {STT_STREAM_PROVIDERS.names()})")
+
+        def on_partial(text):
+            self.stats['partials'] += 1
+            for listener in self.partial_listeners:
+                try:
+                    listener(utterance_id, text)
+                except Exception as e:
+                    self.logger.error(f"[STT Stream] Partial listener failed: {e}")
+
+        return await handler(self.sample_rate, audio, on_partial)
+
+    def _session_done(self, utterance_id, service, started, task):
+        # Every session ends here, even one discarded before it ever ran, so the outcome is
+        # always recorded and a half-open service gets its probe slot back
+        elapsed = time.perf_counter() - started
+        if task.cancelled():
+            self.health.record_abandoned(service, elapsed)
+        elif task.exception() is not None:
+            self.health.record(service, elapsed, ok=False)
+            self.logger.warning(f"[STT Stream] Session for utterance {utterance_id} failed: {task.exception()!r}")
+        else:
+            self.health.record(service, elapsed, ok=True)
+            self.stats['finals'] += 1
+
+    async def final_transcript(self, utterance_id):
+        """
+        Final transcript of an ended utterance, "" when the backend heard nothing, or None
+        when there is no session or it failed or timed out (upload the audio instead).
+        """
+        session = self.sessions.pop(utterance_id, None)
+        if session is None:
+            return None
+        session['audio'].put_nowait(None)
+        try:
+            text = await asyncio.wait_for(session['task'], timeout=self.snapshot.speech_to_text.stream_final_timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"[STT Stream] No final transcript for utterance {utterance_id} in time.")
+            text = None
+        except Exception:
+            text = None  # logged and recorded by _session_done
+        if text is None:
+            self.stats['fallbacks'] += 1
+        elif self.debug:
+            self.logger.debug(
+                f"[STT Stream] Final for utterance {utterance_id} after "
+                f"{time.perf_counter() - session['started']:.2f}s: {text!r}"
+            )
+        return text
+
+    def discard(self, utterance_id):
+        session = self.sessions.pop(utterance_id, None)
+        if session:
+            session['task'].cancel()
+
+    async def stream_websocket(self, url, sample_rate, audio, on_partial):
+        aiohttp = lazy_import("aiohttp")
+        if self.client_session is None or self.client_session.closed:
+            # Only connecting is bounded; a session lasts as long as the user speaks
+            self.client_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=None, connect=self.snapshot.speech_to_text.timeout)
+            )
+        async with self.client_session.ws_connect(url) as ws:
+            await ws.send_json({"type": "start", "sample_rate": sample_rate, "encoding": "pcm_s16le"})
+
+            async def send_audio():
+                while (chunk := await audio.get()) is not None:
+                    await ws.send_bytes(chunk)
+                await ws.send_json({"type": "end"})
+
+            sender = asyncio.create_task(send_audio())
+            try:
+                async for message in ws:
+                    if message.type == aiohttp.WSMsgType.TEXT:
+                        payload = json.loads(message.data)
+                        if payload.get("type") == "partial":
+                            on_partial(payload.get("transcript") or "")
+                        elif payload.get("type") == "final":
+                            return payload.get("transcript") or ""
+                    elif message.type == aiohttp.WSMsgType.ERROR:
+                        raise ProviderError(f"[STT Stream] WebSocket error: {ws.exception()}")
+                if sender.done() and sender.exception():
+                    raise ProviderError(f"[STT Stream] Sending audio failed: {sender.exception()}")
+                raise ProviderError(f"[STT Stream] {url} closed the stream without a final transcript.")
+            finally:
+                sender.cancel()
+
+    async def close(self):
+        for utterance_id in list(self.sessions):
+            self.discard(utterance_id)
+        if self.client_session is not None:
+            await self.client_session.close()
+            self.client_session = None
+        self.logger.info(f"[STT Stream] Closed: {self.stats}")
+
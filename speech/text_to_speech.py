@@ -1,57 +1,164 @@
-import requests
-import concurrent.futures
-import time
 import asyncio
+import io
 import os
-from uuid import uuid4
-import simpleaudio as sa
-from pydub import AudioSegment
-from edge_tts import Communicate
-import inspect
+import time
 
 from setup.config_loader import ConfigLoader
+from setup.config_snapshot import ConfigSnapshot
 from core.system.utils.basic_tools import BasicTools
 from core.system.logger import ThreadedLoggerManager
+from core.system.http_transport import HttpTransport
+from core.system.provider_registry import ProviderRegistry, lazy_import
+from core.system.provider_health import ProviderHealth
+from speech.audio_clip import AudioClip
+from speech.mp3_stream import Mp3StreamDecoder, mp3_decode_supported
+from speech.playback_engine import PlaybackEngine
+from speech.tts_cache import TTSCache
+
+TTS_PROVIDERS = ProviderRegistry("tts")
+TTS_PROVIDERS.register("edge_tts", "text_to_speech_edge", requires=("edge_tts",))
+TTS_PROVIDERS.register_url("text_to_speech_api", requires=("httpx",))
 
 
 class TextToSpeech:
-    def __init__(self, config=None, logger=None):
+    def __init__(self, config=None, logger=None, http=None):
         self.config = config or ConfigLoader().load_config()
         self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
         self.debug = self.config['system_settings'].get('debug_mode', False)
+        self.snapshot = ConfigSnapshot.for_config(self.config)
+        self.enabled = bool(self.config.get('text_to_speech', False))
+        self.persist_audio = self.snapshot.system.persist_audio
+        self.playback_listeners = []
+        self.cache = self._build_cache()
+        self.playback = PlaybackEngine(
+            sample_rate=self.snapshot.text_to_speech.playback_sample_rate,
+            on_state=self.notify_playback,
+            logger=self.logger,
+        )
+        self.stream_tasks = set()
+        self.health = ProviderHealth("tts", self.snapshot.provider_health, logger=self.logger)
+        self.http = http or HttpTransport(config=self.config, logger=self.logger)
+
+    def apply_config(self, config):
+        old_tts = self.snapshot.text_to_speech
+        self.snapshot = ConfigSnapshot.for_config(config)
+        self.config = config
+        self.debug = self.snapshot.system.debug_mode
+        self.enabled = bool(config.get('text_to_speech', False))
+        self.persist_audio = self.snapshot.system.persist_audio
+
+        new_tts = self.snapshot.text_to_speech
+        cache_fields = ('cache_enabled', 'cache_dir', 'cache_memory_mb', 'cache_disk_mb')
+        if any(getattr(old_tts, name) != getattr(new_tts, name) for name in cache_fields):
+            self.cache = self._build_cache()
+        self.playback.set_sample_rate(new_tts.playback_sample_rate)
+        self.health.apply_settings(self.snapshot.provider_health)
+
+    def start_playback(self):
+        if not self.enabled:
+            return
+        try:
+            self.playback.start()
+        except Exception as e:
+            self.logger.error(f"Failed to open audio output: {e}")
+
+    def close(self):
+        for task in list(self.stream_tasks):
+            task.cancel()
+        self.playback.close()
+
+    def _build_cache(self):
+        text_config = self.snapshot.text_to_speech
+        if not text_config.cache_enabled:
+            return None
+        cache_dir = text_config.cache_dir
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(os.getcwd(), cache_dir)
+        return TTSCache(
+            cache_dir,
+            memory_max_mb=text_config.cache_memory_mb,
+            disk_max_mb=text_config.cache_disk_mb,
+            logger=self.logger,
+        )
+
+    async def prerender_cache(self):
+        text_config = self.snapshot.text_to_speech
+        if not (self.cache and text_config.cache_prerender and text_config.cache_prerender_phrases):
+            return
+        primary = text_config.primary_service or 'edge_tts'
+        for model_config in self.snapshot.models.values():
+            if not model_config.enabled:
+                continue
+            for phrase in text_config.cache_prerender_phrases:
+                try:
+                    await self.tts_service(primary, phrase, model_config)
+                except Exception as e:
+                    self.logger.warning(f"[TTS Cache] Pre-render failed for '{phrase}': {e}")
+        self.logger.info(f"[TTS Cache] Pre-render complete: {self.cache.stats}")
 
     async def give_text_to_speech(self, text, model_config):
-        text_config = self.config.get('text_to_speech', False)
-        if not text_config:
+        handle = await self.queue_speech(text, model_config)
+        if handle:
+            await handle
+
+    async def queue_speech(self, text, model_config):
+        # Queues `text` behind whatever is already playing and returns its playback handle
+        # without waiting, so the caller can prepare the next utterance meanwhile
+        if self.can_stream(text, model_config):
+            handle = await self.queue_streamed(text, model_config)
+            if handle:
+                return handle
+        audio_clip = await self.synthesize(text, model_config)
+        return self.play(audio_clip)
+
+    def can_stream(self, text, model_config):
+        # Streaming playback skips the failover/race strategies, so only a trusted or
+        # failover edge_tts primary qualifies; a failed stream still falls back to synthesize
+        text_config = self.snapshot.text_to_speech
+        if not (self.enabled and text_config.stream_playback and text_config.mode in (1, 2)):
+            return False
+        if (text_config.primary_service or 'edge_tts') != 'edge_tts' or not self.health.available('edge_tts'):
+            return False
+        return not (self.cache and self.cache.contains(text, model_config.voice, 'edge_tts'))
+
+    async def synthesize(self, text, model_config):
+        if not self.enabled:
             self.logger.warning("Text-to-speech is disabled in the configuration.")
             return None
 
-        mode = text_config.get('mode', 1)
-        primary = text_config.get('primary_service', 'edge_tts')
-        secondary = text_config.get('secondary_service', 'edge_tts')
+        text_config = self.snapshot.text_to_speech
+        mode = text_config.mode
+        primary = text_config.primary_service or 'edge_tts'
+        secondary = text_config.secondary_service or 'edge_tts'
 
-        if mode == 1:
-            audio_path = await self.tts_trusted_call(primary, text, model_config)
-        elif mode == 2:
-            audio_path = await self.tts_reliable_call(primary, secondary, text, model_config)
-        elif mode == 3:
-            audio_path = await self.tts_no_trust_call(primary, secondary, text, model_config)
-        else:
+        if mode not in (1, 2, 3):
             self.logger.error("Invalid TTS mode specified - Aborting.")
             return None
 
-        return await self.speak(audio_path)
+        # Providers with an open circuit are skipped outright instead of paying their retries
+        services = self.health.route([primary] if mode == 1 else [primary, secondary])
+        if not services:
+            # Cached audio does not depend on provider health
+            services = [primary]
+        if mode == 1 or len(services) == 1:
+            audio_clip = await self.tts_trusted_call(services[0], text, model_config)
+        elif mode == 2:
+            audio_clip = await self.tts_reliable_call(services[0], services[1], text, model_config)
+        else:
+            audio_clip = await self.tts_no_trust_call(services[0], services[1], text, model_config)
+
+        return audio_clip
 
     async def tts_trusted_call(self, service, text, model_config):
         self.logger.info(f"TTS Strategy: TRUSTED CALL - using service '{service}'")
 
         try:
-            audio_path = await self.tts_service(service, text, model_config)
-            if audio_path:
+            audio_clip = await self.tts_service(service, text, model_config)
+            if audio_clip:
                 self.logger.info(f"Service '{service}' succeeded.")
             else:
                 self.logger.warning(f"Service '{service}' returned no audio.")
-            return audio_path
+            return audio_clip
 
         except Exception as e:
             self.logger.exception(f"Trusted TTS call failed: {e}")
@@ -62,10 +169,10 @@ class TextToSpeech:
 
         try:
             self.logger.info(f"Trying primary TTS service: {primary}")
-            audio_path = await self.tts_service(primary, text, model_config)
-            if audio_path:
+            audio_clip = await self.tts_service(primary, text, model_config)
+            if audio_clip:
                 self.logger.info(f"Primary service '{primary}' succeeded.")
-                return audio_path
+                return audio_clip
 
             self.logger.warning(f"Primary service '{primary}' failed. Attempting fallback to '{secondary}'.")
             fallback_audio = await self.tts_service(secondary, text, model_config)
@@ -82,18 +189,26 @@ class TextToSpeech:
             return None
 
     async def tts_no_trust_call(self, primary, secondary, text, model_config):
-        self.logger.info("TTS Strategy: NO TRUST (racing services with validation)")
-
+        self.logger.info("TTS Strategy: NO TRUST (racing services, first valid wins)")
+        tasks = {
+            asyncio.create_task(self.tts_service(primary, text, model_config)): primary,
+            asyncio.create_task(self.tts_service(secondary, text, model_config)): secondary,
+        }
         try:
-            results = await asyncio.gather(
-                self.tts_service(primary, text, model_config),
-                self.tts_service(secondary, text, model_config),
-                return_exceptions=True
-            )
-
-            for result in results:
-                if isinstance(result, str) and os.path.exists(result):
-                    return result
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    service = tasks.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        self.logger.warning(f"[TTS Mode 3] {service} failed: {e}")
+                        continue
+                    if isinstance(result, AudioClip) and result:
+                        self.health.record_win(service)
+                        self.logger.info(f"[TTS Mode 3] Winner: {service} ({result.duration:.2f}s of audio)")
+                        return result
+                    self.logger.warning(f"[TTS Mode 3] {service} returned no valid audio.")
 
             self.logger.error("No valid TTS responses in zero-trust mode.")
             return None
@@ -101,102 +216,216 @@ class TextToSpeech:
         except Exception as e:
             self.logger.exception(f"Concurrent TTS call failed: {e}")
             return None
+        finally:
+            # The loser's synthesis is cancelled outright; its audio only ever lived in memory
+            for task in tasks:
+                task.cancel()
 
     async def tts_service(self, service, text, model_config):
         self.logger.debug(f"Using {service} for: {text}")
-        if BasicTools.is_url(service):
-            if self.debug:
-                self.logger.debug(f"[TTS] API URL: {service}")
-            return await self.text_to_speech_api(service, text)
-        elif service == 'edge_tts':
-            if self.debug:
-                self.logger.debug("[TTS] Using Edge TTS service")
-            return await self.text_to_speech_edge(text, model_config)
-
-        self.logger.error(f"Unknown TTS service: {service}")
+        handler = TTS_PROVIDERS.bind(self, service)
+        if handler:
+            if self.cache:
+                return await self.cache.get_or_synthesize(
+                    text, model_config.voice, service, lambda: self._timed_synthesis(service, handler, text, model_config)
+                )
+            return await self._timed_synthesis(service, handler, text, model_config)
+
+        self.logger.error(f"Unknown TTS service: {service} (registered: {TTS_PROVIDERS.names()})")
         return None
 
-    async def speak(self, audio_path):
-        if not audio_path or not os.path.exists(audio_path):
-            self.logger.warning("Audio path invalid or file missing.")
+    async def _timed_synthesis(self, service, handler, text, model_config):
+        # Only real synthesis is gated and timed; cache hits say nothing about the provider
+        if not self.health.allow(service):
+            self.logger.warning(f"[TTS] Circuit open for '{service}', not calling it.")
+            return None
+        self.health.begin()
+        started = time.perf_counter()
+        try:
+            audio_clip = await handler(text, model_config)
+        except asyncio.CancelledError:
+            self.health.record_abandoned(service, time.perf_counter() - started)
+            raise
+        except Exception:
+            self.health.record(service, time.perf_counter() - started, ok=False)
+            raise
+        self.health.record(service, time.perf_counter() - started, ok=bool(audio_clip))
+        return audio_clip
+
+    def play(self, audio_clip):
+        if not audio_clip:
+            self.logger.warning("No audio to play.")
             return None
 
-        self.logger.info(f"Playing audio: {audio_path}")
+        self.logger.info(f"Queued audio: {audio_clip.duration:.2f}s")
         try:
-            wave_obj = sa.WaveObject.from_wave_file(audio_path)
-            play_obj = wave_obj.play()
-            play_obj.wait_done()
+            return self.playback.play(audio_clip)
+        except Exception as e:
+            self.logger.error(f"Audio playback error: {e}")
+            return None
+
+    async def speak(self, audio_clip):
+        handle = self.play(audio_clip)
+        if handle:
+            await handle
             if self.debug:
-                self.logger.debug(f"Audio playback completed: {audio_path}")
+                self.logger.debug("Audio playback completed.")
+
+    async def queue_streamed(self, text, model_config):
+        """
+        Queues Edge TTS audio for playback while it is still streaming in. Returns None if no
+        audio arrived, so the caller can fall back to the regular synthesize path.
+        """
+        if not self.health.allow('edge_tts'):
+            return None
+        self.health.begin()
+        started = time.perf_counter()
+        chunks = asyncio.Queue()
+        producer = asyncio.create_task(self._produce_edge_chunks(text, model_config, chunks))
+        try:
+            first_clip = await chunks.get()
+        except asyncio.CancelledError:
+            producer.cancel()
+            self.health.record_abandoned('edge_tts', time.perf_counter() - started)
+            raise
+        if first_clip is None:
+            self.health.record('edge_tts', time.perf_counter() - started, ok=False)
+            return None
+
+        self.logger.info(f"[Edge TTS] First audio after {(time.perf_counter() - started) * 1000:.0f} ms")
+        try:
+            handle = self.playback.open_stream(label=text)
         except Exception as e:
             self.logger.error(f"Audio playback error: {e}")
+            producer.cancel()
+            # The device failed, not the provider; free the probe slot without judging edge_tts
+            self.health.record_abandoned('edge_tts', time.perf_counter() - started)
+            return None
+        handle.write(first_clip)
+        feeder = asyncio.create_task(
+            self._feed_stream(handle, first_clip, chunks, producer, text, model_config, started)
+        )
+        self.stream_tasks.add(feeder)
+        feeder.add_done_callback(self.stream_tasks.discard)
+        return handle
+
+    async def _feed_stream(self, handle, first_clip, chunks, producer, text, model_config, started):
+        pcm = bytearray(first_clip.pcm)
+        complete = None
+        try:
+            while not handle.done():
+                clip = await chunks.get()
+                if clip is None:
+                    break
+                handle.write(clip)
+                pcm.extend(clip.pcm)
+            handle.close()
+            if not handle.cancelled:
+                complete = await producer
+        except asyncio.CancelledError:
+            handle.cancel()
+            raise
         finally:
-            try:
-                os.remove(audio_path)
-                if self.debug:
-                    self.logger.debug(f"Temporary audio file deleted: {audio_path}")
-            except Exception as e:
-                self.logger.warning(f"Failed to delete audio file: {e}")
+            handle.close()
+            if handle.done() and not producer.done():
+                producer.cancel()
+            # Every exit records an outcome, or a half-open edge_tts would keep its probe slot
+            if complete is None:
+                self.health.record_abandoned('edge_tts', time.perf_counter() - started)
+            else:
+                self.health.record('edge_tts', time.perf_counter() - started, ok=complete)
 
-    async def text_to_speech_api(self, api, text):
-        text_config = self.config.get('text_to_speech', {})
-        retries = text_config.get('retry_attempts', 3)
-        delay = text_config.get('retry_delay', 5)
-        timeout = text_config.get('timeout', 5)
+        if not complete:
+            return
+        audio_clip = AudioClip(bytes(pcm), first_clip.sample_rate, first_clip.channels, first_clip.sample_width)
+        if self.debug:
+            self.logger.debug(f"[Edge TTS] Streamed {audio_clip.duration:.2f}s of audio")
+        if self.cache:
+            await self.cache.store(text, model_config.voice, 'edge_tts', audio_clip)
 
-        uid = uuid4().hex[:8]
-        output_path = os.path.join(os.getcwd(), "temp_audio", f"{uid}.wav")
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    async def _produce_edge_chunks(self, text, model_config, chunks):
+        try:
+            async for clip in self.edge_audio_chunks(text, model_config):
+                chunks.put_nowait(clip)
+            return True
+        except Exception as e:
+            self.logger.error(f"[Edge TTS] Exception: {e}")
+            return False
+        finally:
+            chunks.put_nowait(None)
 
-        for attempt in range(retries or 1):
+    def notify_playback(self, active):
+        for listener in self.playback_listeners:
             try:
-                response = requests.post(api, params={"text": text}, timeout=timeout)
-                if self.debug:
-                    self.logger.debug(f"[TTS API] Attempt {attempt + 1}: {response.status_code}")
-                if response.status_code == 200:
-                    with open(output_path, "wb") as f:
-                        f.write(response.content)
-                    self.logger.info(f"Audio saved to {output_path}")
-                    return output_path
-                else:
-                    self.logger.warning(f"API error: {response.status_code} - {response.text}")
-            except requests.exceptions.RequestException as e:
-                self.logger.warning(f"API request failed: {e}")
-                await asyncio.sleep(delay * (attempt + 1))
-        self.logger.error("TTS API retries exhausted.")
-        return None
+                listener(active)
+            except Exception as e:
+                self.logger.warning(f"Playback listener error: {e}")
+
+    async def text_to_speech_api(self, api, text, model_config=None):
+        text_config = self.snapshot.text_to_speech
+        response = await self.http.request(
+            "POST",
+            api,
+            params={"text": text},
+            retry_attempts=text_config.retry_attempts,
+            retry_delay=text_config.retry_delay,
+            timeout=text_config.timeout,
+            label="TTS API",
+        )
+
+        if response is None:
+            self.logger.error("TTS API retries exhausted.")
+            return None
+        if response.status_code != 200:
+            self.logger.warning(f"API error: {response.status_code} - {response.text}")
+            return None
+        if self.persist_audio:
+            BasicTools.save_temp_audio(response.content, prefix="tts_api")
+        audio_clip = AudioClip.from_wav_bytes(response.content)
+        self.logger.info(f"[TTS API] Received {audio_clip.duration:.2f}s of audio")
+        return audio_clip
 
     async def text_to_speech_edge(self, text, model_config):
-        temp_dir = os.path.join(os.getcwd(), "temp_audio")
-        os.makedirs(temp_dir, exist_ok=True)
-
-        uid = uuid4().hex[:8]
-        mp3_path = os.path.join(temp_dir, f"{uid}.mp3")
-        wav_path = mp3_path.replace(".mp3", ".wav")
-
-        self.logger.debug(f"[Edge TTS] Saving audio to {mp3_path}")
         try:
-            if self.debug:
-                self.logger.debug(f"[Edge TTS] Text to convert: {text}")
-            communicate = Communicate(text=text, voice=model_config.get('voice', 'en-IE-EmilyNeural'))
-            await communicate.save(mp3_path)
-
-            if not os.path.exists(mp3_path):
-                self.logger.warning("[Edge TTS] MP3 file not created!")
-                return None
-
-            self.logger.debug(f"[Edge TTS] Converting to WAV: {wav_path}")
-            sound = AudioSegment.from_file(mp3_path, format="mp3")
-            sound.export(wav_path, format="wav")
-
-            if not os.path.exists(wav_path):
-                self.logger.warning("[Edge TTS] WAV export failed!")
+            clips = [clip async for clip in self.edge_audio_chunks(text, model_config)]
+            if not clips:
+                self.logger.warning("[Edge TTS] No audio received!")
                 return None
 
-            os.remove(mp3_path)
+            first = clips[0]
+            audio_clip = AudioClip(b"".join(clip.pcm for clip in clips), first.sample_rate, first.channels, first.sample_width)
             if self.debug:
-                self.logger.debug(f"[Edge TTS] WAV file created: {wav_path}")    
-            return wav_path
+                self.logger.debug(f"[Edge TTS] Decoded {audio_clip.duration:.2f}s of audio")
+            return audio_clip
         except Exception as e:
             self.logger.error(f"[Edge TTS] Exception: {e}")
             return None
+
+    async def edge_audio_chunks(self, text, model_config):
+        # Yields PCM AudioClips as the MP3 stream arrives, decoded in-process by libsndfile
+        if self.debug:
+            self.logger.debug(f"[Edge TTS] Text to convert: {text}")
+        communicate = lazy_import("edge_tts").Communicate(text=text, voice=model_config.voice)
+        decoder = Mp3StreamDecoder() if mp3_decode_supported() else None
+        mp3_data = bytearray()
+
+        async for chunk in communicate.stream():
+            if chunk["type"] != "audio":
+                continue
+            if self.persist_audio or not decoder:
+                mp3_data.extend(chunk["data"])
+            if decoder:
+                clip = decoder.feed(chunk["data"])
+                if clip:
+                    yield clip
+
+        if self.persist_audio and mp3_data:
+            BasicTools.save_temp_audio(bytes(mp3_data), prefix="tts_edge", extension="mp3")
+        if decoder:
+            clip = decoder.flush()
+            if clip:
+                yield clip
+        elif mp3_data:
+            self.logger.debug(f"[Edge TTS] libsndfile lacks MP3 support, decoding {len(mp3_data)} bytes via pydub")
+            sound = await asyncio.to_thread(lazy_import("pydub").AudioSegment.from_file, io.BytesIO(mp3_data), format="mp3")
+            yield AudioClip(sound.raw_data, sound.frame_rate, sound.channels, sound.sample_width)
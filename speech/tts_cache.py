@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from threading import Lock
+
+from core.system.logger import ThreadedLoggerManager
+from speech.audio_clip import AudioClip
+
+
+class TTSCache:
+    """
+    Content-addressed cache of synthesized audio keyed by (normalized text, voice, provider).
+    Both tiers are size-bounded LRUs; concurrent requests for the same key share one synthesis.
+    """
+
+    def __init__(self, cache_dir, memory_max_mb=32, disk_max_mb=256, logger=None):
+        self.logger = logger or ThreadedLoggerManager.get_instance(__name__).get_logger()
+        self.cache_dir = cache_dir
+        self.memory_max_bytes = int(memory_max_mb * 1024 * 1024)
+        self.disk_max_bytes = int(disk_max_mb * 1024 * 1024)
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk_index = None
+        self.disk_bytes = 0
+        self.disk_lock = Lock()
+        self.in_flight = {}
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'shared': 0}
+
+    @staticmethod
+    def make_key(text, voice, provider):
+        normalized = " ".join(str(text).split())
+        return hashlib.sha256(f"{provider}\0{voice}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def contains(self, text, voice, provider):
+        key = self.make_key(text, voice, provider)
+        return key in self.memory or (self.disk_index is not None and key in self.disk_index)
+
+    async def store(self, text, voice, provider, clip):
+        key = self.make_key(text, voice, provider)
+        await asyncio.to_thread(self._write_disk, key, clip)
+        self._remember(key, clip)
+
+    async def get_or_synthesize(self, text, voice, provider, synthesize):
+        key = self.make_key(text, voice, provider)
+
+        clip = self.memory.get(key)
+        if clip is not None:
+            self.memory.move_to_end(key)
+            self.stats['memory_hits'] += 1
+            return clip
+
+        flight = self.in_flight.get(key)
+        if flight is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(key, synthesize))
+            flight = self.in_flight[key] = [task, 0]
+            task.add_done_callback(lambda _, key=key: self.in_flight.pop(key, None))
+        else:
+            self.stats['shared'] += 1
+
+        flight[1] += 1
+        try:
+            return await asyncio.shield(flight[0])
+        except asyncio.CancelledError:
+            # Only abandon the synthesis once nobody is waiting on it any more
+            if flight[1] == 1 and not flight[0].done():
+                flight[0].cancel()
+            raise
+        finally:
+            flight[1] -= 1
+
+    async def _fetch(self, key, synthesize):
+        clip = await asyncio.to_thread(self._read_disk, key)
+        if clip is not None:
+            self.stats['disk_hits'] += 1
+        else:
+            self.stats['misses'] += 1
+            clip = await synthesize()
+            if clip:
+                await asyncio.to_thread(self._write_disk, key, clip)
+        if clip:
+            self._remember(key, clip)
+        return clip
+
+    def _remember(self, key, clip):
+        size = len(clip.pcm)
+        if size > self.memory_max_bytes:
+            return
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key).pcm)
+        self.memory[key] = clip
+        self.memory_bytes += size
+        while self.memory_bytes > self.memory_max_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted.pcm)
+
+    def _load_disk_index(self):
+        # Oldest first, so the front of the OrderedDict is always the next eviction candidate
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                if entry.is_file() and entry.name.endswith(".wav"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        entries.sort()
+        self.disk_index = OrderedDict((key, size) for _, key, size in entries)
+        self.disk_bytes = sum(self.disk_index.values())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def _read_disk(self, key):
+        with self.disk_lock:
+            return self._read_disk_locked(key)
+
+    def _write_disk(self, key, clip):
+        with self.disk_lock:
+            self._write_disk_locked(key, clip)
+
+    def _read_disk_locked(self, key):
+        if self.disk_index is None:
+            self._load_disk_index()
+        if key not in self.disk_index:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                clip = AudioClip.from_wav_bytes(f.read())
+            os.utime(path)
+            self.disk_index.move_to_end(key)
+            return clip
+        except Exception as e:
+            self.logger.warning(f"[TTS Cache] Dropping unreadable entry {key[:12]}: {e}")
+            self._remove_disk(key)
+            return None
+
+    def _write_disk_locked(self, key, clip):
+        if self.disk_index is None:
+            self._load_disk_index()
+        data = clip.to_wav_bytes()
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception as e:
+            self.logger.warning(f"[TTS Cache] Failed to write entry {key[:12]}: {e}")
+            return
+
+        self.disk_bytes += len(data) - self.disk_index.pop(key, 0)
+        self.disk_index[key] = len(data)
+        while self.disk_bytes > self.disk_max_bytes and self.disk_index:
+            oldest = next(iter(self.disk_index))
+            self._remove_disk(oldest)
+
+    def _remove_disk(self, key):
+        self.disk_bytes -= self.disk_index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
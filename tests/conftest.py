@@ -0,0 +1,147 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from omegaconf import OmegaConf
+
+from setup.config_loader import ConfigLoader
+
+
+@pytest.fixture
+def make_config(tmp_path, monkeypatch):
+    """Defaults merged with `overrides`; relative paths (logs, data, cache) land in tmp_path."""
+    monkeypatch.chdir(tmp_path)
+
+    def make(overrides=None):
+        return OmegaConf.merge(ConfigLoader().load_config(), overrides or {})
+
+    return make
+
+
+class StandInLLM:
+    """
+    OpenAI compatible node for the LLM tests. Streams `reply` word by word, `delay` seconds
+    before the first chunk. `fail` answers every request with a 500 and `fail_next` only
+    that many upcoming requests; `cut_after` sends that many chunks and then an error
+    event, like a backend dying mid-answer. `usage_first` opens the stream with a chunk
+    without choices, like the usage chunk some backends send.
+    """
+
+    def __init__(self, reply="Hello there, how can I help?", delay=0.0):
+        self.reply = reply
+        self.delay = delay
+        self.fail = False
+        self.fail_next = 0
+        self.cut_after = None
+        self.usage_first = False
+        self.requests = 0
+        self.runner = None
+        self.url = None
+
+    async def chat(self, request):
+        self.requests += 1
+        body = await request.json()
+        await asyncio.sleep(self.delay)
+        if self.fail or self.fail_next:
+            self.fail_next = max(0, self.fail_next - 1)
+            return web.json_response({"error": {"message": "stand-in failure"}}, status=500)
+        if not body.get("stream"):
+            return web.json_response({
+                "id": "stand-in", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": self.reply}}],
+            })
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        if self.usage_first:
+            chunk = {"id": "stand-in", "object": "chat.completion.chunk", "created": 0, "model": body["model"], "choices": []}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        for index, word in enumerate(self.reply.split(" ")):
+            if self.cut_after is not None and index >= self.cut_after:
+                await response.write(f"data: {json.dumps({'error': {'message': 'stand-in cut off'}})}\n\n".encode())
+                return response
+            chunk = {
+                "id": "stand-in", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "delta": {"content": word if not index else f" {word}"}, "finish_reason": None}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def models(self, request):
+        if self.fail:
+            return web.json_response({"error": {"message": "stand-in failure"}}, status=500)
+        return web.json_response({"object": "list", "data": []})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat)
+        app.router.add_get("/v1/models", self.models)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self.runner.addresses[0][1]}/v1"
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+@pytest.fixture
+def stand_in_llm():
+    return StandInLLM
+
+
+class StandInSTT:
+    """
+    Streaming STT backend speaking the StreamingSpeechToText WebSocket protocol. It
+    "recognizes" one word of `script` per `seconds_per_word` of audio received, sends
+    the words so far as a partial each time one is added, and the same as the final.
+    """
+
+    def __init__(self, script="okay please shut down now I am done talking for today thanks", seconds_per_word=0.3):
+        self.script = script.split()
+        self.seconds_per_word = seconds_per_word
+        self.sessions = 0
+        self.runner = None
+        self.url = None
+
+    async def transcribe(self, request):
+        self.sessions += 1
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        sample_rate, samples, sent = 16000, 0, 0
+        async for message in ws:
+            if message.type == web.WSMsgType.BINARY:
+                samples += len(message.data) // 2
+                words = min(len(self.script), int(samples / sample_rate / self.seconds_per_word))
+                if words > sent:
+                    sent = words
+                    await ws.send_json({"type": "partial", "transcript": " ".join(self.script[:words])})
+            elif message.type == web.WSMsgType.TEXT:
+                payload = json.loads(message.data)
+                if payload.get("type") == "start":
+                    sample_rate = payload.get("sample_rate", sample_rate)
+                elif payload.get("type") == "end":
+                    await ws.send_json({"type": "final", "transcript": " ".join(self.script[:sent])})
+        return ws
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/transcribe/stream", self.transcribe)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self.runner.addresses[0][1]}/transcribe/stream"
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+@pytest.fixture
+def stand_in_stt():
+    return StandInSTT
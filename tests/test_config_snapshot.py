@@ -0,0 +1,36 @@
+import gc
+
+from omegaconf import OmegaConf
+
+from setup.config_snapshot import ConfigSnapshot
+
+
+def test_snapshot_is_cached_per_config():
+    config = OmegaConf.create({"system_settings": {"debug_mode": True}})
+    snapshot = ConfigSnapshot.for_config(config)
+    assert ConfigSnapshot.for_config(config) is snapshot
+    assert snapshot.system.debug_mode is True
+
+
+def test_replaced_configs_are_released():
+    gc.collect()
+    before = len(ConfigSnapshot._cache)
+    for version in range(50):
+        config = OmegaConf.create({"system_settings": {"config_reload_interval": version}})
+        ConfigSnapshot.register(config, ConfigSnapshot.build(config, version=version))
+    del config
+    gc.collect()
+    assert len(ConfigSnapshot._cache) == before
+
+
+def test_opt_in_features_are_off_by_default(make_config):
+    # Each is False in config_defaults.yaml and in its settings dataclass
+    bare = ConfigSnapshot.build({"models": {"model_1": {"node": "http://node/v1", "enabled": True}}})
+    for snapshot in (ConfigSnapshot.build(make_config()), bare):
+        assert not snapshot.system.config_hot_reload
+        assert not snapshot.system.speculative_llm
+        assert not snapshot.session_store.enabled
+        assert not snapshot.long_term_memory.enabled
+        assert not snapshot.response_cache.enabled
+        assert not snapshot.text_to_speech.cache_enabled
+        assert not snapshot.text_to_speech.cache_prerender
@@ -0,0 +1,139 @@
+import asyncio
+from dataclasses import replace
+
+from core.memory.context_window import ContextWindow, estimate_tokens
+from core.memory.session_memory import SessionMemoryManager
+from setup.config_snapshot import ContextSettings, ModelSettings
+
+# 4 characters per token and no template overhead keep the arithmetic readable
+SETTINGS = ContextSettings(chars_per_token=4, message_overhead=0, reply_reserve_tokens=0,
+                           keep_recent_messages=2, compact_at=0.75, trim_to=0.5)
+MODEL = ModelSettings(key="model_1", designation="model_1", context_tokens=100, max_tokens=0)
+
+
+def turns(count, words=40):
+    # Each message is `words` characters, 10 tokens
+    history = [{"role": "system", "content": "You are terse."}]
+    for index in range(count):
+        role = "user" if index % 2 == 0 else "assistant"
+        history.append({"role": role, "content": f"{index:03d}" + "x" * (words - 3)})
+    return history
+
+
+def tokens(messages):
+    return sum(estimate_tokens(message, SETTINGS) for message in messages)
+
+
+def test_the_budget_keeps_pins_and_slides_the_window_in_one_step():
+    window = ContextWindow("model_1")
+    history = turns(9)  # 4 + 90 tokens, fits the budget of 100
+    assert window.build(history, MODEL, SETTINGS) == history
+
+    history += turns(2)[1:]  # 114 tokens: trimmed down to trim_to of the budget at once
+    sent = window.build(history, MODEL, SETTINGS)
+    assert sent[0] == history[0] and sent[-1] == history[-1]
+    assert tokens(sent) <= 100 * SETTINGS.trim_to
+    oldest = sent[1]
+
+    history.append(turns(1)[1])  # still fits: the oldest message sent stays put
+    assert window.build(history, MODEL, SETTINGS)[1] is oldest
+
+
+def test_the_newest_message_is_sent_even_if_it_alone_is_over_budget():
+    window = ContextWindow("model_1")
+    history = turns(2) + [{"role": "user", "content": "y" * 1000}]
+    assert window.build(history, MODEL, SETTINGS)[-1] == history[-1]
+
+
+def test_compaction_runs_after_the_turn_and_folds_older_messages_into_the_summary():
+    window = ContextWindow("model_1")
+    seen, folded = [], []
+
+    async def summarizer(previous, messages, model_config):
+        seen.append((previous, [m["content"][:3] for m in messages]))
+        return f"{len(messages)} older messages"
+
+    async def scenario():
+        history = turns(7)  # 74 tokens, under compact_at
+        window.build(history, MODEL, SETTINGS)
+        assert window.compact(history, MODEL, SETTINGS, summarizer) is None
+        history.append(turns(8)[-1])  # the reply lands: 84 tokens
+        await window.compact(history, MODEL, SETTINGS, summarizer)
+        return history, window.build(history, MODEL, SETTINGS)
+
+    window.on_summary = lambda model, summary, covered: folded.append((summary, covered))
+    history, sent = asyncio.run(scenario())
+    assert seen == [("", ["000", "001", "002", "003", "004", "005"])]
+    assert folded == [("6 older messages", 7)]
+    assert sent == [history[0], {"role": "system", "content": ContextWindow.SUMMARY_PREFIX + "6 older messages"}] + history[7:]
+
+
+def test_a_failed_summary_leaves_the_window_trimming_and_is_retried():
+    window = ContextWindow("model_1")
+    calls = []
+
+    async def summarizer(previous, messages, model_config):
+        calls.append(len(messages))
+        if len(calls) == 1:
+            raise RuntimeError("node down")
+        return "recap"
+
+    async def scenario():
+        history = turns(12)
+        sent = window.build(history, MODEL, SETTINGS)
+        await window.compact(history, MODEL, SETTINGS, summarizer)
+        after_failure = window.build(history, MODEL, SETTINGS)
+        await window.compact(history, MODEL, SETTINGS, summarizer)
+        return sent, after_failure
+
+    sent, after_failure = asyncio.run(scenario())
+    assert after_failure == sent and not any("Summary" in m["content"] for m in sent)
+    assert calls == [10, 10] and window.summary == "recap"
+
+
+def test_disabled_sends_everything_and_never_compacts():
+    window = ContextWindow("model_1")
+    history = turns(20)
+    settings = replace(SETTINGS, enabled=False)
+    assert window.build(history, MODEL, settings) == history
+    assert window.compact(history, MODEL, settings, None) is None
+
+
+def test_a_speculative_turn_is_compacted_only_once_it_commits(make_config):
+    config = make_config({"models": {"model_1": {"context_tokens": 200, "max_tokens": 0}}})
+    memory = SessionMemoryManager(config=config)
+    model_config = memory.snapshot.models["model_1"]
+    summaries = []
+
+    async def summarizer(previous, messages, model_config):
+        summaries.append(len(messages))
+        return "recap"
+
+    memory.set_summarizer(summarizer)
+
+    async def scenario():
+        for turn in range(2):
+            memory.begin_turn("model_1")
+            for message in turns(24)[1:]:
+                memory.append_to_session_memory("model_1", dict(message))
+            assert memory.end_turn("model_1", model_config) is None
+            await asyncio.sleep(0)
+            if turn == 0:
+                memory.rollback_turn("model_1")
+            else:
+                memory.commit_turn("model_1")
+        await memory.context_windows["model_1"].summary_task
+
+    asyncio.run(scenario())
+    assert summaries == [24 - memory.snapshot.context_window.keep_recent_messages]
+
+
+def test_recalled_messages_are_quoted_right_before_the_newest_message():
+    window = ContextWindow("model_1")
+    history = turns(3)
+    recalled = [(-5, {"role": "user", "content": "an older note 0"})]
+    # The reserve is sized to the quote exactly, it must hold the "- " of the line as well
+    sent = window.build(history, MODEL, ContextSettings(), recalled=recalled, recall_tokens=50)
+    assert window.build(history, MODEL, ContextSettings(), recalled=[(1, history[1])], recall_tokens=50) == history
+    assert sent[:-2] == history[:-1] and sent[-1] == history[-1]
+    assert sent[-2] == {"role": "system", "content": f"{ContextWindow.RECALL_PREFIX}\n- user: an older note 0"}
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+
+from aiohttp import web
+
+from core.system.http_transport import HttpTransport
+from speech.speech_to_text import SpeechToText
+from speech.text_to_speech import TextToSpeech
+
+
+class Backend:
+    """
+    STT/TTS service answering 503 to the next `fail_next` requests. /transcribe expects the
+    WAV as the multipart 'audio' field, like the speech_to_text_api providers send it.
+    """
+
+    def __init__(self, fail_next=0):
+        self.fail_next = fail_next
+        self.received = []
+        self.runner = None
+        self.url = None
+
+    def failing(self):
+        if self.fail_next:
+            self.fail_next -= 1
+            return web.json_response({}, status=503)
+        return None
+
+    async def transcribe(self, request):
+        form = await request.post()
+        self.received.append((form["audio"].filename, form["audio"].file.read(), request.headers.get("Content-Length")))
+        return self.failing() or web.json_response({"transcript": "hello"})
+
+    async def tts(self, request):
+        self.received.append(request.query["text"])
+        return self.failing() or web.Response(status=204)
+
+    async def start(self):
+        app = web.Application(client_max_size=8 * 2 ** 20)
+        app.router.add_post("/transcribe", self.transcribe)
+        app.router.add_post("/tts", self.tts)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def speech_to_text(make_config, **overrides):
+    config = make_config({
+        "speech_to_text": {"retry_delay": 0, **overrides},
+        "provider_health": {"backoff_max": 0},
+    })
+    return SpeechToText(config=config, logger=logging.getLogger("test_http_transport"))
+
+
+def test_the_wav_upload_is_streamed_as_multipart_and_resent_on_retry(make_config):
+    wav = bytes(range(256)) * 1000  # spans several body chunks
+    stt = speech_to_text(make_config, retry_attempts=3)
+
+    async def scenario():
+        backend = await Backend(fail_next=1).start()
+        try:
+            text = await stt.speech_to_text_api(f"{backend.url}/transcribe", wav)
+        finally:
+            await stt.http.close()
+            await backend.stop()
+        return text, backend.received
+
+    text, received = asyncio.run(scenario())
+    assert text == "hello"
+    assert len(received) == 2
+    assert all(entry[:2] == ("audio.wav", wav) for entry in received)
+    assert received[0][2] is not None  # sized up front, not chunked
+
+
+def test_zero_retry_attempts_retry_until_the_budget_runs_out(make_config):
+    config = make_config({
+        "text_to_speech": {"retry_attempts": 0, "retry_delay": 0},
+        "provider_health": {"backoff_max": 0, "retry_budget_min": 3},
+    })
+    tts = TextToSpeech(config=config, logger=logging.getLogger("test_http_transport"))
+
+    async def scenario():
+        backend = await Backend(fail_next=100).start()
+        try:
+            clip = await tts.text_to_speech_api(f"{backend.url}/tts", "Hi.")
+        finally:
+            await tts.http.close()
+            await backend.stop()
+        return clip, backend.received
+
+    clip, requests = asyncio.run(scenario())
+    assert clip is None
+    assert len(requests) == 4  # the first attempt plus the three budgeted retries
+
+
+def test_one_transport_serves_successive_event_loops(make_config):
+    config = make_config()
+    http = HttpTransport(config=config, logger=logging.getLogger("test_http_transport"))
+    stt = SpeechToText(config=config, logger=logging.getLogger("test_http_transport"), http=http)
+    assert stt.http is http
+
+    async def scenario():
+        backend = await Backend().start()
+        try:
+            response = await http.request("POST", f"{backend.url}/tts", params={"text": "Hi."})
+        finally:
+            await backend.stop()
+        return response.status_code
+
+    assert asyncio.run(scenario()) == 204
+    first_client = http.client
+    assert asyncio.run(scenario()) == 204
+    assert http.client is not first_client
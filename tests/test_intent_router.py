@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import time
+
+from core.orchestrators.orchestration import OrchestrationPipeline
+from core.system.provider_health import OPEN
+from core.system.utils.intent_router import DEFAULT_ROLE, IntentRouter
+from core.system.utils.system_tools import SystemTools
+from setup.config_snapshot import ConfigSnapshot
+
+ROLES = {
+    "status": {"key_words": ["what time", "what day", "weather", "status"]},
+    "story": {"key_words": ["tell me a story", "write a poem", "explain", "what"]},
+    "math": {"key_words": ["explain"]},
+}
+
+
+def routed_config(make_config):
+    model = {"api_key": "x", "model": "stand-in", "enabled": True}
+    return make_config({
+        "roles": ROLES,
+        "llm_clients": {"keepalive_ping_interval": 0},
+        "models": {
+            "model_1": {"roles": {"conversation": 1}},
+            "model_2": dict(model, designation="model_2", node="http://127.0.0.1:9/v1", roles={"story": 2, "status": 1}),
+            "model_3": dict(model, designation="model_3", node="http://127.0.0.1:8/v1", roles={"story": 2}),
+            "model_4": dict(model, designation="model_4", node="http://127.0.0.1:7/v1", roles={"status": 3}),
+        },
+    })
+
+
+def test_keyword_weight_decides_and_ties_go_to_the_role_listed_first(make_config):
+    router = IntentRouter(ConfigSnapshot.build(routed_config(make_config)).role_keywords)
+    assert router.classify("What time is it?") == "status"  # "what time" outweighs "what"
+    assert router.classify("Could you tell me a story?") == "story"
+    assert router.classify("Please explain") == "story"  # tie with math
+    assert router.classify("Somewhat whatever") == DEFAULT_ROLE  # whole words only
+    assert router.classify("") == DEFAULT_ROLE
+    assert IntentRouter({}).classify("what time is it") == DEFAULT_ROLE
+
+
+def test_router_is_built_once_per_snapshot(make_config):
+    config = routed_config(make_config)
+    snapshot = ConfigSnapshot.build(config)
+    assert IntentRouter.for_snapshot(snapshot) is IntentRouter.for_snapshot(snapshot)
+    assert IntentRouter.for_snapshot(ConfigSnapshot.build(config)) is not IntentRouter.for_snapshot(snapshot)
+
+
+def test_roles_map_to_their_best_scoring_models(make_config):
+    tools = SystemTools(config=routed_config(make_config), logger=logging.getLogger("test_intent_router"))
+    assert tools.classify_intent("what's the weather like") == "status"
+    assert tools.get_model_based_on_role("status") == ["model_4"]
+    assert tools.get_model_based_on_role("story") == ["model_2", "model_3"]
+    # Nobody scores the role: the default model, then the enabled models without a score for it
+    assert tools.get_model_based_on_role("unknown") == ["model_1", "model_2", "model_3", "model_4"]
+    assert tools.get_model_based_on_role("conversation") == ["model_1"]
+
+
+def test_select_model_skips_specialists_whose_nodes_are_down(make_config):
+    async def scenario():
+        pipeline = OrchestrationPipeline(config=routed_config(make_config))
+        try:
+            picks = [pipeline.select_model("tell me a story"), pipeline.select_model("hello there")]
+            for node in ("http://127.0.0.1:9/v1", "http://127.0.0.1:8/v1"):
+                breaker = pipeline.llm_pipeline.health._breaker(node)
+                breaker.state, breaker.opened_at = OPEN, time.monotonic()
+            picks.append(pipeline.select_model("tell me a story"))
+            return picks
+        finally:
+            await pipeline.llm_pipeline.close()
+            pipeline.session_memory.close()
+
+    assert asyncio.run(scenario()) == ["model_2", "model_1", "model_1"]
@@ -0,0 +1,35 @@
+import asyncio
+
+from core.models.llm_clients import LLMClientRegistry
+
+
+def test_pool_stats_count_requests_until_their_body_is_read(make_config, stand_in_llm):
+    async def scenario():
+        server = await stand_in_llm(reply="One two three.").start()
+        config = make_config({"models": {"model_1": {"node": server.url}}})
+        registry = LLMClientRegistry(config=config)
+        model_config = registry.snapshot.models["model_1"]
+        client = registry.get_client(model_config)
+        try:
+            stream = await client.chat.completions.create(
+                model="stand-in", messages=[{"role": "user", "content": "hi"}], stream=True
+            )
+            during = registry.get_pool_stats()[server.url]['open_requests']
+            async for _ in stream:
+                pass
+            await client.chat.completions.create(model="stand-in", messages=[{"role": "user", "content": "hi"}])
+            return during, registry.get_pool_stats()[server.url]
+        finally:
+            await registry.close()
+            await server.stop()
+
+    during, stats = asyncio.run(scenario())
+    assert during == 1
+    assert stats['open_requests'] == 0
+    assert stats['peak_open_requests'] == 1
+    assert stats['requests'] == 1  # get_client calls, one per turn
+
+
+def test_keepalive_ping_is_opt_in(make_config):
+    registry = LLMClientRegistry(config=make_config())
+    assert registry.snapshot.llm_clients.keepalive_ping_interval == 0
@@ -0,0 +1,87 @@
+import asyncio
+
+from core.models.llm_pipeline import ERROR_RESPONSE, FAILURE_RESPONSE, LLMPipeline
+from core.system.provider_health import OPEN
+
+
+class RecordingTTS:
+    def __init__(self):
+        self.spoken = []
+
+    async def handle_token(self, token):
+        self.spoken.append(token)
+
+    async def speak(self, text):
+        self.spoken.append(text)
+
+
+def single_node_config(make_config, node):
+    return make_config({
+        "models": {"model_1": {"node": node, "stream_output": True, "temperature": 0, "cache_responses": True}},
+        "llm_clients": {"keepalive_ping_interval": 0},
+        "response_cache": {"enabled": True},
+        "provider_health": {"backoff_max": 0.01},
+        "system_settings": {"assistant_retry_attempts": 3, "assistant_retry_delay": 0.01},
+    })
+
+
+def run_turn(make_config, server, prompt):
+    async def scenario():
+        await server.start()
+        pipeline = LLMPipeline(config=single_node_config(make_config, server.url))
+        model_config = pipeline.snapshot.models["model_1"]
+        history = [{"role": "user", "content": prompt}]
+        tts = RecordingTTS()
+        try:
+            response = await pipeline.stream_llm_response(prompt, history, model_config, tts)
+            cache_key = pipeline._cache_key(prompt, history, model_config)
+            return response, tts.spoken, pipeline.response_cache.get(model_config.key, cache_key)
+        finally:
+            await pipeline.close()
+            await server.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_failure_before_first_token_is_retried(make_config, stand_in_llm):
+    server = stand_in_llm(reply="Four score and seven")
+    server.fail_next = 1
+    response, spoken, cached = run_turn(make_config, server, "recite")
+    assert server.requests == 2
+    assert response == "".join(spoken) == "Four score and seven"
+    assert cached == response
+
+
+def test_failure_mid_stream_ends_the_turn_without_repeating(make_config, stand_in_llm):
+    server = stand_in_llm(reply="Four score and seven")
+    server.cut_after = 2
+    response, spoken, cached = run_turn(make_config, server, "recite")
+    assert server.requests == 1
+    assert response == "".join(spoken) == "Four score"
+    assert FAILURE_RESPONSE not in response
+    assert cached is None
+
+
+def test_a_probe_that_fails_outside_the_client_still_records_its_outcome(make_config, stand_in_llm):
+    server = stand_in_llm(reply="Four score and seven")
+    server.usage_first = True  # chunk.choices[0] raises IndexError, not an OpenAIError
+
+    async def scenario():
+        await server.start()
+        pipeline = LLMPipeline(config=single_node_config(make_config, server.url))
+        model_config = pipeline.snapshot.models["model_1"]
+        node = model_config.node
+        breaker = pipeline.health._breaker(node)
+        breaker.state, breaker.opened_at = OPEN, 0.0  # cooled down, the next call is the probe
+        history = [{"role": "user", "content": "recite"}]
+        try:
+            response = await pipeline.stream_llm_response("recite", history, model_config, RecordingTTS())
+            return response, breaker, pipeline.health.summary()[node]
+        finally:
+            await pipeline.close()
+            await server.stop()
+
+    response, breaker, summary = asyncio.run(scenario())
+    assert response == ERROR_RESPONSE
+    assert breaker.state == OPEN and not breaker.probing
+    assert summary["failures"] == 1
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+import pytest
+
+from core.memory.long_term_memory import LongTermMemory, VectorIndex, hash_embed, normalize
+
+DIM = 64
+
+
+def embed(*texts):
+    return normalize(np.stack([hash_embed(text, DIM) for text in texts]))
+
+
+def test_rows_texts_and_the_model_split_survive_a_reopen(tmp_path):
+    index = VectorIndex(str(tmp_path), DIM, initial_capacity=2)
+    texts = ["my sister lives in lisbon", "the cat is called biscuit", "we talked about mars rovers"]
+    index.add("model_1", [(seq, "user", text) for seq, text in enumerate(texts)], embed(*texts))
+    index.add("model_2", [(0, "assistant", "biscuit the cat again")], embed("biscuit the cat again"))
+    index.close()
+
+    reopened = VectorIndex(str(tmp_path), DIM)
+    try:
+        assert reopened.count == 4 and reopened.capacity >= 4
+        query = embed("where does my sister live")[0]
+        score, seq, role, content = reopened.search("model_1", query, 1)[0]
+        assert (seq, role, content) == (0, "user", texts[0]) and score > 0.3
+        assert [hit[3] for hit in reopened.search("model_2", embed("biscuit")[0], 5)] == ["biscuit the cat again"]
+        assert reopened.search("model_3", query, 5) == []
+    finally:
+        reopened.close()
+
+
+def test_before_seq_and_min_score_filter_hits(tmp_path):
+    index = VectorIndex(str(tmp_path), DIM)
+    texts = [f"note {seq} about the garden" for seq in range(10)]
+    index.add("model_1", [(seq, "user", text) for seq, text in enumerate(texts)], embed(*texts))
+    try:
+        query = embed("the garden")[0]
+        assert {hit[1] for hit in index.search("model_1", query, 10, before_seq=4)} == {0, 1, 2, 3}
+        assert index.search("model_1", query, 10, min_score=1.01) == []
+    finally:
+        index.close()
+
+
+def test_an_embedder_of_another_width_is_refused(tmp_path):
+    VectorIndex(str(tmp_path), DIM).close()
+    with pytest.raises(ValueError):
+        VectorIndex(str(tmp_path), DIM * 2)
+
+
+def test_an_interrupted_append_is_ignored_on_reopen(tmp_path):
+    index = VectorIndex(str(tmp_path), DIM)
+    index.add("model_1", [(0, "user", "kept")], embed("kept"))
+    # Vectors and rows written, the crash came before the SQLite commit
+    index.vectors[1] = embed("lost")[0]
+    index.rows['seq'][1] = 1
+    index.close()
+    reopened = VectorIndex(str(tmp_path), DIM)
+    try:
+        assert reopened.count == 1
+        assert [hit[3] for hit in reopened.search("model_1", embed("lost")[0], 5)] == ["kept"]
+    finally:
+        reopened.close()
+
+
+def test_search_matches_a_brute_force_scan_at_scale(tmp_path):
+    rng = np.random.default_rng(0)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    texts = [" ".join(vocabulary[w] for w in row) for row in rng.integers(0, len(vocabulary), size=(20000, 12))]
+    vectors = normalize(np.stack([hash_embed(text, DIM) for text in texts]))
+    index = VectorIndex(str(tmp_path), DIM)
+    for start in range(0, len(texts), 1000):
+        chunk = texts[start:start + 1000]
+        index.add("model_1", [(start + i, "user", text) for i, text in enumerate(chunk)], vectors[start:start + 1000])
+    index.close()
+
+    started = time.perf_counter()
+    index = VectorIndex(str(tmp_path), DIM)
+    reopen = time.perf_counter() - started
+    try:
+        probe = texts[-1]
+        query = embed(probe)[0]
+        hits = index.search("model_1", query, 5)
+        assert hits[0][3] == probe
+        expected = np.argsort(vectors @ query)[::-1][:5]
+        assert [hit[1] for hit in hits] == [int(i) for i in expected]
+        assert reopen < 0.5  # mapped, not read back
+    finally:
+        index.close()
+
+
+def long_term_memory(make_config, tmp_path, stable_seq=True):
+    config = make_config({"long_term_memory": {
+        "enabled": True, "path": str(tmp_path / "long_term"), "embedding_dim": DIM, "min_score": 0.2,
+    }})
+    return LongTermMemory(config=config, logger=logging.getLogger("test_long_term_memory"), stable_seq=stable_seq)
+
+
+def test_remembered_messages_are_recalled_before_the_window(make_config, tmp_path):
+    memory = long_term_memory(make_config, tmp_path)
+
+    async def scenario():
+        memory.remember("model_1", 0, {"role": "user", "content": "My sister lives in Lisbon."})
+        memory.remember("model_1", 1, {"role": "assistant", "content": "Lisbon is lovely in spring."})
+        memory.remember("model_1", 2, {"role": "system", "content": "never indexed"})
+        memory.remember("model_1", 3, {"role": "user", "content": "Where does my sister live?"})
+        await memory.worker
+        hits = await memory.recall("model_1", "where does my sister live", before_seq=3)
+        await memory.close()
+        return hits
+
+    hits = asyncio.run(scenario())
+    assert hits[0] == (0, {"role": "user", "content": "My sister lives in Lisbon."})
+    assert all(seq < 3 for seq, _ in hits)
+    assert memory.stats['indexed'] == 3
+
+
+def test_recall_stays_off_without_stable_sequence_numbers(make_config, tmp_path):
+    memory = long_term_memory(make_config, tmp_path, stable_seq=False)
+
+    async def scenario():
+        memory.remember("model_1", 0, {"role": "user", "content": "My sister lives in Lisbon."})
+        hits = await memory.recall("model_1", "where does my sister live")
+        await memory.close()
+        return hits
+
+    assert not memory.enabled
+    assert asyncio.run(scenario()) == []
+    assert memory.worker is None and not (tmp_path / "long_term").exists()
@@ -0,0 +1,61 @@
+import asyncio
+
+from core.models.llm_pipeline import FAILURE_RESPONSE, LLMPipeline
+from core.system.provider_health import CLOSED, OPEN
+
+
+def pool_config(make_config, nodes):
+    return make_config({
+        "models": {"model_1": {"node": nodes[0], "nodes": nodes, "stream_output": True}},
+        "llm_clients": {"keepalive_ping_interval": 0},
+        # A cold burst sends a third of its requests to the broken node before it is drained
+        "provider_health": {"open_seconds": 0.2, "backoff_max": 0.05, "retry_budget_min": 15},
+        "system_settings": {"assistant_retry_attempts": 3, "assistant_retry_delay": 0.01},
+    })
+
+
+async def answer(pipeline, model_config):
+    return "".join([token async for token in pipeline.call_llm_api(model_config, [{"role": "user", "content": "hi"}])])
+
+
+async def wave(pipeline, model_config, count=30):
+    return await asyncio.gather(*(answer(pipeline, model_config) for _ in range(count)))
+
+
+def test_pool_drains_failing_node_and_prefers_fast_one(make_config, stand_in_llm):
+    async def scenario():
+        fast, slow, broken = stand_in_llm(delay=0.01), stand_in_llm(delay=0.08), stand_in_llm(delay=0.01)
+        broken.fail = True
+        for server in (fast, slow, broken):
+            await server.start()
+        pipeline = LLMPipeline(config=pool_config(make_config, [fast.url, slow.url, broken.url]))
+        pipeline.balancer.probe_interval = 0.05
+        model_config = pipeline.snapshot.models["model_1"]
+        try:
+            # The broken node costs retries, never an answer
+            replies = await wave(pipeline, model_config)
+            assert all(reply == fast.reply for reply in replies)
+            assert FAILURE_RESPONSE not in replies
+            assert pipeline.health.breakers[broken.url].state == OPEN
+
+            # With latencies known, the fast node takes most of the load
+            before = fast.requests, slow.requests
+            await wave(pipeline, model_config)
+            assert fast.requests - before[0] > slow.requests - before[1]
+
+            # Once repaired, the background probe puts the node back in rotation
+            broken.fail = False
+            for _ in range(100):
+                if pipeline.health.breakers[broken.url].state == CLOSED:
+                    break
+                await asyncio.sleep(0.05)
+            assert pipeline.health.breakers[broken.url].state == CLOSED
+            before = broken.requests
+            await wave(pipeline, model_config)
+            assert broken.requests > before
+        finally:
+            await pipeline.close()
+            for server in (fast, slow, broken):
+                await server.stop()
+
+    asyncio.run(scenario())
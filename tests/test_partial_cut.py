@@ -0,0 +1,43 @@
+from core.orchestrators.orchestration import OrchestrationPipeline
+from listen.events import EventType
+
+
+def make_pipeline(make_config):
+    config = make_config({
+        "models": {"system": {"enabled": True}},
+        "system_settings": {"mic_capture_mode": "per_turn"},
+    })
+    pipeline = OrchestrationPipeline(config=config)
+    cuts = []
+    pipeline.mic_input.cut_utterance = lambda utterance_id, text: cuts.append((utterance_id, text))
+    return pipeline, cuts
+
+
+def feed(pipeline, partials):
+    for text in partials:
+        pipeline.check_partial_transcript(1, text)
+
+
+def test_waits_for_a_longer_phrase_before_cutting(make_config):
+    pipeline, cuts = make_pipeline(make_config)
+    try:
+        feed(pipeline, ["astrape"])
+        assert cuts == []
+
+        feed(pipeline, ["astrape emergency"])
+        assert cuts == [(1, "astrape emergency")]
+        assert pipeline.event_manager.determine_event_action(cuts[0][1])['event_type'] is EventType.EMERGENCY
+    finally:
+        pipeline.session_memory.close()
+
+
+def test_the_longer_phrase_decides_the_event(make_config):
+    pipeline, cuts = make_pipeline(make_config)
+    try:
+        feed(pipeline, ["okay", "okay astrape", "okay astrape sleep"])
+        assert cuts == [(1, "okay astrape sleep")]
+        events = pipeline.event_manager
+        assert events.determine_event_action("okay astrape sleep")['event_type'] is EventType.SLEEP
+        assert events.determine_event_action("astrape help shut down")['event_type'] is EventType.EMERGENCY
+    finally:
+        pipeline.session_memory.close()
@@ -0,0 +1,65 @@
+import logging
+import random
+import timeit
+
+from listen.events import EventManager, EventType
+from listen.phrase_matcher import PhraseMatcher, normalize_text
+
+PHRASES = {
+    "wake": ["astrape", "astrape wake", "eliza wake"],
+    "sleep": ["astrape sleep", "go to sleep"],
+    "emergency": ["help me", "astrape help"],
+}
+
+
+def test_reports_every_phrase_including_overlaps():
+    matcher = PhraseMatcher(PHRASES)
+    assert matcher.match("Astrape, sleep!") == {"wake": ["astrape"], "sleep": ["astrape sleep"]}
+    assert matcher.match("please astrape help me") == {"wake": ["astrape"], "emergency": ["astrape help", "help me"]}
+    assert matcher.match("nothing to see here") == {}
+    hits = list(matcher.iter_matches("astrape ... astrape"))
+    assert hits == [("wake", "astrape"), ("wake", "astrape")]
+
+
+def test_whole_words_only_match_on_word_boundaries():
+    matcher = PhraseMatcher({"time": ["time", "what time"]}, whole_words=True)
+    assert matcher.match("sometimes I wonder") == {}
+    assert matcher.match("What time is it?") == {"time": ["what time", "time"]}
+    assert PhraseMatcher({"time": ["time"]}).match("sometimes") == {"time": ["time"]}
+
+
+def test_agrees_with_the_per_type_substring_scan(make_config):
+    # The legacy check_for_*_word calls, one scan per event type, are the reference
+    config = make_config({"models": {"system": {"enabled": True}}})
+    manager = EventManager(config=config, logger=logging.getLogger("test_phrase_matcher"))
+    legacy = {
+        EventType.EMERGENCY: manager.check_for_emergency_word,
+        EventType.WAKE: manager.check_for_wake_word,
+        EventType.SLEEP: manager.check_for_sleep_word,
+        EventType.SHUTDOWN: manager.check_for_shutdown_word,
+    }
+    words = "astrape help sleep stop shut down go wake emergency the story sea before i".split()
+    rng = random.Random(0)
+    samples = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 8))) for _ in range(300)]
+    samples.append("Hey Astrape, could you tell me a story about the sea before I go to sleep?")
+    for sample in samples:
+        expected = {event: sorted(found) for event, check in legacy.items() if (found := check(sample))}
+        assert {event: sorted(found) for event, found in manager.matcher.match(sample).items()} == expected, sample
+
+
+def test_one_pass_is_cheaper_than_the_per_type_scan(make_config):
+    manager = EventManager(config=make_config(), logger=logging.getLogger("test_phrase_matcher"))
+    checks = [
+        manager.check_for_emergency_word,
+        manager.check_for_wake_word,
+        manager.check_for_sleep_word,
+        manager.check_for_shutdown_word,
+    ]
+    sample = "Hey Eliza, could you tell me a story about the sea before I go to sleep?"
+    legacy = min(timeit.repeat(lambda: [check(sample) for check in checks], number=200, repeat=3))
+    compiled = min(timeit.repeat(lambda: manager.matcher.match(sample), number=200, repeat=3))
+    assert compiled < legacy
+
+
+def test_normalize_text_folds_case_punctuation_and_spaces():
+    assert normalize_text("  Shut,   DOWN!\n") == "shut down"
@@ -0,0 +1,31 @@
+import asyncio
+
+import numpy as np
+
+from speech.audio_clip import AudioClip
+from speech.playback_engine import PlaybackEngine, PlaybackHandle
+
+
+def test_callback_finishes_handles_without_touching_a_closed_stream():
+    async def scenario():
+        engine = PlaybackEngine(sample_rate=16000)
+        engine.loop = asyncio.get_running_loop()
+        engine.latency = 0.01
+        handle = PlaybackHandle(engine.loop, 16000)
+        handle.write(AudioClip(np.full(300, 1000, dtype=np.int16).tobytes(), 16000))
+        handle.close()
+        engine.pending.append(handle)
+
+        # The device asks for two blocks while close() has already dropped the stream
+        engine.stream = None
+        first, second = np.ones((256, 1), dtype=np.int16), np.ones((256, 1), dtype=np.int16)
+        engine._callback(first, 256, None, None)
+        engine._callback(second, 256, None, None)
+        duration = await asyncio.wait_for(handle, 1)
+        return first, second, duration, engine
+
+    first, second, duration, engine = asyncio.run(scenario())
+    assert (first[:, 0] == 1000).all()
+    assert (second[:44, 0] == 1000).all() and (second[44:, 0] == 0).all()
+    assert duration == 300 / 16000
+    assert not engine.pending and engine.underruns == 0
@@ -0,0 +1,82 @@
+import logging
+
+from omegaconf import OmegaConf
+
+from core.memory.context_window import ContextWindow
+from core.models.prompt_builder import PromptBuilder, TTFTTracker, common_prefix_length
+from setup.config_snapshot import ContextSettings
+
+
+def builder(make_config, overrides=None):
+    return PromptBuilder(config=make_config(overrides), logger=logging.getLogger("test_prompt_builder"))
+
+
+def test_the_prefix_is_rendered_once_and_leads_with_the_shared_prompt(make_config):
+    prompts = builder(make_config, {"system_settings": {"general_system_prompt": "You are part of Astrape."}})
+    model_config = prompts.snapshot.models["model_1"]
+    prefix = prompts.prefix(model_config)
+    assert prompts.prefix(model_config) is prefix
+    (message,) = prefix
+    assert message["role"] == "system"
+    assert message["content"].startswith("You are part of Astrape.\n\nYou are Eliza")
+
+
+def test_a_config_change_renders_the_prefix_again(make_config):
+    prompts = builder(make_config)
+    model_config = prompts.snapshot.models["model_1"]
+    before = prompts.prefix(model_config)
+    prompts.apply_config(OmegaConf.merge(prompts.config, {"system_settings": {"general_system_prompt": "Be brief."}}))
+    after = prompts.prefix(model_config)
+    assert after is not before and after[0]["content"].startswith("Be brief.")
+
+
+def test_consecutive_requests_share_all_but_their_tail(make_config):
+    # Prefix, history, recalled quotes right before the newest message: the next request
+    # only differs from where the previous one quoted its recalled messages
+    prompts = builder(make_config)
+    model_config = prompts.snapshot.models["model_1"]
+    window = ContextWindow("model_1")
+    settings = ContextSettings()
+    tracker = TTFTTracker()
+    history = []
+    reuse = []
+    for turn in range(6):
+        history.append({"role": "user", "content": f"question {turn} " + "about the garden " * 10})
+        recalled = [(-1, {"role": "user", "content": f"an older note {turn}"})]
+        messages = window.build(history, model_config, settings, recalled=recalled, recall_tokens=50,
+                                prefix=prompts.prefix(model_config))
+        assert messages[0] is prompts.prefix(model_config)[0]
+        assert messages[-2]["content"].startswith(ContextWindow.RECALL_PREFIX) and messages[-1] is history[-1]
+        reuse.append(tracker.observe("model_1", messages))
+        history.append({"role": "assistant", "content": f"answer {turn} " + "the roses are fine " * 10})
+    assert reuse[0] == 0.0
+    assert all(earlier < later < 1.0 for earlier, later in zip(reuse, reuse[1:]))
+    assert reuse[-1] > 0.7
+
+
+def test_reuse_counts_characters_up_to_the_first_difference():
+    tracker = TTFTTracker()
+    system = {"role": "system", "content": "x" * 90}
+    assert tracker.observe("m", [system, {"role": "user", "content": "abcdef"}]) == 0.0
+    # Same system prompt, the user message diverges after "abc"
+    share = tracker.observe("m", [system, {"role": "user", "content": "abcxyz"}])
+    rendered = len("<system>" + "x" * 90 + "\n") + len("<user>abc")
+    assert share == rendered / (rendered + len("xyz\n"))
+    # A changed role breaks the prefix right there
+    assert tracker.observe("m", [{"role": "user", "content": "x" * 90}]) < 0.05
+    assert tracker.observe("other", [system]) == 0.0
+
+
+def test_warm_and_cold_requests_are_reported_apart():
+    tracker = TTFTTracker(warm_share=0.5)
+    for seconds, reuse in ((1.0, 0.0), (0.2, 0.9), (0.3, 0.8), (1.2, 0.1)):
+        tracker.record("model_1", seconds, reuse)
+    summary = tracker.summary()["model_1"]
+    assert (summary["warm_calls"], summary["cold_calls"]) == (2, 2)
+    assert summary["warm_p50_ms"] in (200, 300) and summary["cold_p50_ms"] in (1000, 1200)
+
+
+def test_common_prefix_length():
+    assert common_prefix_length("garden", "gardener") == 6
+    assert common_prefix_length("abc", "abd") == 2
+    assert common_prefix_length("", "abc") == common_prefix_length("x", "y") == 0
@@ -0,0 +1,39 @@
+from dataclasses import replace
+
+from core.system.provider_health import OPEN, ProviderHealth
+from setup.config_snapshot import HealthSettings
+
+
+def failing_provider(settings):
+    health = ProviderHealth("test", settings)
+    for _ in range(settings.consecutive_failures):
+        health.begin()
+        health.record("node", 1.0, ok=False)
+    while health.retry_delay(1, 0) is not None:
+        pass
+    return health
+
+
+def test_reload_keeps_open_circuits_and_spent_budget():
+    settings = HealthSettings(open_seconds=60)
+    health = failing_provider(settings)
+    assert health.breakers["node"].state == OPEN
+    assert not health.available("node")
+
+    health.apply_settings(replace(settings, retry_budget_ratio=0.5, retry_budget_min=10, window=40))
+    assert health.breakers["node"].state == OPEN
+    assert not health.available("node")
+    assert health.retry_delay(1, 0) is None
+    assert health.budget.ratio == 0.5 and health.budget.capacity == 10
+    assert health.breakers["node"].outcomes.maxlen == 40
+
+
+def test_failed_calls_stay_out_of_the_latency_percentiles():
+    health = ProviderHealth("test", HealthSettings(consecutive_failures=100, min_calls=100))
+    for _ in range(5):
+        health.record("node", 0.2, ok=True)
+        health.record("node", 20.0, ok=False)  # timeouts
+    assert health.percentile("node", 90) == 0.2
+    summary = health.summary()["node"]
+    assert summary["calls"] == 10 and summary["failures"] == 5
+    assert summary["p90_ms"] == 200 and summary["failed_p50_ms"] == 20000
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from dataclasses import replace
+
+from core.models.llm_pipeline import FAILURE_RESPONSE, LLMPipeline
+from core.models.response_cache import ResponseCache
+from speech.speech_stream import SentenceSegmenter
+
+REPLY = "The first sentence is here. A second one follows! And then, a third?"
+
+
+class SegmentingTTS:
+    def __init__(self):
+        self.segmenter = SentenceSegmenter()
+        self.tokens = []
+        self.chunks = []
+
+    async def handle_token(self, token):
+        self.tokens.append(token)
+        self.chunks += self.segmenter.feed(token)
+
+    async def speak(self, text):
+        self.chunks += self.segmenter.flush() + [text]
+
+
+def cache_config(make_config, url="http://127.0.0.1:9", **cache):
+    return make_config({
+        "models": {"model_1": {"node": url, "stream_output": True, "temperature": 0, "cache_responses": True}},
+        "llm_clients": {"keepalive_ping_interval": 0},
+        "response_cache": dict({"enabled": True}, **cache),
+        "provider_health": {"backoff_max": 0.01},
+        "system_settings": {"assistant_retry_attempts": 1},
+    })
+
+
+def ask(make_config, server, prompts, cache=None, speculative=None):
+    """Streams each prompt as a fresh one-message history, returns the handlers."""
+    async def scenario():
+        await server.start()
+        pipeline = LLMPipeline(config=cache_config(make_config, server.url, **(cache or {})))
+        model_config = pipeline.snapshot.models["model_1"]
+        handlers = []
+        try:
+            for prompt in prompts:
+                if speculative:
+                    pipeline.begin_turn(model_config.key)
+                tts = SegmentingTTS()
+                await pipeline.stream_llm_response(prompt, [{"role": "user", "content": prompt}], model_config, tts)
+                tts.chunks += tts.segmenter.flush()
+                handlers.append(tts)
+                if speculative == "commit":
+                    pipeline.commit_turn(model_config.key)
+                elif speculative == "rollback":
+                    pipeline.rollback_turn(model_config.key)
+            return handlers
+        finally:
+            await pipeline.close()
+            await server.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_key_covers_model_sampling_parameters_and_recent_history(make_config):
+    snapshot = LLMPipeline(config=cache_config(make_config)).snapshot
+    cache = ResponseCache(snapshot.response_cache, logger=logging.getLogger("test_response_cache"))
+    model = snapshot.models["model_1"]
+    history = [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "Hello!"},
+        {"role": "user", "content": "What is Pi?"},
+    ]
+    key = cache.make_key(model, "What is Pi?", history)
+
+    assert key == cache.make_key(model, "what is  pi", history)
+    assert key != cache.make_key(replace(model, model="other"), "What is Pi?", history)
+    assert key != cache.make_key(replace(model, temperature=0.5), "What is Pi?", history)
+    assert key != cache.make_key(replace(model, max_tokens=16), "What is Pi?", history)
+    changed = history[:2] + [{"role": "assistant", "content": "Hey!"}] + history[3:]
+    assert key != cache.make_key(model, "What is Pi?", changed)
+    # Messages beyond `history_messages` (2) before the prompt do not count
+    older = history[:1] + [{"role": "user", "content": "yo"}, {"role": "assistant", "content": "Hi."}] + history[1:]
+    assert key == cache.make_key(model, "What is Pi?", older)
+
+
+def test_entries_expire_after_their_ttl(make_config):
+    snapshot = LLMPipeline(config=cache_config(make_config, volatile_ttl_seconds=30)).snapshot
+    cache = ResponseCache(snapshot.response_cache, logger=logging.getLogger("test_response_cache"))
+    cache.put("model_1", "fresh", "kept")
+    cache.put("model_1", "stale", "gone", ttl=-1)
+
+    assert cache.get("model_1", "fresh") == "kept"
+    assert cache.get("model_1", "stale") is None
+    assert cache.summary()["model_1"]["expired"] == 1
+    assert cache.ttl_for("What is Pi?") == snapshot.response_cache.ttl_seconds
+    assert cache.ttl_for("What time is it?") == 30
+    assert cache.ttl_for("Tell me something, sometimes") == snapshot.response_cache.ttl_seconds
+
+
+def test_repeats_are_served_from_the_cache_but_volatile_prompts_are_not(make_config, stand_in_llm):
+    server = stand_in_llm(reply=REPLY)
+    ask(make_config, server, ["What is Pi?", "what is pi", "What time is it?", "What time is it?"])
+    assert server.requests == 3
+
+
+def test_a_cached_hit_is_streamed_and_chunked_like_a_live_answer(make_config, stand_in_llm):
+    server = stand_in_llm(reply=REPLY)
+    live, cached = ask(make_config, server, ["What is Pi?", "What is Pi?"])
+    assert server.requests == 1
+    assert cached.tokens == live.tokens and len(cached.tokens) > 1
+    assert cached.chunks == live.chunks
+    assert len(cached.chunks) == 3
+
+
+def test_uncacheable_requests_always_reach_the_model(make_config, stand_in_llm):
+    server = stand_in_llm(reply=REPLY)
+    ask(make_config, server, ["What is Pi?"] * 2, cache={"enabled": False})
+    assert server.requests == 2
+
+    server = stand_in_llm(reply=REPLY)
+    ask(make_config, server, ["What is Pi?"] * 2, speculative="rollback")
+    assert server.requests == 2
+
+    server = stand_in_llm(reply=REPLY)
+    ask(make_config, server, ["What is Pi?"] * 2, speculative="commit")
+    assert server.requests == 1
+
+    server = stand_in_llm(reply=REPLY)
+    server.fail = True
+    failed = ask(make_config, server, ["What is Pi?"] * 2)
+    assert server.requests == 2 and failed[1].chunks == [FAILURE_RESPONSE]
+
+
+def test_sampled_answers_are_not_cached_unless_their_role_is_listed(make_config):
+    snapshot = LLMPipeline(config=cache_config(make_config, roles=["story"])).snapshot
+    cache = ResponseCache(snapshot.response_cache, logger=logging.getLogger("test_response_cache"))
+    sampled = replace(snapshot.models["model_1"], temperature=0.7)
+    assert cache.cacheable(snapshot.models["model_1"], "What is Pi?")
+    assert not cache.cacheable(sampled, "What is Pi?")
+    assert cache.cacheable(sampled, "Tell me a story", role="story")
+    assert not cache.cacheable(replace(sampled, cache_responses=False), "Tell me a story", role="story")
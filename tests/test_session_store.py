@@ -0,0 +1,77 @@
+import asyncio
+
+from core.memory.session_memory import SessionMemoryManager
+from core.memory.session_store import SessionStore
+
+
+def fill(path, count, summary_seq=None):
+    store = SessionStore(str(path), flush_interval=0.01)
+    for seq in range(count):
+        store.append("model_1", seq, {"role": "user" if seq % 2 == 0 else "assistant", "content": f"message {seq}"})
+    if summary_seq is not None:
+        store.save_summary("model_1", "earlier talk", summary_seq)
+    store.close()
+
+
+def test_restore_loads_the_newest_messages_after_the_summary(tmp_path):
+    path = tmp_path / "session.db"
+    fill(path, 300, summary_seq=40)
+    store = SessionStore(str(path))
+    try:
+        messages, first_seq, next_seq, summary, summary_seq = store.load_session("model_1", 100)
+        assert (summary, summary_seq) == ("earlier talk", 40)
+        assert (first_seq, next_seq, len(messages)) == (200, 300, 100)
+        assert messages[0]["content"] == "message 200" and messages[-1]["content"] == "message 299"
+        assert store.load_before("model_1", first_seq, 5)[-1]["content"] == "message 199"
+        gap = store.load_after("model_1", summary_seq, first_seq, 3)
+        assert [seq for seq, _ in gap] == [40, 41, 42] and gap[0][1]["content"] == "message 40"
+    finally:
+        store.close()
+
+
+def test_restore_without_a_gap_loads_everything_after_the_summary(tmp_path):
+    path = tmp_path / "session.db"
+    fill(path, 250, summary_seq=200)
+    store = SessionStore(str(path))
+    try:
+        messages, first_seq, next_seq, summary, summary_seq = store.load_session("model_1", 100)
+        assert (first_seq, next_seq, len(messages), summary_seq) == (200, 250, 50, 200)
+    finally:
+        store.close()
+
+
+def test_the_restore_gap_is_summarized_after_the_first_turn(make_config, tmp_path):
+    path = tmp_path / "session.db"
+    fill(path, 250, summary_seq=10)
+    config = make_config({
+        "session_store": {"enabled": True, "path": str(path), "restore_messages": 40, "flush_interval": 0.01},
+        "models": {"model_1": {"context_tokens": 1200, "max_tokens": 0}},
+    })
+    pages = []
+
+    async def summarizer(previous, messages, model_config):
+        pages.append((previous, messages[0]["content"], len(messages)))
+        return f"up to {messages[-1]['content']}"
+
+    async def scenario():
+        memory = SessionMemoryManager(config=config)
+        memory.set_summarizer(summarizer)
+        model_config = memory.snapshot.models["model_1"]
+        assert len(memory.session_memory["model_1"]) == 40 and memory.first_seq["model_1"] == 210
+        await memory.end_turn("model_1", model_config)
+        return memory
+
+    memory = asyncio.run(scenario())
+    window = memory.context_windows["model_1"]
+    assert window.summary == "up to message 209" and window.summary_upto == 0
+    assert pages[0][:2] == ("earlier talk", "message 10")
+    assert len(pages) > 1 and sum(count for _, _, count in pages) == 200  # seq 10 to 209, a page per request
+    assert "model_1" not in memory.gap_start
+    memory.close()
+
+    store = SessionStore(str(path))
+    try:
+        _, first_seq, _, summary, summary_seq = store.load_session("model_1", 40)
+        assert (summary, summary_seq, first_seq) == ("up to message 209", 210, 210)
+    finally:
+        store.close()
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from core.orchestrators.orchestration import OrchestrationPipeline
+from listen.events import EventType
+
+
+def make_pipeline(make_config, node):
+    config = make_config({
+        "models": {"model_1": {"node": node, "stream_output": False, "temperature": 0, "cache_responses": True,
+                             "emergency_phrases": ["eliza emergency"]}},
+        "llm_clients": {"keepalive_ping_interval": 0},
+        "response_cache": {"enabled": True},
+        "system_settings": {"mic_capture_mode": "per_turn", "speculative_llm": True},
+    })
+    return OrchestrationPipeline(config=config)
+
+
+def run_speculative(make_config, stand_in_llm, text, answer_first=False, delay=0.0):
+    async def scenario():
+        server = await stand_in_llm(reply="About 384,000 kilometres.", delay=delay).start()
+        pipeline = make_pipeline(make_config, server.url)
+        determine = pipeline.event_manager.determine_event_action
+
+        def slow_event_check(text):
+            # The LLM answer lands (and would be cached) before the event is known
+            deadline = time.monotonic() + 10
+            while answer_first and not pipeline.llm_pipeline.pending_cache.get("model_1"):
+                assert time.monotonic() < deadline, "the speculative answer never arrived"
+                time.sleep(0.01)
+            return determine(text)
+
+        pipeline.event_manager.determine_event_action = slow_event_check
+        try:
+            started = time.monotonic()
+            event_check, result = await pipeline.run_speculative_pipeline(text)
+            pipeline.elapsed = time.monotonic() - started
+            return pipeline, server, event_check, result
+        finally:
+            await pipeline.llm_pipeline.close()
+            pipeline.session_memory.close()
+            await server.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_event_rolls_back_a_finished_speculative_turn(make_config, stand_in_llm):
+    pipeline, server, event_check, result = run_speculative(
+        make_config, stand_in_llm, "okay please shut down", answer_first=True
+    )
+    assert event_check["event_type"] == EventType.SHUTDOWN
+    assert result is None
+    assert server.requests == 1  # the answer was generated...
+    assert pipeline.session_memory.get_session_memory("model_1") == []  # ...and taken back
+    assert pipeline.session_memory.next_seq["model_1"] == 0
+    assert not pipeline.llm_pipeline.response_cache.entries
+    assert not pipeline.llm_pipeline.pending_cache
+
+
+def test_emergency_does_not_wait_for_the_speculative_answer(make_config, stand_in_llm):
+    pipeline, server, event_check, result = run_speculative(
+        make_config, stand_in_llm, "eliza emergency", delay=2.0
+    )
+    assert event_check["event_type"] == EventType.EMERGENCY
+    assert result is None  # the main loop handles the emergency, then runs the turn itself
+    assert pipeline.elapsed < 1.0
+    assert pipeline.session_memory.get_session_memory("model_1") == []
+    assert not pipeline.llm_pipeline.pending_cache
+
+
+def test_kept_speculative_turn_is_stored_and_cached(make_config, stand_in_llm):
+    pipeline, server, event_check, result = run_speculative(make_config, stand_in_llm, "how far away is the moon")
+    assert event_check["event_type"] == EventType.CONTINUE
+    parsed_response, model_designation, _ = result
+    assert model_designation == "model_1"
+    roles = [message["role"] for message in pipeline.session_memory.get_session_memory("model_1")]
+    assert roles[-2:] == ["user", "assistant"]
+    assert len(pipeline.llm_pipeline.response_cache.entries) == 1
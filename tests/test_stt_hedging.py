@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from speech.speech_to_text import STT_PROVIDERS, SpeechToText
+
+
+class Backend:
+    """STT provider answering `text` after `delay` seconds; `blocking` runs it in a worker thread."""
+
+    def __init__(self, text, delay=0.0, blocking=False):
+        self.text = text
+        self.delay = delay
+        self.blocking = blocking
+        self.calls = 0
+        self.cancelled = 0
+
+    def handler(self):
+        if self.blocking:
+            def transcribe(stt, wav_data):
+                self.calls += 1
+                time.sleep(self.delay)
+                return self.text
+            return transcribe
+
+        async def transcribe(stt, wav_data):
+            self.calls += 1
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            return self.text
+        return transcribe
+
+
+@pytest.fixture
+def hedged_stt(make_config, monkeypatch):
+    def make(primary, secondary, hedge_delay=0.05):
+        monkeypatch.setitem(STT_PROVIDERS.providers, "primary", None)
+        monkeypatch.setitem(STT_PROVIDERS.providers, "secondary", None)
+        STT_PROVIDERS.register("primary", primary.handler())
+        STT_PROVIDERS.register("secondary", secondary.handler())
+        config = make_config({"speech_to_text": {
+            "mode": 3, "primary_service": "primary", "secondary_service": "secondary", "hedge_delay": hedge_delay,
+        }})
+        return SpeechToText(config=config, logger=logging.getLogger("test_stt_hedging"))
+
+    return make
+
+
+def test_a_fast_primary_never_wakes_the_secondary(hedged_stt):
+    primary, secondary = Backend("hello"), Backend("hi")
+    stt = hedged_stt(primary, secondary)
+    assert asyncio.run(stt.get_speech_to_text(b"wav")) == "hello"
+    assert secondary.calls == 0
+    assert stt.health.summary()["primary"]["wins"] == 1
+
+
+def test_a_slow_primary_is_hedged_and_abandoned(hedged_stt):
+    primary, secondary = Backend("slow", delay=1.0), Backend("fast")
+    stt = hedged_stt(primary, secondary)
+
+    async def scenario():
+        started = time.perf_counter()
+        text = await stt.get_speech_to_text(b"wav")
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0)
+        return text, elapsed
+
+    text, elapsed = asyncio.run(scenario())
+    assert text == "fast" and elapsed < 0.5
+    assert primary.cancelled == 1
+    summary = stt.health.summary()
+    assert summary["primary"]["abandoned"] == 1 and summary["secondary"]["wins"] == 1
+
+
+def test_an_empty_primary_hedges_without_waiting_for_the_delay(hedged_stt):
+    primary, secondary = Backend(""), Backend("there")
+    stt = hedged_stt(primary, secondary, hedge_delay=5)
+
+    async def scenario():
+        started = time.perf_counter()
+        return await stt.get_speech_to_text(b"wav"), time.perf_counter() - started
+
+    text, elapsed = asyncio.run(scenario())
+    assert text == "there" and elapsed < 1
+
+
+def test_the_hedge_delay_follows_the_primary_p90(hedged_stt):
+    stt = hedged_stt(Backend("a"), Backend("b"), hedge_delay=1.5)
+    assert stt.hedge_delay("primary") == 1.5  # too few samples
+    for seconds in (0.1, 0.2, 0.3, 0.4, 0.5):
+        stt.health.record("primary", seconds)
+    assert stt.hedge_delay("primary") == 0.5
+
+
+def test_a_blocking_loser_does_not_hold_up_the_winner(hedged_stt):
+    primary, secondary = Backend("slow", delay=0.6, blocking=True), Backend("fast")
+    stt = hedged_stt(primary, secondary)
+
+    async def scenario():
+        started = time.perf_counter()
+        return await stt.get_speech_to_text(b"wav"), time.perf_counter() - started
+
+    text, elapsed = asyncio.run(scenario())
+    assert text == "fast" and elapsed < 0.5
+
+
+def test_the_sync_entry_point_runs_outside_a_loop(hedged_stt):
+    stt = hedged_stt(Backend("hello"), Backend("hi"))
+    assert stt.get_speech_to_text_sync(b"wav") == "hello"
@@ -0,0 +1,94 @@
+import asyncio
+
+from core.system.provider_health import OPEN
+from listen.events import EventManager
+from speech.speech_to_text import SpeechToText
+from speech.stt_stream import StreamingSpeechToText
+
+BLOCK = bytes(960)  # 30 ms of 16 kHz int16 silence, one capture block
+
+
+async def wait_for(condition, timeout=5):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.005)
+
+
+def test_partials_stream_in_and_the_event_phrase_ends_the_utterance(make_config, stand_in_stt):
+    async def scenario():
+        server = await stand_in_stt().start()
+        config = make_config({"speech_to_text": {"stream_service": server.url}})
+        streaming = StreamingSpeechToText(SpeechToText(config=config), config=config)
+        events = EventManager(config=config)
+        partials, cuts = [], []
+
+        def check(utterance_id, text):
+            partials.append(text)
+            if not cuts and events.is_settled_event(text):
+                cuts.append(text)
+
+        streaming.partial_listeners.append(check)
+        try:
+            assert streaming.enabled
+            streaming.handle_audio("start", 1, None)
+            # One word's worth of audio at a time, stopping once the phrase is heard
+            for words in range(1, len(server.script) + 1):
+                for _ in range(10):
+                    streaming.handle_audio("audio", 1, BLOCK)
+                await wait_for(lambda: len(partials) >= words)
+                if cuts:
+                    break
+            streaming.handle_audio("end", 1, None)
+            final = await streaming.final_transcript(1)
+        finally:
+            await streaming.close()
+            await server.stop()
+        return partials, cuts, final, streaming.stats
+
+    partials, cuts, final, stats = asyncio.run(scenario())
+    assert partials == ["okay", "okay please", "okay please shut", "okay please shut down"]
+    assert cuts == ["okay please shut down"]
+    assert final == "okay please shut down"
+    assert stats['finals'] == 1 and stats['fallbacks'] == 0
+
+
+def test_disabled_without_a_stream_service(make_config):
+    config = make_config({"speech_to_text": {"stream_service": ""}})
+    streaming = StreamingSpeechToText(SpeechToText(config=config), config=config)
+    assert not streaming.enabled
+
+
+def half_open(streaming):
+    breaker = streaming.health._breaker(streaming.service)
+    breaker.state, breaker.opened_at = OPEN, 0.0  # cooled down, the next session is the probe
+    return breaker
+
+
+def test_a_probe_session_discarded_before_it_runs_frees_the_probe(make_config):
+    async def scenario():
+        config = make_config({"speech_to_text": {"stream_service": "http://127.0.0.1:9/transcribe/stream"}})
+        streaming = StreamingSpeechToText(SpeechToText(config=config), config=config)
+        breaker = half_open(streaming)
+        streaming.handle_audio("start", 1, None)
+        assert breaker.probing and not streaming.health.available(streaming.service)
+        streaming.handle_audio("discard", 1, None)
+        await asyncio.sleep(0)
+        return streaming, breaker
+
+    streaming, breaker = asyncio.run(scenario())
+    assert not breaker.probing and streaming.health.available(streaming.service)
+    assert streaming.health.summary()[streaming.service]["abandoned"] == 1
+
+
+def test_an_unknown_stream_service_records_a_failed_probe(make_config):
+    async def scenario():
+        config = make_config({"speech_to_text": {"stream_service": "not-a-url"}})
+        streaming = StreamingSpeechToText(SpeechToText(config=config), config=config)
+        breaker = half_open(streaming)
+        streaming.handle_audio("start", 1, None)
+        streaming.handle_audio("end", 1, None)
+        return await streaming.final_transcript(1), streaming, breaker
+
+    final, streaming, breaker = asyncio.run(scenario())
+    assert final is None and streaming.stats['fallbacks'] == 1
+    assert breaker.state == OPEN and not breaker.probing
@@ -0,0 +1,102 @@
+import asyncio
+
+from speech.audio_clip import AudioClip
+from speech.tts_cache import TTSCache
+
+
+def clip(size=1000, value=1):
+    return AudioClip(bytes([value]) * size, 24000)
+
+
+class Synth:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self.cancelled = 0
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return clip(value=self.calls)
+
+
+def test_key_folds_whitespace_but_not_voice_or_provider():
+    key = TTSCache.make_key("Hello  there\n", "voice-a", "edge_tts")
+    assert key == TTSCache.make_key("Hello there", "voice-a", "edge_tts")
+    assert key != TTSCache.make_key("Hello there", "voice-b", "edge_tts")
+    assert key != TTSCache.make_key("Hello there", "voice-a", "gtts")
+
+
+def test_repeats_are_served_from_memory_and_from_disk_after_a_restart(tmp_path):
+    async def scenario():
+        synth = Synth()
+        cache = TTSCache(str(tmp_path))
+        first = await cache.get_or_synthesize("Hi.", "v", "p", synth)
+        again = await cache.get_or_synthesize("Hi.", "v", "p", synth)
+        restarted = TTSCache(str(tmp_path))
+        from_disk = await restarted.get_or_synthesize("Hi.", "v", "p", synth)
+        return synth.calls, first, again, from_disk, cache.stats, restarted.stats
+
+    calls, first, again, from_disk, stats, restarted_stats = asyncio.run(scenario())
+    assert calls == 1
+    assert again is first
+    assert from_disk.pcm == first.pcm
+    assert stats['misses'] == 1 and stats['memory_hits'] == 1
+    assert restarted_stats['disk_hits'] == 1
+
+
+def test_concurrent_requests_share_one_synthesis_until_the_last_waiter_leaves(tmp_path):
+    async def scenario():
+        synth = Synth(delay=0.05)
+        cache = TTSCache(str(tmp_path))
+        first = asyncio.create_task(cache.get_or_synthesize("Hi.", "v", "p", synth))
+        second = asyncio.create_task(cache.get_or_synthesize("Hi.", "v", "p", synth))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        shared = await second  # still synthesized for the remaining waiter
+
+        alone = asyncio.create_task(cache.get_or_synthesize("Bye.", "v", "p", synth))
+        await asyncio.sleep(0.01)
+        alone.cancel()
+        await asyncio.sleep(0.01)
+        return synth, shared, cache
+
+    synth, shared, cache = asyncio.run(scenario())
+    assert synth.calls == 2
+    assert shared is not None and cache.stats['shared'] == 1
+    assert synth.cancelled == 1
+    assert not cache.in_flight
+
+
+def fill(cache, texts):
+    async def scenario():
+        synth = Synth()
+        for text in texts:
+            await cache.get_or_synthesize(text, "v", "p", synth)
+        return synth.calls
+
+    return asyncio.run(scenario())
+
+
+def keys(*texts):
+    return {TTSCache.make_key(text, "v", "p") for text in texts}
+
+
+def test_memory_evicts_the_least_recently_used_clip(tmp_path):
+    # Room for two 1000-byte clips
+    cache = TTSCache(str(tmp_path), memory_max_mb=2500 / 2 ** 20)
+    assert fill(cache, ["a", "b", "a", "c"]) == 3
+    assert set(cache.memory) == keys("a", "c")
+    assert cache.memory_bytes == 2000
+
+
+def test_disk_evicts_the_least_recently_read_file(tmp_path):
+    # Nothing fits in memory, so every repeat is a disk read; room for two WAV files on disk
+    cache = TTSCache(str(tmp_path), memory_max_mb=0, disk_max_mb=2200 / 2 ** 20)
+    assert fill(cache, ["a", "b", "a", "c"]) == 3
+    assert {path.name[:-4] for path in tmp_path.iterdir()} == keys("a", "c")
+    assert cache.disk_bytes <= cache.disk_max_bytes and cache.stats['disk_hits'] == 1
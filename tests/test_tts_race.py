@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from speech.audio_clip import AudioClip
+from speech.text_to_speech import TTS_PROVIDERS, TextToSpeech
+
+VOICE = SimpleNamespace(voice="test-voice")
+
+
+class Synth:
+    """TTS provider returning `samples` of audio after `delay` seconds, or raising if `error`."""
+
+    def __init__(self, samples=2400, delay=0.0, error=None):
+        self.samples = samples
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, tts, text, model_config):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return AudioClip(bytes(self.samples * 2), 24000) if self.samples else None
+
+
+@pytest.fixture
+def racing_tts(make_config, monkeypatch):
+    def make(primary, secondary, cache=False):
+        monkeypatch.setitem(TTS_PROVIDERS.providers, "primary", None)
+        monkeypatch.setitem(TTS_PROVIDERS.providers, "secondary", None)
+        TTS_PROVIDERS.register("primary", primary)
+        TTS_PROVIDERS.register("secondary", secondary)
+        config = make_config({"text_to_speech": {
+            "mode": 3, "primary_service": "primary", "secondary_service": "secondary", "cache_enabled": cache,
+        }})
+        return TextToSpeech(config=config, logger=logging.getLogger("test_tts_race"))
+
+    return make
+
+
+def race(tts):
+    async def scenario():
+        clip = await tts.synthesize("Hello there.", VOICE)
+        await asyncio.sleep(0)  # let the cancelled loser unwind
+        return clip
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_the_first_clip_wins_and_the_loser_is_cancelled(racing_tts, cache):
+    fast, slow = Synth(delay=0.01), Synth(samples=4800, delay=1.0)
+    tts = racing_tts(slow, fast, cache=cache)
+    clip = race(tts)
+    assert clip.duration == 0.1
+    assert slow.cancelled == 1
+    summary = tts.health.summary()
+    assert summary["secondary"]["wins"] == 1 and summary["primary"]["abandoned"] == 1
+    if cache:
+        assert not tts.cache.in_flight
+
+
+@pytest.mark.parametrize("loser", [Synth(samples=0), Synth(error=RuntimeError("backend down"))])
+def test_an_empty_or_failed_provider_waits_for_the_other(racing_tts, loser):
+    winner = Synth(delay=0.05)
+    tts = racing_tts(loser, winner)
+    assert race(tts).duration == 0.1
+    assert tts.health.summary()["primary"]["failures"] == 1
+
+
+def test_no_audio_from_either_provider_returns_none(racing_tts):
+    tts = racing_tts(Synth(samples=0), Synth(error=RuntimeError("backend down")))
+    assert race(tts) is None
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from core.system.provider_health import OPEN
+from speech.audio_clip import AudioClip
+from speech.playback_engine import PlaybackHandle
+from speech.text_to_speech import TextToSpeech
+
+VOICE = SimpleNamespace(voice="test-voice")
+
+
+@pytest.fixture
+def streaming_tts(make_config):
+    """TextToSpeech whose edge_tts stream yields one clip, then `hang`s; edge_tts is half-open."""
+
+    def make(hang_before_first=False):
+        config = make_config({"text_to_speech": {"mode": 1, "primary_service": "edge_tts", "stream_playback": True}})
+        tts = TextToSpeech(config=config, logger=logging.getLogger("test_tts_stream"))
+
+        async def edge_audio_chunks(text, model_config):
+            if hang_before_first:
+                await asyncio.sleep(60)
+            yield AudioClip(bytes(4800), 24000)
+            await asyncio.sleep(60)
+
+        tts.edge_audio_chunks = edge_audio_chunks
+        breaker = tts.health._breaker("edge_tts")
+        breaker.state, breaker.opened_at = OPEN, 0.0  # cooled down, the next call is the probe
+        return tts, breaker
+
+    return make
+
+
+def released(tts, breaker):
+    return not breaker.probing and tts.health.available("edge_tts")
+
+
+def test_cancelled_before_the_first_audio(streaming_tts):
+    tts, breaker = streaming_tts(hang_before_first=True)
+
+    async def scenario():
+        task = asyncio.create_task(tts.queue_streamed("Hello there.", VOICE))
+        await asyncio.sleep(0.01)
+        assert breaker.probing
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert released(tts, breaker)
+
+
+def test_the_output_device_failing_to_open(streaming_tts):
+    tts, breaker = streaming_tts()
+
+    def open_stream(label=""):
+        raise OSError("no output device")
+
+    tts.playback.open_stream = open_stream
+    assert asyncio.run(tts.queue_streamed("Hello there.", VOICE)) is None
+    assert released(tts, breaker)
+
+
+def test_the_feeder_cancelled_mid_stream(streaming_tts):
+    tts, breaker = streaming_tts()
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        tts.playback.open_stream = lambda label="": PlaybackHandle(loop, 24000, label)
+        handle = await tts.queue_streamed("Hello there.", VOICE)
+        await asyncio.sleep(0.01)
+        assert breaker.probing and tts.stream_tasks
+        tts.close()
+        await asyncio.sleep(0.01)
+        return handle
+
+    handle = asyncio.run(scenario())
+    assert handle.cancelled
+    assert released(tts, breaker)
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+from listen.wake_gate import SAMPLE_RATE, WakeGate, match_distance, mfcc
+from speech.audio_clip import AudioClip
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def voice(seconds, pitch, syllables):
+    # Harmonic, pitch- and loudness-modulated tone that webrtcvad takes for speech
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(pitch * (1 + 0.1 * np.sin(2 * np.pi * 3 * t))) / SAMPLE_RATE
+    x = sum(np.sin(k * phase) / k for k in range(1, 20)) * (0.6 + 0.4 * np.sin(2 * np.pi * syllables * t))
+    return AudioClip((x / np.abs(x).max() * 12000).astype(np.int16).tobytes(), SAMPLE_RATE)
+
+
+def make_gate(make_config, emergency_phrases):
+    config = make_config({
+        "models": {"system": {"enabled": True, "emergency_phrases": emergency_phrases}},
+        "wake_gate": {"enabled": True, "enroll": True},
+    })
+    gate = WakeGate(config=config)
+    assert gate.enroll("wake", voice(1.0, 140, 4), "astrape", ["astrape"])
+    return gate
+
+
+def test_speech_unlike_the_wake_template_reaches_stt_while_emergency_phrases_exist(make_config):
+    gate = make_gate(make_config, ["astrape emergency", "astrape help"])
+    forward, detail = gate.check(voice(1.5, 220, 7))
+    assert forward, detail
+    assert not gate.enroll("emergency", voice(1.0, 220, 7))
+
+
+def test_only_wake_is_gated_without_emergency_phrases(make_config):
+    gate = make_gate(make_config, [])
+    assert gate.check(voice(1.0, 140, 4))[0]
+    assert not gate.check(voice(1.5, 220, 7))[0]
+    assert not gate.check(AudioClip(bytes(SAMPLE_RATE * 2), SAMPLE_RATE))[0]
+    assert gate.stats['no_match'] == 1 and gate.stats['no_speech'] == 1
+
+
+def test_explicit_enrollment_ignores_the_enroll_setting(make_config, tmp_path):
+    gate = WakeGate(config=make_config({"wake_gate": {"enabled": True}}))
+    assert gate.enroll("wake", voice(1.0, 140, 4)) is None
+    assert gate.enroll("wake", voice(1.0, 140, 4), force=True)
+
+    wav_path = tmp_path / "my_wake.wav"
+    wav_path.write_bytes(voice(1.0, 140, 4).to_wav_bytes())
+    result = subprocess.run(
+        [sys.executable, "-m", "listen.wake_gate", "enroll", "wake", str(wav_path)],
+        cwd=tmp_path, env=dict(os.environ, PYTHONPATH=str(ROOT)), capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "rejected" not in result.stdout
+    assert len(list((tmp_path / "data" / "wake_templates").glob("wake_*.wav"))) == 2
+
+
+def test_check_cost_grows_linearly_with_the_utterance():
+    # MFCC plus DTW against 10 one-second templates; DTW is linear in the utterance length
+    rng = np.random.default_rng(0)
+    templates = [mfcc(rng.normal(0, 3000, SAMPLE_RATE).astype(np.int16)) for _ in range(10)]
+
+    def cost(seconds):
+        samples = rng.normal(0, 3000, seconds * SAMPLE_RATE).astype(np.int16)
+
+        def check():
+            features = mfcc(samples)
+            return [match_distance(template, features) for template in templates]
+
+        return min(timeit.repeat(check, number=1, repeat=3))
+
+    short, long = cost(1), cost(10)
+    assert long < 10 * short
+    assert cost(3) < 0.25